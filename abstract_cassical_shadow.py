@@ -1,32 +1,117 @@
+import asyncio
+import itertools
+import os
 import random
 from abc import ABC, abstractmethod
+from collections import Counter
 
 import numpy as np
 import qiskit.qasm2
+import scipy.sparse
 from qiskit import QuantumCircuit, transpile
-from qiskit.quantum_info import Clifford, DensityMatrix, StabilizerState, Statevector
+from qiskit.quantum_info import (
+    Clifford,
+    DensityMatrix,
+    PauliList,
+    SparsePauliOp,
+    StabilizerState,
+    Statevector,
+)
 from qiskit.visualization import array_to_latex
 from qiskit_aer import AerSimulator
 
+from median_of_means import batch_boundaries, median_of_batch_means, resolve_num_batches
 from shadow_protocol import ShadowProtocol
+from snapshot_file import (
+    SnapshotFileWriter,
+    check_compatible,
+    make_header,
+    open_snapshot_file,
+    read_header,
+    write_snapshot_file,
+)
+from snapshot_store import SnapshotStore, SnapshotView
+from snapshot_tracker import SnapshotTracker
 
 
 class AbstractClassicalShadow(ABC):
-    def __init__(self, shadow_protocol: ShadowProtocol):
+    # identifies the kind of snapshots in snapshot files
+    SHADOW_TYPE: str = ""
+
+    def __init__(
+        self,
+        shadow_protocol: ShadowProtocol,
+        shots_per_rotation: int = 1,
+        seed: int | None = None,
+        accumulate_density_matrix: bool = True,
+    ):
+        if shots_per_rotation < 1:
+            raise ValueError(
+                f"Invalid shots per rotation: {shots_per_rotation}. Expected at least 1."
+            )
+
         self.num_qubits: int = shadow_protocol.get_num_qubits()
         self.shadow_protocol: ShadowProtocol = shadow_protocol
+        # every shot of a random rotation is stored as its own snapshot
+        self.shots_per_rotation: int = shots_per_rotation
+
+        # source of the random rotations
+        self.seed: int | None = seed
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+
+        # compact rows, one per snapshot, see encode_snapshot
+        self.snapshot_store: SnapshotStore = self.create_snapshot_store()
+        # set while new snapshots are recorded to a snapshot file
+        self.snapshot_writer: SnapshotFileWriter | None = None
+
+        # running sum of the inverted snapshots, only new snapshots get added to it
+        self.accumulate_density_matrix: bool = accumulate_density_matrix
+        self._density_matrix_sum: np.ndarray | None = None
+        self._num_accumulated: int = 0
+
+        # registered targets, their estimates are updated with every new snapshot
+        self.trackers: dict[str, SnapshotTracker] = {}
+
+    def get_options(self) -> dict:
+        """Constructor arguments that shape the snapshots, shards acquired in other
+        processes are created with them."""
+        return {"shots_per_rotation": self.shots_per_rotation}
 
-        self.clifford_list_list: list[list[StabilizerState]] = []
+    @property
+    def clifford_list_list(self) -> SnapshotView:
+        """Read-only view decoding the stored snapshots into lists of Cliffords."""
+        return SnapshotView(self.snapshot_store, self.decode_snapshot)
 
     @staticmethod
-    def stabilizer_to_density_matrix(stab: StabilizerState) -> DensityMatrix:
-        op = stab.to_operator().data
+    def stabilizer_to_state_vector(stab: StabilizerState) -> np.ndarray:
+        """Returns the statevector of a stabilizer state (qiskit qubit order).
 
-        state = np.zeros_like(op)  # same shape, all zeros
-        state[0, 0] = 1
+        The Clifford circuit is applied to |0> directly, which costs
+        O(gates * 2^n) instead of building the 2^n x 2^n operator."""
+        return Statevector(stab.clifford.to_circuit()).data
 
-        result = op @ state @ op.conj().T
-        return result
+    @staticmethod
+    def stabilizer_to_density_matrix(stab: StabilizerState, sparse: bool = False):
+        """Returns |psi><psi| as one outer product of the statevector.
+
+        With sparse=True a scipy CSR matrix is returned instead, a stabilizer state
+        with an X block of rank k only has 2^k nonzero amplitudes."""
+        vector = AbstractClassicalShadow.stabilizer_to_state_vector(stab)
+
+        if not sparse:
+            return np.outer(vector, vector.conj())
+
+        support = np.flatnonzero(np.abs(vector) > 1e-12)
+        amplitudes = vector[support]
+        dimension = len(vector)
+
+        return scipy.sparse.csr_matrix(
+            (
+                np.outer(amplitudes, amplitudes.conj()).ravel(),
+                (np.repeat(support, len(support)), np.tile(support, len(support))),
+            ),
+            shape=(dimension, dimension),
+        )
 
     def get_original_density_matrix(self):
         circuit: QuantumCircuit = self.shadow_protocol.get_state_circuit()
@@ -36,32 +121,476 @@ class AbstractClassicalShadow(ABC):
         return rho.reverse_qargs().data
 
     def add_snapshot(self, log: bool = False):
-        cliffords: list[Clifford] = self.get_random_rotations(self.num_qubits)
+        self.add_snapshots(1)
+
+    def add_snapshots(self, num_rotations: int, batch_size: int = 1000):
+        """Measures num_rotations random rotations, batch_size of them at once.
+
+        Every rotation adds shots_per_rotation snapshots, so the shadow grows by
+        num_rotations * shots_per_rotation snapshots."""
+        if num_rotations < 0:
+            raise ValueError(f"Invalid number of rotations: {num_rotations}.")
+        if batch_size < 1:
+            raise ValueError(f"Invalid batch size: {batch_size}. Expected at least 1.")
+
+        for start in range(0, num_rotations, batch_size):
+            count = min(batch_size, num_rotations - start)
+            rotations = self.get_random_rotations_batch(count)
+
+            memories = self.measure_rotations(rotations)
+            self.store_memories(rotations, memories)
+
+    async def add_snapshots_async(
+        self, num_rotations: int, max_in_flight: int = 8, rotations_per_job: int = 16
+    ):
+        """Acquires snapshots with up to max_in_flight jobs running at once.
+
+        Like add_snapshots, num_rotations counts random rotations, each of them
+        adds shots_per_rotation snapshots. If the protocol samples rotated states
+        itself, every job passes up to rotations_per_job rotations to
+        sample_rotated_states_async, otherwise every job runs the circuit of a
+        single rotation through the async protocol interface. Results are stored
+        as soon as they arrive, so the order of the snapshots follows the
+        completion order of the jobs."""
+        if num_rotations < 0:
+            raise ValueError(f"Invalid number of rotations: {num_rotations}.")
+        if max_in_flight < 1:
+            raise ValueError(
+                f"Invalid number of jobs in flight: {max_in_flight}. Expected at least 1."
+            )
+        if rotations_per_job < 1:
+            raise ValueError(
+                f"Invalid number of rotations per job: {rotations_per_job}. "
+                "Expected at least 1."
+            )
+
+        shots = self.shots_per_rotation
+
+        if self.shadow_protocol.supports_rotation_sampling():
+            job_size = rotations_per_job
+
+            async def measure(rotations):
+                memories = await self.shadow_protocol.sample_rotated_states_async(
+                    self.get_rotation_cliffords(rotations), shots
+                )
+                return rotations, memories
+
+        else:
+            job_size = 1
+            state_circuit: QuantumCircuit = self.shadow_protocol.get_state_circuit()
+
+            async def measure(rotations):
+                cliffords = self.get_rotation_cliffords(rotations)[0]
+                circuit = self.make_rotated_state_circuit(cliffords, state_circuit)
+                if shots == 1:
+                    measurement_results = (
+                        await (
+                            self.shadow_protocol.run_circuit_and_get_measurement_async(
+                                circuit
+                            )
+                        )
+                    )
+                    return rotations, [[measurement_results]]
+
+                memory = await self.shadow_protocol.run_circuit_and_get_memory_async(
+                    circuit, shots
+                )
+                return rotations, [memory]
+
+        pending: set[asyncio.Task] = set()
+        submitted = 0
+        try:
+            while submitted < num_rotations or pending:
+                while submitted < num_rotations and len(pending) < max_in_flight:
+                    count = min(job_size, num_rotations - submitted)
+                    rotations = self.get_random_rotations_batch(count)
+                    pending.add(asyncio.ensure_future(measure(rotations)))
+                    submitted += count
 
-        # prepare circuit
-        state_circuit: QuantumCircuit = self.shadow_protocol.get_state_circuit()
-        combined_circuit: QuantumCircuit = self.make_rotated_state_circuit(
-            cliffords, state_circuit
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    rotations, memories = task.result()
+                    assert all(len(memory) == shots for memory in memories)
+                    self.store_memories(rotations, memories)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def store_memories(self, rotations, memories: list[list[list[int]]]):
+        """Rotates the measurement results of every rotation back and stores them."""
+        if self.shots_per_rotation > 1:
+            for cliffords, memory in zip(rotations, memories):
+                self.store_grouped_snapshots(cliffords, memory)
+            return
+
+        # roatet back and store snapshots
+        batch_results = [memory[0] for memory in memories]
+        self.append_snapshot_rows(self.encode_snapshots_batch(rotations, batch_results))
+
+    def get_random_rotations_batch(self, num_rotations: int):
+        """Draws num_rotations random rotations, by default with get_random_rotations.
+
+        Subclasses can override this to change the rotations or their format, the
+        batch is handed on unchanged to measure_rotations and store_memories.
+        get_rotation_cliffords turns it into lists of Cliffords."""
+        return [
+            self.get_random_rotations(self.num_qubits) for _ in range(num_rotations)
+        ]
+
+    def get_rotation_cliffords(self, rotations) -> list[list[Clifford]]:
+        """Returns the Cliffords of every rotation of a batch, one per block."""
+        return rotations
+
+    def sample_rotations(self, rotations, shots: int) -> list[list[list[int]]]:
+        """Lets a protocol that supports rotation sampling sample a batch of
+        rotations, one memory per rotation."""
+        return self.shadow_protocol.sample_rotated_states(
+            self.get_rotation_cliffords(rotations), shots
         )
 
-        # run circuit and getting the measurement results for each qubit
-        measurement_results = self.shadow_protocol.run_circuit_and_get_measurement(
-            combined_circuit
+    def measure_rotations(self, rotations) -> list[list[list[int]]]:
+        """Returns the measurement results of every shot for each of the rotations."""
+        shots = self.shots_per_rotation
+
+        if self.shadow_protocol.supports_rotation_sampling():
+            # the protocol applies the rotations itself, no circuits needed
+            memories = self.sample_rotations(rotations, shots)
+        else:
+            # prepare all circuits of the batch and run them as one job
+            state_circuit: QuantumCircuit = self.shadow_protocol.get_state_circuit()
+            circuits = [
+                self.make_rotated_state_circuit(cliffords, state_circuit)
+                for cliffords in self.get_rotation_cliffords(rotations)
+            ]
+
+            if shots == 1:
+                batch_results = self.shadow_protocol.run_circuits_and_get_measurements(
+                    circuits
+                )
+                memories = [
+                    [measurement_results] for measurement_results in batch_results
+                ]
+            else:
+                memories = self.shadow_protocol.run_circuits_and_get_memory(
+                    circuits, shots
+                )
+
+        assert len(memories) == len(rotations)
+        for memory in memories:
+            assert len(memory) == shots
+            for measurement_results in memory:
+                assert len(measurement_results) == self.num_qubits
+
+        return memories
+
+    def compute_clifford_applied_to_measurements_batch(
+        self, rotations, batch_results
+    ) -> list[list[Clifford]]:
+        return [
+            self.compute_clifford_applied_to_measurements(
+                cliffords, measurement_results
+            )
+            for cliffords, measurement_results in zip(rotations, batch_results)
+        ]
+
+    def encode_snapshots_batch(self, rotations, batch_results) -> np.ndarray:
+        stabilizers_batch = self.compute_clifford_applied_to_measurements_batch(
+            rotations, batch_results
         )
+        return np.array(
+            [self.encode_snapshot(stabilizers) for stabilizers in stabilizers_batch],
+            dtype=self.snapshot_store.dtype,
+        ).reshape(-1, self.snapshot_store.row_width)
+
+    def append_snapshot_rows(self, rows: np.ndarray):
+        self.snapshot_store.append(rows)
+
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.append(rows)
+
+        for tracker in self.trackers.values():
+            tracker.add(rows)
+
+    def get_snapshot_file_header(self) -> dict:
+        return make_header(
+            self.num_qubits,
+            self.SHADOW_TYPE,
+            self.snapshot_store.row_width,
+            self.snapshot_store.dtype,
+            [self.seed],
+        )
+
+    def save_snapshots(self, path):
+        write_snapshot_file(
+            path, self.get_snapshot_file_header(), self.snapshot_store.view()
+        )
+
+    def load_snapshots(self, path):
+        """Replaces the snapshots of the shadow by the ones of a snapshot file.
+
+        The rows are memory mapped and only read when they are used."""
+        header, rows = open_snapshot_file(path)
+        check_compatible(self.get_snapshot_file_header(), header)
+
+        self.snapshot_store = SnapshotStore.from_rows(rows)
+        self.reset_density_matrix_accumulator()
+
+        for tracker in self.trackers.values():
+            tracker.reset()
+            tracker.add(self.snapshot_store.view())
+
+    def record_snapshots_to(self, path):
+        """Appends every new snapshot to a snapshot file during acquisition.
+
+        A new file starts with the current snapshots. An existing file has to hold
+        exactly the current snapshots, e.g. after load_snapshots from it, and is
+        continued."""
+        if os.path.exists(path):
+            check_compatible(self.get_snapshot_file_header(), read_header(path))
+            writer = SnapshotFileWriter(path)
+            if writer.num_rows != self.get_shadow_size():
+                writer.close()
+                raise ValueError(
+                    f"The snapshot file holds {writer.num_rows} snapshots, "
+                    f"the shadow {self.get_shadow_size()}."
+                )
+        else:
+            self.save_snapshots(path)
+            writer = SnapshotFileWriter(path)
 
-        assert len(measurement_results) == self.num_qubits
+        self.stop_recording_snapshots()
+        self.snapshot_writer = writer
 
-        # roatet back and store snapshot
-        stabilizers: list[Clifford] = self.compute_clifford_applied_to_measurements(
-            cliffords, measurement_results
+    def stop_recording_snapshots(self):
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+            self.snapshot_writer = None
+
+    def store_grouped_snapshots(self, cliffords, memory: list[list[int]]):
+        # identical outcomes of the same rotation only need to be rotated back once
+        outcome_counts = Counter(
+            tuple(int(bit) for bit in measurement_results)
+            for measurement_results in memory
+        )
+        grouped_stabilizers = self.compute_clifford_applied_to_grouped_measurements(
+            cliffords, outcome_counts
         )
-        self.clifford_list_list.append(stabilizers)
+        rows = np.array(
+            [
+                self.encode_snapshot(stabilizers)
+                for stabilizers, _ in grouped_stabilizers
+            ],
+            dtype=self.snapshot_store.dtype,
+        )
+        counts = [count for _, count in grouped_stabilizers]
+        self.append_snapshot_rows(np.repeat(rows, counts, axis=0))
+
+    def compute_clifford_applied_to_grouped_measurements(
+        self, cliffords, outcome_counts: dict[tuple[int, ...], int]
+    ) -> list[tuple[list[Clifford], int]]:
+        return [
+            (
+                self.compute_clifford_applied_to_measurements(
+                    cliffords, list(measurement_results)
+                ),
+                count,
+            )
+            for measurement_results, count in outcome_counts.items()
+        ]
+
+    def get_density_matrix_from_cliffords(self, log: bool = False) -> np.ndarray:
+        shadow_size = self.get_shadow_size()
+        if shadow_size == 0:
+            raise ValueError("No snapshot present.")
+
+        if not self.accumulate_density_matrix:
+            return self.sum_snapshot_density_matrices(0, shadow_size) / shadow_size
+
+        if self._num_accumulated < shadow_size:
+            new_sum = self.sum_snapshot_density_matrices(
+                self._num_accumulated, shadow_size
+            )
+            if self._density_matrix_sum is None:
+                self._density_matrix_sum = new_sum
+            else:
+                self._density_matrix_sum += new_sum
+            self._num_accumulated = shadow_size
+
+        return self._density_matrix_sum / shadow_size
+
+    def reset_density_matrix_accumulator(self):
+        self._density_matrix_sum = None
+        self._num_accumulated = 0
 
     def get_shadow_size(self) -> int:
-        return len(self.clifford_list_list)
+        return len(self.snapshot_store)
+
+    def predict_observable(
+        self,
+        observable,
+        num_batches: int | None = 10,
+        delta: float | None = None,
+        max_chunk_entries: int = 2**24,
+    ):
+        """Median-of-means estimates of Pauli observables from the snapshots.
+
+        Accepts a SparsePauliOp, which is estimated as a whole and returns
+        (estimate, error), or a list of Pauli strings (qiskit labels, qubit 0 on
+        the right), which returns arrays of estimates and errors per string. The
+        batch count is derived from the failure probability delta if it is given,
+        which bounds the failure of all returned estimates together."""
+        rows = self.snapshot_store.view()
+        if len(rows) == 0:
+            raise ValueError("No snapshot present.")
+
+        paulis, coefficients = self.parse_observable(observable)
+
+        num_estimates = len(paulis) if coefficients is None else 1
+        boundaries = batch_boundaries(
+            len(rows), resolve_num_batches(num_batches, delta, num_estimates)
+        )
+        batch_sums = np.zeros((len(boundaries) - 1, len(paulis)))
+
+        for terms, values in self.iterate_pauli_values(paulis, rows, max_chunk_entries):
+            batch_sums[:, terms] = np.add.reduceat(values, boundaries[:-1], axis=0)
+
+        means = batch_sums / np.diff(boundaries)[:, None]
+
+        if coefficients is None:
+            return median_of_batch_means(means)
+
+        estimate, error = median_of_batch_means(means @ coefficients)
+        return float(estimate), float(error)
+
+    def make_tracker_values(self, observable):
+        """Returns a function mapping snapshot rows to per-snapshot values of the
+        target, their mean over all snapshots estimates the target."""
+        paulis, coefficients = self.parse_observable(observable)
+
+        def values(rows: np.ndarray) -> np.ndarray:
+            snapshot_values = np.zeros((len(rows), len(paulis)))
+            for terms, chunk_values in self.iterate_pauli_values(paulis, rows):
+                snapshot_values[:, terms] = chunk_values
 
-    def predict_observable(self):
-        raise NotImplementedError("This function is not yet implemented.")
+            if coefficients is None:
+                return snapshot_values
+            return snapshot_values @ coefficients
+
+        return values
+
+    def parse_observable(self, observable) -> tuple[PauliList, np.ndarray | None]:
+        """Returns the Pauli strings of an observable and, for a SparsePauliOp, the
+        real parts of its coefficients."""
+        if isinstance(observable, SparsePauliOp):
+            paulis = observable.paulis
+            coefficients = np.real(observable.coeffs)
+        else:
+            paulis = PauliList(observable)
+            coefficients = None
+
+        if paulis.num_qubits != self.num_qubits:
+            raise ValueError(
+                f"Observable acts on {paulis.num_qubits} qubits, expected {self.num_qubits}."
+            )
+        if np.any(paulis.phase % 2):
+            raise ValueError("Pauli strings have to be Hermitian.")
+
+        return paulis, coefficients
+
+    @abstractmethod
+    def iterate_pauli_values(
+        self, paulis: PauliList, rows: np.ndarray, max_chunk_entries: int = 2**24
+    ):
+        """Yields the indices of a chunk of Pauli strings and the values
+        tr(P rho_i) of all snapshots for them, of shape (len(rows), len(chunk))."""
+        raise NotImplementedError("This method should be implemented by subclasses")
+
+    def check_qubits(self, qubits) -> list[int]:
+        """Returns the qubits of a subsystem as a list, they have to be distinct."""
+        qubits = [int(qubit) for qubit in qubits]
+        if (
+            not qubits
+            or len(set(qubits)) != len(qubits)
+            or not all(0 <= qubit < self.num_qubits for qubit in qubits)
+        ):
+            raise ValueError(f"Invalid qubits: {qubits}.")
+        return qubits
+
+    def get_subsystems(self, max_size: int) -> list[tuple[int, ...]]:
+        """All subsystems with 1, ..., max_size qubits."""
+        return [
+            subsystem
+            for size in range(1, min(max_size, self.num_qubits) + 1)
+            for subsystem in itertools.combinations(range(self.num_qubits), size)
+        ]
+
+    def estimate_purity(self, qubits, **options) -> float:
+        """Unbiased estimate of the purity tr(rho_A^2) of the subsystem A."""
+        subsystem = tuple(self.check_qubits(qubits))
+        return float(self.estimate_subsystem_purities([subsystem], **options)[0])
+
+    def estimate_purities(self, max_size: int, **options) -> dict:
+        """Purities of all subsystems with up to max_size qubits in one pass."""
+        subsystems = self.get_subsystems(max_size)
+        purities = self.estimate_subsystem_purities(subsystems, **options)
+        return dict(zip(subsystems, purities.tolist()))
+
+    def estimate_renyi_entropy(self, qubits, **options) -> float:
+        """Second Renyi entropy -log2 tr(rho_A^2), inf for a nonpositive estimate."""
+        return self.purity_to_renyi_entropy(self.estimate_purity(qubits, **options))
+
+    def estimate_renyi_entropies(self, max_size: int, **options) -> dict:
+        return {
+            subsystem: self.purity_to_renyi_entropy(purity)
+            for subsystem, purity in self.estimate_purities(max_size, **options).items()
+        }
+
+    @staticmethod
+    def purity_to_renyi_entropy(purity: float) -> float:
+        return float(-np.log2(purity)) if purity > 0 else np.inf
+
+    @abstractmethod
+    def estimate_subsystem_purities(self, subsystems, **options) -> np.ndarray:
+        """Returns the purity estimates of a list of subsystems (qubit tuples)."""
+        raise NotImplementedError("This method should be implemented by subclasses")
+
+    def track(
+        self,
+        name: str,
+        target,
+        num_batches: int | None = 10,
+        delta: float | None = None,
+    ):
+        """Registers a target (see make_tracker_values) under a name.
+
+        The values of the current snapshots are computed once, every later
+        snapshot updates the estimate as soon as it is stored. The batch count is
+        derived from the failure probability delta if it is given, which bounds the
+        failure of all values of the target together."""
+        tracker = SnapshotTracker(self.make_tracker_values(target), num_batches, delta)
+        tracker.add(self.snapshot_store.view())
+        self.trackers[name] = tracker
+
+    def untrack(self, name: str):
+        del self.trackers[name]
+
+    def get_tracked_estimate(self, name: str):
+        """Returns the current median-of-means estimate and error of a target."""
+        return self.trackers[name].estimate()
+
+    @abstractmethod
+    def create_snapshot_store(self) -> SnapshotStore:
+        raise NotImplementedError("This method should be implemented by subclasses")
+
+    @abstractmethod
+    def encode_snapshot(self, stabilizers: list[Clifford]) -> np.ndarray:
+        raise NotImplementedError("This method should be implemented by subclasses")
+
+    @abstractmethod
+    def decode_snapshot(self, row: np.ndarray) -> list[Clifford]:
+        raise NotImplementedError("This method should be implemented by subclasses")
 
     @abstractmethod
     def make_rotated_state_circuit(
@@ -78,7 +607,8 @@ class AbstractClassicalShadow(ABC):
         raise NotImplementedError("This method should be implemented by subclasses")
 
     @abstractmethod
-    def get_density_matrix_from_cliffords(self):
+    def sum_snapshot_density_matrices(self, start: int, stop: int) -> np.ndarray:
+        """Returns the sum of the inverted snapshots start, ..., stop - 1."""
         raise NotImplementedError("This method should be implemented by subclasses")
 
     @abstractmethod
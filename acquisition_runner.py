@@ -0,0 +1,182 @@
+import math
+import queue
+import threading
+from collections.abc import Callable
+
+import numpy as np
+
+from abstract_cassical_shadow import AbstractClassicalShadow
+from convergence_history import ConvergenceHistory
+
+
+class AcquisitionRunner:
+    """Acquires snapshots in a worker thread and publishes frames to a queue.
+
+    After every batch of batch_size rotations the worker builds a frame: the
+    shadow size, the current estimates of all registered trackers, the histories
+    and, optionally, the reconstructed density matrix. The frames go into a
+    bounded queue. If the consumer is too slow the oldest frame is dropped, so
+    the acquisition never waits for it.
+
+    The tracked estimates and their error bars are also collected in `histories`,
+    one ConvergenceHistory per tracker, which keeps every point even if frames are
+    dropped. Trackers with several observables get one history per observable,
+    named "name[i]". The histories are locked while they are appended to or
+    decimated, frames carry their own copy of the dict, so a consumer can draw
+    them while the worker goes on. Only the worker may use the shadow while it
+    runs."""
+
+    def __init__(
+        self,
+        shadow: AbstractClassicalShadow,
+        batch_size: int = 200,
+        density_matrix: bool = False,
+        max_queued_frames: int = 2,
+    ):
+        if batch_size < 1:
+            raise ValueError(f"Invalid batch size: {batch_size}. Expected at least 1.")
+
+        self.shadow = shadow
+        self.batch_size = batch_size
+        self.density_matrix = density_matrix
+
+        self.frames: queue.Queue = queue.Queue(maxsize=max_queued_frames)
+        self.histories: dict[str, ConvergenceHistory] = {}
+        self.num_dropped_frames: int = 0
+        self.error: BaseException | None = None
+
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, max_snapshots: int | None = None):
+        """Starts the worker, it runs until stop() or max_snapshots snapshots."""
+        if self.is_running():
+            raise RuntimeError("The acquisition is already running.")
+
+        self._stop_event.clear()
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._run, args=(max_snapshots,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._raise_error()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self, max_snapshots: int | None):
+        try:
+            while not self._stop_event.is_set():
+                shadow_size = self.shadow.get_shadow_size()
+                if max_snapshots is not None and shadow_size >= max_snapshots:
+                    break
+
+                # add_snapshots counts rotations, each adds shots_per_rotation
+                count = self.batch_size
+                if max_snapshots is not None:
+                    remaining = max_snapshots - shadow_size
+                    count = min(
+                        count, math.ceil(remaining / self.shadow.shots_per_rotation)
+                    )
+
+                self.shadow.add_snapshots(count)
+                self._publish(self.make_frame())
+        except BaseException as error:
+            self.error = error
+
+    def make_frame(self) -> dict:
+        shadow_size = self.shadow.get_shadow_size()
+        estimates = {
+            name: self.shadow.get_tracked_estimate(name)
+            for name in self.shadow.trackers
+        }
+
+        for name, (estimate, error) in estimates.items():
+            self.record(name, shadow_size, estimate, error)
+
+        frame = {
+            "shadow_size": shadow_size,
+            "estimates": estimates,
+            "histories": dict(self.histories),
+        }
+        if self.density_matrix:
+            frame["density_matrix"] = self.shadow.get_density_matrix_from_cliffords()
+        return frame
+
+    def record(self, name: str, shadow_size: int, estimate, error):
+        estimate = np.ravel(estimate)
+        error = np.broadcast_to(np.ravel(error), estimate.shape)
+
+        for i, (value, value_error) in enumerate(zip(estimate, error)):
+            key = name if len(estimate) == 1 else f"{name}[{i}]"
+            if key not in self.histories:
+                self.histories[key] = ConvergenceHistory()
+            self.histories[key].append(shadow_size, float(value), float(value_error))
+
+    def _publish(self, frame: dict):
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                pass
+
+            # drop the stale frame instead of blocking the acquisition
+            try:
+                self.frames.get_nowait()
+                self.num_dropped_frames += 1
+            except queue.Empty:
+                pass
+
+    def get_latest_frame(self, timeout: float | None = None) -> dict | None:
+        """Returns the newest queued frame and discards older ones.
+
+        Waits up to timeout seconds for a frame, returns None if there is none."""
+        try:
+            frame = self.frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        while True:
+            try:
+                frame = self.frames.get_nowait()
+                self.num_dropped_frames += 1
+            except queue.Empty:
+                return frame
+
+    def run_visualizer(
+        self,
+        visualizer,
+        make_watchers: Callable[[dict, dict], tuple],
+        poll_interval: float = 0.1,
+        max_snapshots: int | None = None,
+    ):
+        """Starts the acquisition and draws frames in this thread until it ends.
+
+        make_watchers(frame, frame["histories"]) returns the watchers of a frame. The
+        visualizer throttles itself, frames that arrive meanwhile are dropped.
+        A keyboard interrupt stops the acquisition."""
+        if not self.is_running():
+            self.start(max_snapshots)
+
+        try:
+            while self.is_running() or not self.frames.empty():
+                frame = self.get_latest_frame(timeout=poll_interval)
+                if frame is not None:
+                    visualizer.update(*make_watchers(frame, frame["histories"]))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+        visualizer.flush()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
@@ -0,0 +1,197 @@
+import threading
+
+import numpy as np
+from qiskit import ClassicalRegister, QuantumCircuit
+from qiskit.quantum_info import Clifford
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from qiskit_aer import AerSimulator
+
+from shadow_protocol import ShadowProtocol
+from single_qubit_cliffords import (
+    SINGLE_QUBIT_CLIFFORD_CIRCUITS,
+    single_qubit_clifford_index,
+)
+
+
+class AerShadowProtocol(ShadowProtocol):
+    """Protocol that runs the rotated circuits on one simulator instance.
+
+    Subclasses only provide the state circuit. It is transpiled once, the rotation
+    layers of single-qubit Cliffords are transpiled once per Clifford index (and
+    physical qubit, if the backend has a layout) and both are stitched together
+    for every snapshot, so local shadows transpile nothing on the per-snapshot
+    path. Global rotations are transpiled with pass managers that are built only
+    once per layout.
+
+    Any backend can be used. On backends with a coupling map the rotation layers
+    are transpiled onto the physical qubits that hold the logical qubits after
+    the state circuit, and the logical qubits are measured through the final
+    layout, so the results are in logical qubit order. Rotations with
+    multi-qubit Cliffords are routed as one layer, since routing one block may
+    move the qubits of the others."""
+
+    def __init__(self, seed=None, backend=None):
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.backend = AerSimulator() if backend is None else backend
+
+        # building a pass manager is the expensive part of transpile
+        self._pass_managers: dict[tuple[int, ...] | None, object] = {}
+        # async acquisition samples from worker threads that share the pass managers
+        self._transpile_lock = threading.Lock()
+        self._transpiled_state_circuit: QuantumCircuit | None = None
+        self._single_qubit_layers: dict[tuple[int, int | None], QuantumCircuit] = {}
+
+    def get_num_qubits(self) -> int:
+        return self.get_state_circuit().num_qubits
+
+    def transpile(self, circuits, initial_layout: list[int] | None = None):
+        """Transpiles for the backend with a pass manager that is built once per
+        initial layout."""
+        key = None if initial_layout is None else tuple(initial_layout)
+        with self._transpile_lock:
+            if key not in self._pass_managers:
+                self._pass_managers[key] = generate_preset_pass_manager(
+                    optimization_level=1, backend=self.backend, initial_layout=key
+                )
+            return self._pass_managers[key].run(circuits)
+
+    def get_transpiled_state_circuit(self) -> QuantumCircuit:
+        if self._transpiled_state_circuit is None:
+            circuit = self.get_state_circuit().copy()
+            circuit.remove_final_measurements()
+            self._transpiled_state_circuit = self.transpile(circuit)
+
+        return self._transpiled_state_circuit
+
+    def get_state_qubits(self) -> list[int]:
+        """Returns the physical qubit of every logical qubit after the state circuit."""
+        circuit = self.get_transpiled_state_circuit()
+        if circuit.layout is None:
+            return list(range(circuit.num_qubits))
+        return circuit.layout.final_index_layout()
+
+    def get_rotation_layer(
+        self, clifford: Clifford, physical_qubits: list[int]
+    ) -> QuantumCircuit:
+        """Returns the transpiled circuit of a rotation Clifford on the given
+        physical qubits.
+
+        Without a layout of the state circuit (e.g. on AerSimulator) the layer only
+        spans the qubits of the Clifford, otherwise it is laid out onto the given
+        physical qubits of the device."""
+        initial_layout = (
+            None
+            if self.get_transpiled_state_circuit().layout is None
+            else physical_qubits
+        )
+
+        if clifford.num_qubits == 1:
+            # layers without a layout can be reused on every qubit
+            qubit = None if initial_layout is None else physical_qubits[0]
+            key = (single_qubit_clifford_index(clifford), qubit)
+            if key not in self._single_qubit_layers:
+                self._single_qubit_layers[key] = self.transpile(
+                    SINGLE_QUBIT_CLIFFORD_CIRCUITS[key[0]], initial_layout
+                )
+            return self._single_qubit_layers[key]
+
+        # random global Cliffords rarely repeat, caching them would only grow
+        return self.transpile(clifford.to_circuit(), initial_layout)
+
+    def make_rotated_circuit(self, cliffords: list[Clifford]) -> QuantumCircuit:
+        """Stitches the transpiled state circuit and rotation layers together.
+
+        The Cliffords act on consecutive blocks of logical qubits starting at qubit
+        0. Classical bit i holds the measurement of logical qubit i."""
+        circuit = self.get_transpiled_state_circuit().copy()
+        physical_qubits = self.get_state_qubits()
+
+        if circuit.layout is not None and any(
+            clifford.num_qubits > 1 for clifford in cliffords
+        ):
+            # SWAPs of one block may pass through the qubits of other blocks, so
+            # the whole layer is routed at once and its layout covers all qubits
+            layer = self.transpile(
+                self.make_rotation_circuit(cliffords), physical_qubits
+            )
+            circuit.compose(layer, inplace=True)
+            physical_qubits = layer.layout.final_index_layout()
+        else:
+            qubit = 0
+            for clifford in cliffords:
+                block = physical_qubits[qubit : qubit + clifford.num_qubits]
+                layer = self.get_rotation_layer(clifford, block)
+                if layer.layout is None:
+                    circuit.compose(layer, qubits=block, inplace=True)
+                else:
+                    # single-qubit layers are never routed, the qubit stays put
+                    circuit.compose(layer, inplace=True)
+                qubit += clifford.num_qubits
+            assert qubit == len(physical_qubits)
+
+        register = ClassicalRegister(len(physical_qubits), "meas")
+        circuit.add_register(register)
+        circuit.measure(physical_qubits, register)
+        return circuit
+
+    @staticmethod
+    def make_rotation_circuit(cliffords: list[Clifford]) -> QuantumCircuit:
+        """Returns the untranspiled circuit of a whole rotation on all qubits."""
+        num_qubits = sum(clifford.num_qubits for clifford in cliffords)
+        circuit = QuantumCircuit(num_qubits)
+
+        qubit = 0
+        for clifford in cliffords:
+            qargs = list(range(qubit, qubit + clifford.num_qubits))
+            circuit.compose(clifford.to_circuit(), qubits=qargs, inplace=True)
+            qubit += clifford.num_qubits
+
+        return circuit
+
+    def supports_rotation_sampling(self) -> bool:
+        return True
+
+    def sample_rotated_state(
+        self, cliffords: list[Clifford], shots: int
+    ) -> list[list[int]]:
+        return self.sample_rotated_states([cliffords], shots)[0]
+
+    def sample_rotated_states(
+        self, rotations: list[list[Clifford]], shots: int
+    ) -> list[list[list[int]]]:
+        if not rotations:
+            return []
+
+        circuits = [self.make_rotated_circuit(cliffords) for cliffords in rotations]
+        return self.run_transpiled_circuits(circuits, shots)
+
+    def run_transpiled_circuits(
+        self, circuits: list[QuantumCircuit], shots: int
+    ) -> list[list[list[int]]]:
+        """Runs circuits that are already transpiled for the backend as one job."""
+        job = self.backend.run(
+            circuits,
+            shots=shots,
+            memory=True,
+            seed_simulator=int(self.rng.integers(2**31)),
+        )
+        result = job.result()
+
+        memories = []
+        for i in range(len(circuits)):
+            memory = result.get_memory(i)
+            memories.append([[int(bit) for bit in shot][::-1] for shot in memory])
+
+        return memories
+
+    def run_circuit_and_get_measurement(self, circuit) -> list[int]:
+        return self.run_circuit_and_get_memory(circuit, 1)[0]
+
+    def run_circuits_and_get_measurements(self, circuits) -> list[list[int]]:
+        return [memory[0] for memory in self.run_circuits_and_get_memory(circuits, 1)]
+
+    def run_circuit_and_get_memory(self, circuit, shots) -> list[list[int]]:
+        return self.run_circuits_and_get_memory([circuit], shots)[0]
+
+    def run_circuits_and_get_memory(self, circuits, shots) -> list[list[list[int]]]:
+        return self.run_transpiled_circuits(self.transpile(circuits), shots)
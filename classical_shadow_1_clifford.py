@@ -1,23 +1,89 @@
+import itertools
 import random
-from functools import reduce
 
 import numpy as np
 from qiskit import QuantumCircuit
-from qiskit.quantum_info import (
-    Clifford,
-    DensityMatrix,
-    Pauli,
-    SparsePauliOp,
-    StabilizerState,
-    Statevector,
-    random_clifford,
-)
+from qiskit.quantum_info import Clifford, Pauli, PauliList, Statevector
 from qiskit.visualization import array_to_latex
 
 from abstract_cassical_shadow import AbstractClassicalShadow
+from single_qubit_cliffords import (
+    INVERTED_STATE_MATRICES,
+    INVERTED_STATE_PAULI_COEFFICIENTS,
+    NUM_SINGLE_QUBIT_CLIFFORDS,
+    NUM_STABILIZER_STATES,
+    PAULI_MATRICES,
+    POST_MEASUREMENT_CLIFFORDS,
+    POST_MEASUREMENT_STATES,
+    SINGLE_QUBIT_CLIFFORD_CIRCUITS,
+    SINGLE_QUBIT_CLIFFORDS,
+    STABILIZER_STATE_CLIFFORDS,
+    single_qubit_clifford_index,
+    stabilizer_state_index,
+)
+from snapshot_store import SnapshotStore
+
+# the non-identity Pauli and its coefficient in each inverted stabilizer state
+_STATE_PAULIS = np.argmax(INVERTED_STATE_PAULI_COEFFICIENTS[:, 1:] != 0, axis=1) + 1
+_STATE_PAULI_COEFFICIENTS = INVERTED_STATE_PAULI_COEFFICIENTS[
+    np.arange(NUM_STABILIZER_STATES), _STATE_PAULIS
+]
+
+
+def _expand_pauli_coefficients(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the indices and values of the 2^k nonzero Pauli coefficients of
+    each inverted snapshot, both of shape (len(rows), 2^k) for k qubits."""
+    indices = np.zeros((len(rows), 1), dtype=np.intp)
+    values = np.ones((len(rows), 1))
+
+    for qubit in range(rows.shape[1]):
+        states = rows[:, qubit : qubit + 1]
+        indices = np.hstack([4 * indices, 4 * indices + _STATE_PAULIS[states]])
+        values = np.hstack(
+            [
+                INVERTED_STATE_PAULI_COEFFICIENTS[states, 0] * values,
+                _STATE_PAULI_COEFFICIENTS[states] * values,
+            ]
+        )
+
+    return indices, values
+
+
+# tr(rho_s rho_t) of two inverted single-qubit snapshots: 5 for the same state,
+# -4 for the opposite state in the same basis and 1/2 for different bases
+_PAIR_KERNEL = np.einsum(
+    "sab,tba->st", INVERTED_STATE_MATRICES, INVERTED_STATE_MATRICES
+).real
 
 
 class ClassicalShadow_1_CLIFFORD(AbstractClassicalShadow):
+    SHADOW_TYPE = "1-clifford"
+
+    def create_snapshot_store(self) -> SnapshotStore:
+        # one single-qubit stabilizer state index (2 * basis + bit) per qubit
+        return SnapshotStore(self.num_qubits, dtype=np.uint8)
+
+    def encode_snapshot(self, stabilizers: list[Clifford]) -> np.ndarray:
+        return np.array(
+            [stabilizer_state_index(clifford) for clifford in stabilizers],
+            dtype=np.uint8,
+        )
+
+    def decode_snapshot(self, row: np.ndarray) -> list[Clifford]:
+        return [STABILIZER_STATE_CLIFFORDS[state] for state in row]
+
+    def encode_snapshots_batch(self, rotations, batch_results) -> np.ndarray:
+        indices = self.get_rotation_indices(rotations)
+        bits = np.array(batch_results, dtype=np.intp).reshape(-1, self.num_qubits)
+
+        invalid = (bits != 0) & (bits != 1)
+        if np.any(invalid):
+            error_msg = (
+                f"Invalid measurement result: {bits[invalid][0]}. Expected 0 or 1."
+            )
+            raise ValueError(error_msg)
+
+        return POST_MEASUREMENT_STATES[indices, bits]
 
     def compute_clifford_applied_to_measurements(
         self, cliffords: list[Clifford], measurement_results: list[int]
@@ -27,57 +93,306 @@ class ClassicalShadow_1_CLIFFORD(AbstractClassicalShadow):
 
         resulting_cliffords: list[Clifford] = []
 
-        cliff_0 = Clifford(QuantumCircuit(1))
-
-        qc_1 = QuantumCircuit(1)
-        qc_1.x(0)
-        cliff_1 = Clifford(qc_1)
-
         for i, (cliff, bit) in enumerate(zip(cliffords, measurement_results)):
             bit_val = int(bit)
 
-            if bit_val == 1:
-                base_cliff = cliff_1
-            elif bit_val == 0:
-                base_cliff = cliff_0
-            else:
+            if bit_val not in (0, 1):
                 error_msg = f"Invalid measurement result: {bit_val}. Expected 0 or 1."
                 raise ValueError(error_msg)
 
-            combined_cliff = base_cliff.compose(cliff.adjoint())
-
-            resulting_cliffords.append(combined_cliff)
+            # the states before the rotation are precomputed for all 24 Cliffords
+            index = single_qubit_clifford_index(cliff)
+            resulting_cliffords.append(POST_MEASUREMENT_CLIFFORDS[index][bit_val])
 
         return resulting_cliffords
 
+    def get_random_rotation_indices(self, num_rotations: int) -> np.ndarray:
+        """Draws the indices into SINGLE_QUBIT_CLIFFORDS of num_rotations random
+        rotations, as an array of shape (num_rotations, num_qubits)."""
+        return self.rng.integers(
+            0,
+            NUM_SINGLE_QUBIT_CLIFFORDS,
+            size=(num_rotations, self.num_qubits),
+            dtype=np.uint8,
+        )
+
     def get_random_rotations(self, num_qubits) -> list[Clifford]:
-        # S. Bravyi and D. Maslov, Hadamard-free circuits expose the structure of the Clifford group. https://arxiv.org/abs/2003.09412
-        return [random_clifford(1) for _ in range(num_qubits)]
+        indices = self.rng.integers(0, NUM_SINGLE_QUBIT_CLIFFORDS, size=num_qubits)
+        return [SINGLE_QUBIT_CLIFFORDS[index] for index in indices]
+
+    def get_random_rotations_batch(self, num_rotations: int) -> np.ndarray:
+        """Draws num_rotations random rotations as an index array of shape
+        (num_rotations, num_qubits), see get_random_rotation_indices.
+
+        Subclasses that change the rotations override this method. They may also
+        return lists of single-qubit Cliffords, which are turned into indices by
+        get_rotation_indices. Subclasses that only override get_random_rotations
+        are drawn rotation by rotation."""
+        if (
+            type(self).get_random_rotations
+            is not ClassicalShadow_1_CLIFFORD.get_random_rotations
+        ):
+            # subclasses that only override get_random_rotations keep working
+            return self.get_rotation_indices(
+                super().get_random_rotations_batch(num_rotations)
+            ).astype(np.uint8)
+
+        return self.get_random_rotation_indices(num_rotations)
+
+    def get_rotation_indices(self, rotations) -> np.ndarray:
+        """Returns the indices into SINGLE_QUBIT_CLIFFORDS of a batch of rotations,
+        as an array of shape (num_rotations, num_qubits)."""
+        if isinstance(rotations, np.ndarray):
+            return rotations.astype(np.intp).reshape(-1, self.num_qubits)
+
+        return np.array(
+            [
+                [single_qubit_clifford_index(clifford) for clifford in cliffords]
+                for cliffords in rotations
+            ],
+            dtype=np.intp,
+        ).reshape(-1, self.num_qubits)
+
+    def get_rotation_cliffords(self, rotations) -> list[list[Clifford]]:
+        if not isinstance(rotations, np.ndarray):
+            return rotations
+        return [[SINGLE_QUBIT_CLIFFORDS[index] for index in row] for row in rotations]
+
+    def sample_rotations(self, rotations, shots: int) -> list[list[list[int]]]:
+        # the protocol gets the index array, no Clifford objects are built
+        return self.shadow_protocol.sample_rotated_states_indices(
+            self.get_rotation_indices(rotations), shots
+        )
+
+    def store_memories(self, rotations, memories: list[list[list[int]]]):
+        # one table lookup per shot, no need to group identical outcomes
+        indices = np.repeat(
+            self.get_rotation_indices(rotations), self.shots_per_rotation, axis=0
+        )
+        self.append_snapshot_rows(self.encode_snapshots_batch(indices, memories))
+
+    def sum_snapshot_density_matrices(self, start: int, stop: int) -> np.ndarray:
+        rows = self.snapshot_store[start:stop]
+
+        # identical snapshots only have to be expanded once
+        unique_rows, counts = np.unique(rows, axis=0, return_counts=True)
+
+        pauli_coefficients = self.sum_pauli_coefficients(unique_rows, counts)
+        return self.pauli_coefficients_to_matrix(pauli_coefficients)
+
+    def get_reduced_density_matrix(self, qubits: list[int]) -> np.ndarray:
+        """Reconstructs the reduced density matrix of the given qubits.
+
+        Only the columns of the selected qubits are read, the first of them is the
+        leftmost tensor factor. The cost does not depend on the total number of
+        qubits."""
+        qubits = self.check_qubits(qubits)
+
+        shadow_size = self.get_shadow_size()
+        if shadow_size == 0:
+            raise ValueError("No snapshot present.")
 
-    def get_density_matrix_from_cliffords(self, log: bool = False):
-        if not self.clifford_list_list:
-            raise ValueError("No stablizers prestent.")
-        sum_rho = None
+        rows = self.snapshot_store.view()[:, qubits]
+        unique_rows, counts = np.unique(rows, axis=0, return_counts=True)
 
-        for i, row in enumerate(self.clifford_list_list):
-            inverted_qubits = []
+        pauli_coefficients = self.sum_pauli_coefficients(unique_rows, counts)
+        return self.pauli_coefficients_to_matrix(pauli_coefficients) / shadow_size
 
-            for j, cliff in enumerate(row):
-                stab = StabilizerState(cliff)
-                dm_data: DensityMatrix = self.stabilizer_to_density_matrix(stab)
+    def get_pair_reduced_density_matrices(self, chunk_size: int = 10000):
+        """Reconstructs the reduced density matrices of all qubit pairs at once.
 
-                inverted_dm = 3 * dm_data - np.eye(2)
+        Returns an array of shape (n, n, 4, 4) with the matrix of the qubits (i, j)
+        at [i, j], qubit i being the left tensor factor. The entries [i, i] are
+        not pair marginals and stay zero.
 
-                inverted_qubits.append(inverted_dm)
+        The number of snapshots with state s on qubit i and state t on qubit j is
+        one matrix product of the one-hot encoded snapshots with themselves."""
+        shadow_size = self.get_shadow_size()
+        if shadow_size == 0:
+            raise ValueError("No snapshot present.")
 
-            full_snapshot = reduce(np.kron, inverted_qubits)
+        num_qubits = self.num_qubits
+        rows = self.snapshot_store.view()
+        co_occurrences = np.zeros(
+            (num_qubits * NUM_STABILIZER_STATES, num_qubits * NUM_STABILIZER_STATES)
+        )
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size].astype(np.intp)
+            one_hot = np.zeros((len(chunk), num_qubits, NUM_STABILIZER_STATES))
+            np.put_along_axis(one_hot, chunk[..., None], 1.0, axis=2)
+            one_hot = one_hot.reshape(len(chunk), -1)
+
+            co_occurrences += one_hot.T @ one_hot
+
+        co_occurrences = co_occurrences.reshape(
+            num_qubits, NUM_STABILIZER_STATES, num_qubits, NUM_STABILIZER_STATES
+        )
+        matrices = np.einsum(
+            "isjt,sab,tcd->ijacbd",
+            co_occurrences,
+            INVERTED_STATE_MATRICES,
+            INVERTED_STATE_MATRICES,
+        ).reshape(num_qubits, num_qubits, 4, 4)
+
+        matrices[np.arange(num_qubits), np.arange(num_qubits)] = 0
+        return matrices / shadow_size
+
+    def estimate_subsystem_purities(
+        self,
+        subsystems,
+        block_size: int = 256,
+        num_pairs: int | None = None,
+        seed: int | None = None,
+    ) -> np.ndarray:
+        """U-statistic estimates of tr(rho_A^2) for every subsystem A.
+
+        The estimate is the mean of tr(rho_i^A rho_j^A) = prod_q K(s_iq, s_jq) over
+        all pairs i != j of snapshots. The pairs are evaluated in blocks of
+        block_size x block_size snapshots, the per-qubit kernel values of a block
+        are shared by all subsystems. With num_pairs only that many uniformly
+        sampled pairs are evaluated."""
+        shadow_size = self.get_shadow_size()
+        if shadow_size < 2:
+            raise ValueError("At least two snapshots are needed.")
+
+        subsystems = [self.check_qubits(subsystem) for subsystem in subsystems]
+        columns = sorted(set(itertools.chain.from_iterable(subsystems)))
+        positions = [
+            [columns.index(qubit) for qubit in qubits] for qubits in subsystems
+        ]
+
+        rows = self.snapshot_store.view()[:, columns].astype(np.intp)
+        sums = np.zeros(len(subsystems))
+
+        if num_pairs is not None:
+            rng = np.random.default_rng(seed)
+            first = rng.integers(shadow_size, size=num_pairs)
+            second = (
+                first + rng.integers(1, shadow_size, size=num_pairs)
+            ) % shadow_size
+
+            for start in range(0, num_pairs, block_size**2):
+                stop = start + block_size**2
+                values = _PAIR_KERNEL[rows[first[start:stop]], rows[second[start:stop]]]
+                for i, position in enumerate(positions):
+                    sums[i] += values[:, position].prod(axis=1).sum()
+
+            return sums / num_pairs
+
+        for start_a in range(0, shadow_size, block_size):
+            block_a = rows[start_a : start_a + block_size, None, :]
+            for start_b in range(start_a, shadow_size, block_size):
+                block_b = rows[None, start_b : start_b + block_size, :]
+                values = _PAIR_KERNEL[block_a, block_b]
+
+                # blocks below the diagonal are the transposes of the ones above
+                weight = 1 if start_a == start_b else 2
+                for i, position in enumerate(positions):
+                    sums[i] += weight * values[..., position].prod(axis=2).sum()
+
+        # remove the pairs i == j, tr(rho_i^A rho_i^A) = 5^|A|
+        sums -= shadow_size * 5.0 ** np.array([len(qubits) for qubits in subsystems])
+        return sums / (shadow_size * (shadow_size - 1))
+
+    @staticmethod
+    def sum_pauli_coefficients(
+        rows: np.ndarray, counts: np.ndarray, max_suffix_qubits: int = 8
+    ) -> np.ndarray:
+        """Returns the coefficients of the summed inverted snapshots in the Pauli
+        basis, weighted by counts, as a vector of length 4^n.
+
+        The Pauli string with Pauli p_q (I, X, Y, Z = 0, ..., 3) on qubit q has the
+        index sum_q p_q * 4^(n - 1 - q). Every inverted qubit snapshot only has an I
+        and one other Pauli component, so a snapshot touches 2^n of the 4^n
+        coefficients. Snapshots are grouped by their first qubits, so that the
+        scattered additions only go to a small vector over the remaining qubits."""
+        num_qubits = rows.shape[1]
+        num_prefix = max(0, num_qubits - max_suffix_qubits)
+        num_suffix = num_qubits - num_prefix
+
+        order = np.lexsort(rows.T[::-1])
+        rows = rows[order].astype(np.intp)
+        counts = np.asarray(counts, dtype=float)[order]
+
+        coefficients = np.zeros((4**num_prefix, 4**num_suffix))
+
+        prefix_changes = np.any(np.diff(rows[:, :num_prefix], axis=0) != 0, axis=1)
+        group_starts = np.concatenate([[0], np.nonzero(prefix_changes)[0] + 1])
+        group_stops = np.concatenate([group_starts[1:], [len(rows)]])
+
+        for start, stop in zip(group_starts, group_stops):
+            suffix_indices, suffix_values = _expand_pauli_coefficients(
+                rows[start:stop, num_prefix:]
+            )
+            suffix_coefficients = np.bincount(
+                suffix_indices.ravel(),
+                weights=(counts[start:stop, None] * suffix_values).ravel(),
+                minlength=4**num_suffix,
+            )
+
+            prefix_indices, prefix_values = _expand_pauli_coefficients(
+                rows[start : start + 1, :num_prefix]
+            )
+            coefficients[prefix_indices[0]] += (
+                prefix_values[0, :, None] * suffix_coefficients
+            )
+
+        return coefficients.ravel()
+
+    @staticmethod
+    def pauli_coefficients_to_matrix(coefficients: np.ndarray) -> np.ndarray:
+        """Turns a vector of 4^n Pauli coefficients into the 2^n x 2^n matrix."""
+        num_qubits = (len(coefficients).bit_length() - 1) // 2
+
+        # contract one Pauli axis after the other, appending its (row, col) axes
+        tensor = coefficients.reshape((4,) * num_qubits).astype(complex)
+        for _ in range(num_qubits):
+            tensor = np.tensordot(tensor, PAULI_MATRICES, axes=([0], [0]))
+
+        tensor = tensor.transpose(
+            list(range(0, 2 * num_qubits, 2)) + list(range(1, 2 * num_qubits, 2))
+        )
+        return tensor.reshape(2**num_qubits, 2**num_qubits)
+
+    @staticmethod
+    def iterate_pauli_values(
+        paulis: PauliList, rows: np.ndarray, max_chunk_entries: int = 2**24
+    ):
+        """Yields the indices of a chunk of Pauli strings and the values of all
+        snapshots for them, an array of shape (len(rows), len(chunk)).
+
+        A snapshot contributes prod_q 3 * sign_q to a Pauli string if it measured
+        every qubit of the support in the basis of the Pauli and 0 otherwise."""
+        # value of every qubit of a snapshot for the Paulis X, Y, Z
+        states = rows.astype(np.intp)
+        qubit_values = np.zeros(rows.shape + (3,))
+        np.put_along_axis(
+            qubit_values,
+            (states // 2)[..., None],
+            (3.0 * (1 - 2 * (states % 2)))[..., None],
+            axis=2,
+        )
+
+        support = paulis.x | paulis.z
+        bases = np.where(paulis.x, np.where(paulis.z, 1, 0), 2)
+        signs = 1 - 2 * (paulis.phase // 2)
+        weights = support.sum(axis=1)
+
+        # strings of the same weight are evaluated together in chunks
+        for weight in np.unique(weights):
+            terms = np.nonzero(weights == weight)[0]
+            chunk_size = max(
+                1, max_chunk_entries // (max(len(rows), 1) * max(weight, 1))
+            )
 
-            if sum_rho is None:
-                sum_rho = full_snapshot
-            else:
-                sum_rho += full_snapshot
+            for start in range(0, len(terms), chunk_size):
+                chunk = terms[start : start + chunk_size]
+                qubits = np.nonzero(support[chunk])[1].reshape(len(chunk), weight)
+                paulis_on_qubits = np.take_along_axis(bases[chunk], qubits, axis=1)
 
-        return sum_rho / len(self.clifford_list_list)
+                values = np.prod(qubit_values[:, qubits, paulis_on_qubits], axis=2)
+                yield chunk, values * signs[chunk]
 
     def make_rotated_state_circuit(
         self, cliffords: list[Clifford], state_creation_circuit: QuantumCircuit
@@ -89,7 +404,9 @@ class ClassicalShadow_1_CLIFFORD(AbstractClassicalShadow):
 
         for qubit_index in range(self.num_qubits):
             clifford: Clifford = cliffords[qubit_index]
-            clifford_circuit: QuantumCircuit = clifford.to_circuit()
+            clifford_circuit: QuantumCircuit = SINGLE_QUBIT_CLIFFORD_CIRCUITS[
+                single_qubit_clifford_index(clifford)
+            ]
             combined_circuit.compose(
                 clifford_circuit, qubits=[qubit_index], inplace=True
             )
@@ -0,0 +1,402 @@
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import (
+    Clifford,
+    PauliList,
+    Statevector,
+    random_clifford,
+)
+
+from abstract_cassical_shadow import AbstractClassicalShadow
+from median_of_means import median_of_means
+from shadow_protocol import ShadowProtocol
+from single_qubit_cliffords import PAULI_MATRICES
+from snapshot_store import (
+    SnapshotStore,
+    pack_clifford,
+    pack_tableaux,
+    packed_clifford_width,
+    unpack_clifford,
+    unpack_tableaux,
+)
+from stabilizer_tableau import post_measurement_tableaux, stabilizer_density_matrices
+
+
+class ClassicalShadow_K_CLIFFORD(AbstractClassicalShadow):
+    """Shadow with independent random Cliffords on blocks of block_size qubits.
+
+    The blocks are consecutive, starting at qubit 0, the last one is smaller if
+    block_size does not divide the number of qubits. The inverse channel factorizes
+    over the blocks, every snapshot is rho = (x)_b ((2^k_b + 1) |b><b| - I).
+    block_size=1 gives the local and block_size=n the global Clifford shadow, in
+    between the rotation depth grows with k while the variance of an observable
+    depends on how many blocks it touches instead of on its Pauli weight."""
+
+    SHADOW_TYPE = "k-clifford"
+
+    def __init__(
+        self,
+        shadow_protocol: ShadowProtocol,
+        block_size: int = 2,
+        shots_per_rotation: int = 1,
+        seed: int | None = None,
+        accumulate_density_matrix: bool = True,
+    ):
+        num_qubits = shadow_protocol.get_num_qubits()
+        if block_size < 1:
+            raise ValueError(f"Invalid block size: {block_size}. Expected at least 1.")
+
+        # the qubits of every block, needed by create_snapshot_store
+        self.block_size: int = block_size
+        self.blocks: list[list[int]] = [
+            list(range(start, min(start + block_size, num_qubits)))
+            for start in range(0, num_qubits, block_size)
+        ]
+        widths = [packed_clifford_width(len(block)) for block in self.blocks]
+        self.block_offsets: np.ndarray = np.concatenate([[0], np.cumsum(widths)])
+
+        super().__init__(
+            shadow_protocol, shots_per_rotation, seed, accumulate_density_matrix
+        )
+
+    def get_options(self) -> dict:
+        return {**super().get_options(), "block_size": self.block_size}
+
+    def get_snapshot_file_header(self) -> dict:
+        # the block size is part of the snapshot type, files of other sizes differ
+        header = super().get_snapshot_file_header()
+        header["shadow_type"] = f"{self.SHADOW_TYPE}-{self.block_size}"
+        return header
+
+    def create_snapshot_store(self) -> SnapshotStore:
+        # packed reversed post-measurement tableau of every block, one after another
+        return SnapshotStore(int(self.block_offsets[-1]), dtype=np.uint8)
+
+    def get_block_rows(self, rows: np.ndarray, block: int) -> np.ndarray:
+        return rows[:, self.block_offsets[block] : self.block_offsets[block + 1]]
+
+    def encode_snapshot(self, stabilizers: list[Clifford]) -> np.ndarray:
+        assert len(stabilizers) == len(self.blocks)
+        return np.concatenate([pack_clifford(clifford) for clifford in stabilizers])
+
+    def decode_snapshot(self, row: np.ndarray) -> list[Clifford]:
+        return [
+            unpack_clifford(self.get_block_rows(row[None], block)[0], len(qubits))
+            for block, qubits in enumerate(self.blocks)
+        ]
+
+    def compute_clifford_applied_to_measurements(
+        self, cliffords, measurement_results
+    ) -> list[Clifford]:
+        assert len(cliffords) == len(self.blocks)
+        assert len(measurement_results) == self.num_qubits
+
+        row = self.encode_snapshots_batch([cliffords], [measurement_results])[0]
+        return self.decode_snapshot(row)
+
+    def encode_snapshots_batch(self, rotations, batch_results) -> np.ndarray:
+        # every block is inverted and reversed for the whole batch at once
+        outcomes = np.array(batch_results, dtype=bool).reshape(-1, self.num_qubits)
+
+        return np.hstack(
+            [
+                pack_tableaux(
+                    post_measurement_tableaux(
+                        np.array([cliffords[block].tableau for cliffords in rotations]),
+                        outcomes[:, qubits],
+                        reverse_qubits=True,
+                    )
+                )
+                for block, qubits in enumerate(self.blocks)
+            ]
+        )
+
+    def get_random_rotations(self, num_qubits) -> list[Clifford]:
+        assert num_qubits == self.num_qubits
+        return [random_clifford(len(qubits), seed=self.rng) for qubits in self.blocks]
+
+    def make_rotated_state_circuit(
+        self, cliffords: list[Clifford], state_creation_circuit: QuantumCircuit
+    ) -> QuantumCircuit:
+        assert len(cliffords) == len(self.blocks)
+
+        combined_circuit = state_creation_circuit.copy()
+        combined_circuit.remove_final_measurements()
+
+        for clifford, qubits in zip(cliffords, self.blocks):
+            assert clifford.num_qubits == len(qubits)
+            combined_circuit.compose(clifford.to_circuit(), qubits=qubits, inplace=True)
+
+        combined_circuit.measure_all()
+        return combined_circuit
+
+    def get_block_states(
+        self, rows: np.ndarray, block: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the index of the state of a block for every row and the distinct
+        density matrices, of shape (states, 2^k, 2^k) with the first qubit of the
+        block as the leftmost tensor factor.
+
+        Rows with the same stabilizers on the block share one matrix, for small
+        blocks there are far fewer distinct states than snapshots."""
+        num_qubits = len(self.blocks[block])
+        tableaux = unpack_tableaux(self.get_block_rows(rows, block), num_qubits)
+
+        stabilizers = np.packbits(
+            tableaux[:, num_qubits:].reshape(len(rows), -1), axis=1
+        )
+        _, first, indices = np.unique(
+            stabilizers, axis=0, return_index=True, return_inverse=True
+        )
+
+        # the reversed tableaux give the block order directly in qiskit order
+        states = tableaux[first, num_qubits:]
+        matrices = stabilizer_density_matrices(
+            states[..., :num_qubits], states[..., num_qubits:-1], states[..., -1]
+        )
+        return indices.reshape(-1), matrices
+
+    def get_inverted_block_states(
+        self, rows: np.ndarray, block: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Like get_block_states, with the matrices (2^k + 1) |b><b| - I."""
+        indices, states = self.get_block_states(rows, block)
+        dimension = states.shape[1]
+        return indices, (dimension + 1) * states - np.eye(dimension)
+
+    def sum_snapshot_density_matrices(
+        self, start: int, stop: int, max_chunk_entries: int = 2**24
+    ) -> np.ndarray:
+        rows = self.snapshot_store[start:stop]
+
+        # identical snapshots only have to be expanded once
+        unique_rows, counts = np.unique(rows, axis=0, return_counts=True)
+        block_states = [
+            self.get_inverted_block_states(unique_rows, block)
+            for block in range(len(self.blocks))
+        ]
+
+        dimension = 2**self.num_qubits
+        sum_rho = np.zeros((dimension, dimension), dtype=complex)
+        chunk_size = max(1, max_chunk_entries // dimension**2)
+
+        for chunk_start in range(0, len(unique_rows), chunk_size):
+            chunk = slice(chunk_start, chunk_start + chunk_size)
+
+            # Kronecker product of the inverted block states, block 0 leftmost
+            indices, matrices = block_states[0]
+            products = matrices[indices[chunk]]
+            for indices, matrices in block_states[1:]:
+                factors = matrices[indices[chunk]]
+                size = products.shape[1] * factors.shape[1]
+                products = np.einsum("iab,icd->iacbd", products, factors).reshape(
+                    -1, size, size
+                )
+
+            sum_rho += np.einsum("i,iab->ab", counts[chunk], products)
+
+        return sum_rho
+
+    def estimate_subsystem_purities(
+        self, subsystems, max_chunk_entries: int = 2**24
+    ) -> np.ndarray:
+        """U-statistic estimates of tr(rho_A^2) for every subsystem A.
+
+        The reduced inverted snapshot X_i is the tensor product over the blocks
+        touching A of (2^k + 1) tr_rest(|b><b|) - 2^k / 2^|a| I, with a the part of
+        A in the block, the other blocks have trace 1. As for global Cliffords the
+        pair sum is bilinear, sum_{i != j} tr(X_i X_j) = |sum_i X_i|^2 -
+        sum_i |X_i|^2, so it takes one pass over the distinct snapshots."""
+        shadow_size = self.get_shadow_size()
+        if shadow_size < 2:
+            raise ValueError("At least two snapshots are needed.")
+
+        rows = self.snapshot_store.view()
+        subsystems = [self.check_qubits(subsystem) for subsystem in subsystems]
+        block_states = {}
+
+        purities = np.empty(len(subsystems))
+        for i, qubits in enumerate(subsystems):
+            # reduced inverted states of every touched block
+            indices = []
+            factors = []
+            for block, block_qubits in enumerate(self.blocks):
+                kept = [q - block_qubits[0] for q in block_qubits if q in qubits]
+                if not kept:
+                    continue
+
+                if block not in block_states:
+                    block_states[block] = self.get_block_states(rows, block)
+                block_indices, states = block_states[block]
+
+                dim_block = 2 ** len(block_qubits)
+                dim_kept = 2 ** len(kept)
+                reduced = self.partial_trace(states, len(block_qubits), kept)
+                indices.append(block_indices)
+                factors.append(
+                    (dim_block + 1) * reduced - dim_block / dim_kept * np.eye(dim_kept)
+                )
+
+            # snapshots with the same states on the touched blocks are summed once
+            combinations, counts = np.unique(
+                np.column_stack(indices), axis=0, return_counts=True
+            )
+
+            dimension = 2 ** len(qubits)
+            state_sum = np.zeros((dimension, dimension), dtype=complex)
+            square_sum = 0.0
+            chunk_size = max(1, max_chunk_entries // dimension**2)
+
+            for start in range(0, len(combinations), chunk_size):
+                chunk = combinations[start : start + chunk_size]
+                chunk_counts = counts[start : start + chunk_size]
+
+                products = factors[0][chunk[:, 0]]
+                for j, matrices in enumerate(factors[1:], start=1):
+                    block_factors = matrices[chunk[:, j]]
+                    size = products.shape[1] * block_factors.shape[1]
+                    products = np.einsum(
+                        "iab,icd->iacbd", products, block_factors
+                    ).reshape(-1, size, size)
+
+                state_sum += np.einsum("i,iab->ab", chunk_counts, products)
+                square_sum += chunk_counts @ np.sum(np.abs(products) ** 2, axis=(1, 2))
+
+            overlap_sum = np.sum(np.abs(state_sum) ** 2) - square_sum
+            purities[i] = overlap_sum / (shadow_size * (shadow_size - 1))
+
+        return purities
+
+    @staticmethod
+    def partial_trace(states: np.ndarray, num_qubits: int, kept: list[int]):
+        """Reduces a batch of matrices of shape (batch, 2^n, 2^n), qubit 0 as the
+        leftmost tensor factor, to the qubits kept (in increasing order)."""
+        tensor = states.reshape((len(states),) + (2,) * (2 * num_qubits))
+
+        for qubit in reversed(range(num_qubits)):
+            if qubit in kept:
+                continue
+            remaining = (tensor.ndim - 1) // 2
+            tensor = np.trace(tensor, axis1=1 + qubit, axis2=1 + qubit + remaining)
+
+        dimension = 2 ** len(kept)
+        return tensor.reshape(len(states), dimension, dimension)
+
+    def iterate_pauli_values(
+        self, paulis: PauliList, rows: np.ndarray, max_chunk_entries: int = 2**24
+    ):
+        """Yields the indices of a chunk of Pauli strings and the values of all
+        snapshots for them, an array of shape (len(rows), len(chunk)).
+
+        A snapshot contributes prod_b tr(P_b rho_b) to a Pauli string with the parts
+        P_b on the blocks. That is 1 for the identity and (2^k + 1) <b|P_b|b>,
+        which is 0 or +-(2^k + 1), otherwise. The expectation values are computed
+        once per distinct block state and block Pauli."""
+        # Pauli index I, X, Y, Z = 0, ..., 3 of every string and qubit
+        codes = np.where(paulis.x, np.where(paulis.z, 2, 1), np.where(paulis.z, 3, 0))
+        signs = 1 - 2 * (paulis.phase // 2)
+
+        block_states = [
+            self.get_block_states(rows, block) for block in range(len(self.blocks))
+        ]
+        chunk_size = max(1, max_chunk_entries // max(len(rows), 1))
+
+        for start in range(0, len(paulis), chunk_size):
+            chunk = np.arange(start, min(start + chunk_size, len(paulis)))
+            values = np.ones((len(rows), len(chunk))) * signs[chunk]
+
+            for qubits, (indices, states) in zip(self.blocks, block_states):
+                dimension = 2 ** len(qubits)
+                block_paulis, pauli_indices = np.unique(
+                    codes[chunk][:, qubits], axis=0, return_inverse=True
+                )
+
+                # tr(P_b rho_b) for every distinct block state and block Pauli
+                table = np.empty((len(states), len(block_paulis)))
+                for i, block_pauli in enumerate(block_paulis):
+                    if not block_pauli.any():
+                        table[:, i] = 1
+                        continue
+
+                    matrix = PAULI_MATRICES[block_pauli[0]]
+                    for code in block_pauli[1:]:
+                        matrix = np.kron(matrix, PAULI_MATRICES[code])
+                    expectations = np.einsum("ab,sba->s", matrix, states).real
+                    table[:, i] = (dimension + 1) * expectations
+
+                values *= table[indices][:, pauli_indices.reshape(-1)]
+
+            yield chunk, values
+
+    def make_tracker_values(self, target):
+        # a Clifford is tracked by its fidelity, anything else as an observable
+        if not isinstance(target, Clifford):
+            return super().make_tracker_values(target)
+
+        state = self.get_target_state(target)
+
+        def values(rows: np.ndarray) -> np.ndarray:
+            return self.compute_fidelity_values(state, rows)
+
+        return values
+
+    def get_target_state(self, clifford_a: Clifford) -> np.ndarray:
+        """Statevector of clifford_a|0> in the qubit order of the snapshots."""
+        return Statevector(clifford_a.to_circuit()).reverse_qargs().data
+
+    def compute_fidelity_values(
+        self,
+        state: np.ndarray,
+        rows: np.ndarray | None = None,
+        max_chunk_entries: int = 2**22,
+    ) -> np.ndarray:
+        """Returns <a|rho_i|a> for every stored snapshot (or the given rows).
+
+        The inverted block states are applied to |a> one block after the other,
+        (2^k + 1) |b><b|a> - |a>, which costs O(2^n * 2^k) per snapshot and block."""
+        if rows is None:
+            rows = self.snapshot_store.view()
+
+        dims = [2 ** len(qubits) for qubits in self.blocks]
+        block_states = [
+            self.get_inverted_block_states(rows, block)
+            for block in range(len(self.blocks))
+        ]
+
+        values = np.empty(len(rows))
+        chunk_size = max(1, max_chunk_entries // len(state))
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            batch = len(values[chunk])
+            tensor = np.broadcast_to(state.reshape([1] + dims), [batch] + dims)
+
+            for block, (indices, matrices) in enumerate(block_states):
+                tensor = np.moveaxis(tensor, block + 1, -1)
+                tensor = np.einsum("i...b,iab->i...a", tensor, matrices[indices[chunk]])
+                tensor = np.moveaxis(tensor, -1, block + 1)
+
+            values[chunk] = np.real(tensor.reshape(batch, -1) @ state.conj())
+
+        return values
+
+    def calculate_fidelity(
+        self,
+        clifford_a: Clifford,
+        num_batches: int | None = 3,
+        delta: float | None = None,
+        seed: int | None = None,
+    ):
+        """Median-of-means estimate of the fidelity with the state clifford_a|0>.
+
+        The per-snapshot values are shuffled before batching, with the seed of the
+        shadow unless another seed is given."""
+        values = self.compute_fidelity_values(self.get_target_state(clifford_a))
+
+        if len(values) == 0:
+            raise ValueError("Shadow list is empty.")
+
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        fidelity, _ = median_of_means(values, num_batches, delta, rng)
+
+        return float(fidelity)
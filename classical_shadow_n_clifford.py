@@ -1,20 +1,41 @@
-import random
-import statistics
-
 import numpy as np
 from qiskit import QuantumCircuit
-from qiskit.quantum_info import (
-    Clifford,
-    DensityMatrix,
-    StabilizerState,
-    random_clifford,
-)
+from qiskit.quantum_info import Clifford, PauliList, StabilizerState, random_clifford
 from qiskit.visualization import array_to_latex
 
 from abstract_cassical_shadow import AbstractClassicalShadow
+from median_of_means import median_of_means
+from snapshot_store import (
+    SnapshotStore,
+    pack_clifford,
+    pack_tableaux,
+    packed_clifford_width,
+    unpack_clifford,
+    unpack_tableaux,
+)
+from stabilizer_tableau import (
+    adjoint_tableaux,
+    apply_clifford,
+    post_measurement_tableaux,
+    reverse_tableau_qubits,
+    stabilizer_pauli_expectations,
+    zero_state_overlaps,
+)
 
 
 class ClassicalShadow_N_CLIFFORD(AbstractClassicalShadow):
+    SHADOW_TYPE = "n-clifford"
+
+    def create_snapshot_store(self) -> SnapshotStore:
+        # packed tableau bits and phases of the reversed post-measurement Clifford
+        return SnapshotStore(packed_clifford_width(self.num_qubits), dtype=np.uint8)
+
+    def encode_snapshot(self, stabilizers: list[Clifford]) -> np.ndarray:
+        assert len(stabilizers) == 1
+        return pack_clifford(stabilizers[0])
+
+    def decode_snapshot(self, row: np.ndarray) -> list[Clifford]:
+        return [unpack_clifford(row, self.num_qubits)]
 
     def compute_clifford_applied_to_measurements(
         self, cliffords, measurement_results
@@ -22,47 +43,117 @@ class ClassicalShadow_N_CLIFFORD(AbstractClassicalShadow):
         assert len(cliffords) == 1
         assert len(measurement_results) == self.num_qubits
 
-        base_state_qc = QuantumCircuit(self.num_qubits)
-
-        for i, bit in enumerate(measurement_results):
-            if bit == 1:
-                base_state_qc.x(i)
+        grouped = self.compute_clifford_applied_to_grouped_measurements(
+            cliffords, {tuple(measurement_results): 1}
+        )
+        return grouped[0][0]
 
-        base_cliff = Clifford(base_state_qc)
-
-        pre_measurement_cliff = base_cliff.compose(cliffords[0].adjoint())
-
-        qc_reverse = QuantumCircuit(self.num_qubits)
-        for i in range(self.num_qubits // 2):
-            qc_reverse.swap(i, self.num_qubits - 1 - i)
-
-        clifford_reverse = Clifford(qc_reverse)
-        reversed_cliff = pre_measurement_cliff.compose(clifford_reverse)
+    def compute_clifford_applied_to_grouped_measurements(
+        self, cliffords, outcome_counts: dict[tuple[int, ...], int]
+    ) -> list[tuple[list[Clifford], int]]:
+        assert len(cliffords) == 1
 
-        return [reversed_cliff]
+        outcomes = np.array(list(outcome_counts), dtype=bool).reshape(
+            -1, self.num_qubits
+        )
+
+        # the inverse rotation and the qubit reversal are shared by all outcomes
+        reversed_adjoint = reverse_tableau_qubits(
+            adjoint_tableaux(cliffords[0].tableau[None])
+        )
+        tableaux = np.repeat(reversed_adjoint, len(outcomes), axis=0)
+        tableaux[:, self.num_qubits :, -1] ^= outcomes
+
+        return [
+            ([Clifford(tableau, validate=False)], count)
+            for tableau, count in zip(tableaux, outcome_counts.values())
+        ]
+
+    def encode_snapshots_batch(self, rotations, batch_results) -> np.ndarray:
+        # all rotations of the batch are inverted and reversed at once
+        tableaux = np.array([cliffords[0].tableau for cliffords in rotations])
+        post_measurement = post_measurement_tableaux(
+            tableaux, batch_results, reverse_qubits=True
+        )
+        return pack_tableaux(post_measurement)
 
     def get_random_rotations(self, num_qubits):
         # S. Bravyi and D. Maslov, Hadamard-free circuits expose the structure of the Clifford group. https://arxiv.org/abs/2003.09412
-        return [random_clifford(num_qubits)]
-
-    def get_density_matrix_from_cliffords(self):
-        if not self.clifford_list_list:
-            raise ValueError("No snapshot present.")
-
-        sum_rho = None
-        for i, row in enumerate(self.clifford_list_list):
-            assert len(row) == 1
-            stab = StabilizerState(row[0])
-            dm_data: DensityMatrix = self.stabilizer_to_density_matrix(stab)
-            inverted_dm = ((2**self.num_qubits) + 1) * dm_data - np.eye(
-                2**self.num_qubits
+        return [random_clifford(num_qubits, seed=self.rng)]
+
+    def sum_snapshot_density_matrices(
+        self, start: int, stop: int, chunk_size: int = 256
+    ) -> np.ndarray:
+        # sum_k (2^n + 1) |b_k><b_k| - I as one matrix product of the statevectors
+        dimension = 2**self.num_qubits
+        sum_rho = -(stop - start) * np.eye(dimension, dtype=complex)
+
+        for chunk_start in range(start, stop, chunk_size):
+            vectors = np.array(
+                [
+                    self.stabilizer_to_state_vector(StabilizerState(row[0]))
+                    for row in self.clifford_list_list[
+                        chunk_start : min(chunk_start + chunk_size, stop)
+                    ]
+                ]
             )
-            if sum_rho is None:
-                sum_rho = inverted_dm
-            else:
-                sum_rho += inverted_dm
+            sum_rho += (dimension + 1) * (vectors.T @ vectors.conj())
 
-        return sum_rho / len(self.clifford_list_list)
+        return sum_rho
+
+    def estimate_subsystem_purities(
+        self, subsystems, chunk_size: int = 256
+    ) -> np.ndarray:
+        """U-statistic estimates of tr(rho_A^2) for every subsystem A.
+
+        With X_i = (2^n + 1) sigma_i - 2^|B| I the reduced inverted snapshots and
+        sigma_i the reduced states, the sum over all pairs i != j is bilinear:
+        sum_{i != j} tr(sigma_i sigma_j) = |sum_i sigma_i|^2 - sum_i |sigma_i|^2.
+        So the pair sum is exact in one pass over the snapshots, the reduced
+        states of a chunk come from one matrix product of the statevectors."""
+        shadow_size = self.get_shadow_size()
+        if shadow_size < 2:
+            raise ValueError("At least two snapshots are needed.")
+
+        n_qubits = self.num_qubits
+        dimension = 2**n_qubits
+        subsystems = [self.check_qubits(subsystem) for subsystem in subsystems]
+
+        state_sums = [np.zeros((2 ** len(q), 2 ** len(q)), complex) for q in subsystems]
+        square_sums = np.zeros(len(subsystems))
+
+        for start in range(0, shadow_size, chunk_size):
+            # axis q of a statevector tensor belongs to qubit q of the shadow
+            vectors = np.array(
+                [
+                    self.stabilizer_to_state_vector(StabilizerState(row[0]))
+                    for row in self.clifford_list_list[start : start + chunk_size]
+                ]
+            ).reshape((-1,) + (2,) * n_qubits)
+
+            for i, qubits in enumerate(subsystems):
+                rest = [qubit for qubit in range(n_qubits) if qubit not in qubits]
+                amplitudes = vectors.transpose(
+                    [0] + [1 + qubit for qubit in qubits + rest]
+                ).reshape(len(vectors), 2 ** len(qubits), -1)
+
+                reduced = amplitudes @ amplitudes.conj().transpose(0, 2, 1)
+                state_sums[i] += reduced.sum(axis=0)
+                square_sums[i] += np.sum(np.abs(reduced) ** 2)
+
+        num_pairs = shadow_size * (shadow_size - 1)
+        purities = np.empty(len(subsystems))
+        for i, qubits in enumerate(subsystems):
+            dim_a = 2 ** len(qubits)
+            dim_b = dimension // dim_a
+
+            overlap_sum = np.sum(np.abs(state_sums[i]) ** 2) - square_sums[i]
+            purities[i] = (
+                (dimension + 1) ** 2 * overlap_sum
+                + num_pairs * (dim_b**2 * dim_a - 2 * (dimension + 1) * dim_b)
+            ) / num_pairs
+
+        return purities
 
     def make_rotated_state_circuit(
         self, cliffords: list[Clifford], state_creation_circuit: QuantumCircuit
@@ -81,55 +172,111 @@ class ClassicalShadow_N_CLIFFORD(AbstractClassicalShadow):
 
         return combined_circuit
 
-    def calculate_fidelity(self, clifford_a: Clifford):
-        n_qubits = self.num_qubits
-
-        # change qbit order of input clifford
-        qc_reverse = QuantumCircuit(n_qubits)
-        for i in range(n_qubits // 2):
-            qc_reverse.swap(i, n_qubits - 1 - i)
-        clifford_reverse = Clifford(qc_reverse)
+    def compute_overlaps(
+        self, clifford_a: Clifford, rows: np.ndarray | None = None, chunk_size=1000
+    ):
+        """Returns |<a|b>|^2 for every stored snapshot b (or the given rows), with
+        a = clifford_a|0> in the qubit order of the snapshots.
 
-        clifford_a = clifford_a.compose(clifford_reverse)
-
-        clifford_list_list = self.clifford_list_list
-        overlaps: list[float] = []
+        The stabilizers of b are conjugated by the adjoint of clifford_a, which
+        leaves the overlap of a^dagger b|0> with |0>, read off the tableau in
+        O(n^3) per snapshot."""
+        n_qubits = self.num_qubits
+        if rows is None:
+            rows = self.snapshot_store.view()
+        overlaps = np.empty(len(rows))
 
         cliff_a_inv = clifford_a.adjoint()
 
-        for cliff_list in clifford_list_list:
-            assert len(cliff_list) == 1
-            cliff_b: Clifford = cliff_list[0]
-
-            # |<a|b>|^2
-            combined_cliff = cliff_b.compose(cliff_a_inv)
-            zero_state = StabilizerState(combined_cliff)
+        for start in range(0, len(rows), chunk_size):
+            tableaux = unpack_tableaux(rows[start : start + chunk_size], n_qubits)
+            batch = len(tableaux)
+
+            # stabilizer generators of all snapshots as one list of Paulis
+            x, z, r = apply_clifford(
+                tableaux[:, n_qubits:, :n_qubits].reshape(-1, n_qubits),
+                tableaux[:, n_qubits:, n_qubits:-1].reshape(-1, n_qubits),
+                tableaux[:, n_qubits:, -1].reshape(-1),
+                cliff_a_inv,
+                list(range(n_qubits)),
+            )
 
-            probs = zero_state.probabilities_dict()
-            overlap = probs.get("0" * n_qubits, 0.0)
+            overlaps[start : start + batch] = zero_state_overlaps(
+                x.reshape(batch, n_qubits, n_qubits),
+                z.reshape(batch, n_qubits, n_qubits),
+                r.reshape(batch, n_qubits),
+            )
 
-            overlaps.append(overlap)
+        return overlaps
 
-        if not overlaps:
-            raise ValueError("Shadow list is empty.")
+    def iterate_pauli_values(
+        self, paulis: PauliList, rows: np.ndarray, max_chunk_entries: int = 2**24
+    ):
+        """Yields the indices of a chunk of Pauli strings and the values of all
+        snapshots for them, an array of shape (len(rows), len(chunk)).
 
-        num_batches = 3
+        A snapshot contributes (2^n + 1) <b|P|b> - tr(P), the expectation is read
+        off the tableau of b in O(n^2) per snapshot and Pauli string."""
+        n_qubits = self.num_qubits
+        dimension = 2**n_qubits
+
+        # the snapshot tableaux have the qubit order reversed
+        x = paulis.x[:, ::-1]
+        z = paulis.z[:, ::-1]
+        signs = 1 - 2 * (paulis.phase // 2)
+        identities = ~(paulis.x | paulis.z).any(axis=1)
+
+        chunk_size = max(1, max_chunk_entries // (max(len(rows), 1) * n_qubits))
+        tableaux = unpack_tableaux(rows, n_qubits)
+
+        for start in range(0, len(paulis), chunk_size):
+            chunk = np.arange(start, min(start + chunk_size, len(paulis)))
+            expectations = stabilizer_pauli_expectations(tableaux, x[chunk], z[chunk])
+            values = (dimension + 1.0) * expectations - dimension * identities[chunk]
+            yield chunk, values * signs[chunk]
+
+    def reverse_qubits(self, clifford: Clifford) -> Clifford:
+        """Changes the qubit order of a Clifford to the one of the snapshots."""
+        return Clifford(reverse_tableau_qubits(clifford.tableau), validate=False)
+
+    def make_tracker_values(self, clifford_a: Clifford):
+        # a Clifford is tracked by its fidelity, anything else as an observable
+        if not isinstance(clifford_a, Clifford):
+            return super().make_tracker_values(clifford_a)
+
+        # per snapshot fidelity estimate (2^n + 1) |<a|b>|^2 - 1
+        clifford_a = self.reverse_qubits(clifford_a)
+        dimension = 2**self.num_qubits
+
+        def values(rows: np.ndarray) -> np.ndarray:
+            return (dimension + 1) * self.compute_overlaps(clifford_a, rows) - 1
+
+        return values
+
+    def calculate_fidelity(
+        self,
+        clifford_a: Clifford,
+        num_batches: int | None = 3,
+        delta: float | None = None,
+        seed: int | None = None,
+    ):
+        """Median-of-means estimate of the fidelity with the state clifford_a|0>.
+
+        The overlaps are shuffled before batching, with the seed of the shadow
+        unless another seed is given."""
+        n_qubits = self.num_qubits
 
-        if len(overlaps) < num_batches:
-            representative_overlap = sum(overlaps) / len(overlaps)
-        else:
-            random.shuffle(overlaps)
-            batch_size = len(overlaps) // num_batches
-            batch_means = []
+        # change qbit order of input clifford
+        clifford_a = self.reverse_qubits(clifford_a)
 
-            for i in range(num_batches):
+        overlaps = self.compute_overlaps(clifford_a)
 
-                batch = overlaps[i * batch_size : (i + 1) * batch_size]
-                batch_mean = sum(batch) / len(batch)
-                batch_means.append(batch_mean)
+        if len(overlaps) == 0:
+            raise ValueError("Shadow list is empty.")
 
-            representative_overlap = statistics.median(batch_means)
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        representative_overlap, _ = median_of_means(overlaps, num_batches, delta, rng)
 
-        fidelity = (2**n_qubits + 1) * representative_overlap - 1
+        fidelity = (2**n_qubits + 1) * float(representative_overlap) - 1
 
         return fidelity
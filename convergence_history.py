@@ -0,0 +1,178 @@
+import threading
+
+import numpy as np
+
+
+class _MinMaxBins:
+    """Min/max summary of a stream of points with increasing x.
+
+    The points are grouped into bins of equal width in u = x (or u = log x). When
+    there are more than 2 * max_bins bins, neighbouring bins are merged and the
+    width doubles, so appending costs amortized O(1) and the summary never has
+    more than 2 * max_bins + 1 bins."""
+
+    def __init__(self, max_bins: int, log: bool):
+        self.max_bins = max_bins
+        self.log = log
+
+        self.origin: float | None = None
+        self.width: float | None = None
+        self.keys: list[int] = []
+        # per bin: first x, last x, min y, max y, min lower band, max upper band
+        self.values = np.empty((2 * max_bins + 2, 6))
+
+    def transform(self, x: float) -> float:
+        return float(np.log(x)) if self.log else float(x)
+
+    def append(self, x: float, y: float, lower: float, upper: float):
+        if self.log and x <= 0:
+            return
+
+        u = self.transform(x)
+        if self.origin is None:
+            self.origin = u
+        elif self.width is None and u > self.origin:
+            # the first distance between two points sets the initial bin width
+            self.width = u - self.origin
+
+        key = 0 if self.width is None else int((u - self.origin) // self.width)
+
+        if self.keys and self.keys[-1] == key:
+            row = self.values[len(self.keys) - 1]
+            row[1] = x
+            row[2] = min(row[2], y)
+            row[3] = max(row[3], y)
+            row[4] = np.fmin(row[4], lower)
+            row[5] = np.fmax(row[5], upper)
+        else:
+            self.values[len(self.keys)] = (x, x, y, y, lower, upper)
+            self.keys.append(key)
+
+        if len(self.keys) > 2 * self.max_bins:
+            self._merge()
+
+    def _merge(self):
+        keys = np.array(self.keys) // 2
+        values = self.values[: len(keys)]
+
+        starts = np.concatenate([[0], np.nonzero(np.diff(keys))[0] + 1])
+        merged = np.column_stack(
+            [
+                values[starts, 0],
+                values[np.concatenate([starts[1:], [len(keys)]]) - 1, 1],
+                np.minimum.reduceat(values[:, 2], starts),
+                np.maximum.reduceat(values[:, 3], starts),
+                np.fmin.reduceat(values[:, 4], starts),
+                np.fmax.reduceat(values[:, 5], starts),
+            ]
+        )
+
+        self.values[: len(merged)] = merged
+        self.keys = keys[starts].tolist()
+        self.width *= 2
+
+    def get(self) -> np.ndarray:
+        return self.values[: len(self.keys)]
+
+
+class ConvergenceHistory:
+    """History of an estimate over the shadow size, with optional error bars.
+
+    All points are kept in growable numpy arrays. Min/max summaries in linear
+    and logarithmic x are updated on every append, so a decimated view for
+    plotting costs O(max_bins) no matter how long the run is. Points have to be
+    appended with increasing x. Appending and decimating are locked, so one
+    thread can draw a history while another one appends to it."""
+
+    def __init__(self, capacity: int = 1024, max_bins: int = 1024):
+        self._data: np.ndarray = np.empty((max(capacity, 1), 3))
+        self._size: int = 0
+        self.max_bins = max_bins
+
+        self._bins = {
+            False: _MinMaxBins(max_bins, log=False),
+            True: _MinMaxBins(max_bins, log=True),
+        }
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    @property
+    def x(self) -> np.ndarray:
+        with self._lock:
+            return self._data[: self._size, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        with self._lock:
+            return self._data[: self._size, 1]
+
+    @property
+    def errors(self) -> np.ndarray:
+        with self._lock:
+            return self._data[: self._size, 2]
+
+    def append(self, x: float, y: float, error: float = np.nan):
+        with self._lock:
+            self._append(x, y, error)
+
+    def _append(self, x: float, y: float, error: float):
+        if self._size and x < self._data[self._size - 1, 0]:
+            raise ValueError("Points have to be appended with increasing x.")
+
+        if self._size == len(self._data):
+            data = np.empty((2 * len(self._data), 3))
+            data[: self._size] = self._data[: self._size]
+            self._data = data
+
+        self._data[self._size] = (x, y, error)
+        self._size += 1
+
+        for bins in self._bins.values():
+            bins.append(x, y, y - error, y + error)
+
+    def extend(self, xs, ys, errors=None):
+        if errors is None:
+            errors = np.full(len(xs), np.nan)
+        for x, y, error in zip(xs, ys, errors):
+            self.append(x, y, error)
+
+    def decimate(self, num_points: int, log_x: bool = False):
+        """Returns x, y and the lower and upper band with about num_points points.
+
+        Every group of bins contributes its minimum at its first and its maximum
+        at its last x, so peaks survive the decimation. The band is nan where no
+        error bars were given."""
+        with self._lock:
+            values = self._bins[log_x].get().copy()
+        if len(values) == 0:
+            empty = np.empty(0)
+            return empty, empty, empty, empty
+
+        group = max(1, -(-len(values) // max(num_points // 2, 1)))
+        starts = np.arange(0, len(values), group)
+        stops = np.minimum(starts + group, len(values)) - 1
+
+        first_x = values[starts, 0]
+        last_x = values[stops, 1]
+        y_min = np.minimum.reduceat(values[:, 2], starts)
+        y_max = np.maximum.reduceat(values[:, 3], starts)
+        lower = np.fmin.reduceat(values[:, 4], starts)
+        upper = np.fmax.reduceat(values[:, 5], starts)
+
+        # a single point per group if it only holds one x
+        single = first_x == last_x
+        xs = np.column_stack([first_x, last_x])
+        ys = np.column_stack([y_min, np.where(single, y_min, y_max)])
+        keep = np.column_stack([np.ones_like(single), ~single])
+
+        return (
+            xs[keep],
+            ys[keep],
+            np.repeat(lower, keep.sum(axis=1)),
+            np.repeat(upper, keep.sum(axis=1)),
+        )
@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+
+
+def num_batches_for_failure_probability(delta: float, num_estimates: int = 1) -> int:
+    """Number of batches K = ceil(2 ln(L / delta)) for which the median of means
+    of L estimates misses the error bound of its batch means with probability at
+    most delta for all of them together (union bound over the L estimates)."""
+    if not 0 < delta < 1:
+        raise ValueError(f"Invalid failure probability: {delta}.")
+    if num_estimates < 1:
+        raise ValueError(f"Invalid number of estimates: {num_estimates}.")
+
+    return max(1, math.ceil(2 * math.log(num_estimates / delta)))
+
+
+def resolve_num_batches(
+    num_batches: int | None, delta: float | None, num_estimates: int = 1
+) -> int:
+    """Returns the batch count, derived from delta if it is given. delta bounds
+    the joint failure probability of all num_estimates estimates."""
+    if delta is not None:
+        return num_batches_for_failure_probability(delta, num_estimates)
+    if num_batches is None or num_batches < 1:
+        raise ValueError(f"Invalid number of batches: {num_batches}.")
+    return num_batches
+
+
+def batch_boundaries(num_values: int, num_batches: int) -> np.ndarray:
+    """Splits num_values consecutive values into num_batches batches of (almost)
+    equal size. Returns the num_batches + 1 boundaries."""
+    num_batches = min(num_batches, num_values)
+    if num_batches < 1:
+        raise ValueError("No values present.")
+
+    return np.linspace(0, num_values, num_batches + 1).astype(int)
+
+
+def batch_means(
+    values: np.ndarray, num_batches: int, rng: np.random.Generator | None = None
+) -> np.ndarray:
+    """Means of consecutive batches along the first axis, shape (batches, ...).
+
+    With an rng the values are shuffled along the first axis before batching."""
+    values = np.asarray(values)
+    if rng is not None:
+        values = values[rng.permutation(len(values))]
+    boundaries = batch_boundaries(len(values), num_batches)
+
+    sums = np.add.reduceat(values, boundaries[:-1], axis=0)
+    sizes = np.diff(boundaries).reshape((-1,) + (1,) * (values.ndim - 1))
+    return sums / sizes
+
+
+def median_of_batch_means(
+    means: np.ndarray, axis: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the median over the batch axis and its error bar.
+
+    Many estimates are reduced at once, e.g. an (observables x batches) array with
+    axis=-1. The error bar is the standard error of the batch means scaled by
+    sqrt(pi / 2), the relative efficiency of the median for normally distributed
+    batch means. It is nan for a single batch."""
+    means = np.asarray(means)
+    num_batches = means.shape[axis]
+
+    estimates = np.median(means, axis=axis)
+    if num_batches < 2:
+        return estimates, np.full_like(estimates, np.nan, dtype=float)
+
+    errors = (
+        np.sqrt(np.pi / 2) * np.std(means, axis=axis, ddof=1) / np.sqrt(num_batches)
+    )
+    return estimates, errors
+
+
+def median_of_means(
+    values: np.ndarray,
+    num_batches: int | None = 10,
+    delta: float | None = None,
+    rng: np.random.Generator | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Median-of-means estimate along the first axis (the snapshots).
+
+    The batch count is derived from the failure probability delta if it is given,
+    which then bounds the failure of all estimates together. With an rng the
+    values are shuffled before batching."""
+    values = np.asarray(values)
+    num_batches = resolve_num_batches(num_batches, delta, math.prod(values.shape[1:]))
+    return median_of_batch_means(batch_means(values, num_batches, rng))
+
+
+class MedianOfMeansAccumulator:
+    """Running median of means over a stream of values.
+
+    The values are distributed round-robin over the batches, so all batches keep
+    (almost) the same size. Only the batch sums are stored, adding values costs
+    O(values) and an estimate O(batches), independent of the stream length."""
+
+    def __init__(
+        self,
+        num_batches: int | None = 10,
+        shape: tuple = (),
+        delta: float | None = None,
+    ):
+        num_batches = resolve_num_batches(num_batches, delta, math.prod(shape))
+
+        self.sums: np.ndarray = np.zeros((num_batches,) + tuple(shape))
+        self.counts: np.ndarray = np.zeros(num_batches, dtype=np.int64)
+        self.num_values: int = 0
+
+    @property
+    def num_batches(self) -> int:
+        return len(self.counts)
+
+    def add(self, values: np.ndarray):
+        """Adds values of shape (m,) + shape."""
+        values = np.asarray(values, dtype=float)
+        batch = (self.num_values + np.arange(len(values))) % self.num_batches
+
+        np.add.at(self.sums, batch, values)
+        self.counts += np.bincount(batch, minlength=self.num_batches)
+        self.num_values += len(values)
+
+    def reset(self):
+        self.sums[:] = 0
+        self.counts[:] = 0
+        self.num_values = 0
+
+    def estimate(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the median of the batch means and its error bar."""
+        filled = self.counts > 0
+        if not filled.any():
+            raise ValueError("No values present.")
+
+        counts = self.counts[filled].reshape((-1,) + (1,) * (self.sums.ndim - 1))
+        return median_of_batch_means(self.sums[filled] / counts)
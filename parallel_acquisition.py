@@ -0,0 +1,93 @@
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from abstract_cassical_shadow import AbstractClassicalShadow
+from shadow_protocol import ShadowProtocol
+
+
+def shard_seeds(seed: int | None, num_shards: int) -> list[tuple[int, int]]:
+    """Spawns independent (protocol seed, rotation seed) pairs, one per shard.
+
+    The pairs only depend on the master seed and the shard index."""
+    seeds = []
+    for child in np.random.SeedSequence(seed).spawn(num_shards):
+        protocol_seed, rotation_seed = child.generate_state(2, dtype=np.uint64)
+        seeds.append((int(protocol_seed), int(rotation_seed)))
+    return seeds
+
+
+def _acquire_shard(
+    shadow_class: type[AbstractClassicalShadow],
+    protocol_factory: Callable[[int], ShadowProtocol],
+    options: dict,
+    num_rotations: int,
+    protocol_seed: int,
+    rotation_seed: int,
+) -> np.ndarray:
+    # every shard has its own protocol (and simulator) and random streams
+    shadow = shadow_class(
+        protocol_factory(protocol_seed),
+        **options,
+        seed=rotation_seed,
+        accumulate_density_matrix=False,
+    )
+    shadow.add_snapshots(num_rotations)
+    return np.array(shadow.snapshot_store.view())
+
+
+def add_snapshots_parallel(
+    shadow: AbstractClassicalShadow,
+    num_rotations: int,
+    protocol_factory: Callable[[int], ShadowProtocol],
+    seed: int | None = None,
+    num_shards: int = 32,
+    max_workers: int | None = None,
+):
+    """Acquires snapshots in a process pool and appends them to the shadow.
+
+    num_rotations counts random rotations like add_snapshots, each of them adds
+    shots_per_rotation snapshots. The rotations are split into a fixed number of
+    shards. Every shard builds its own protocol with protocol_factory(seed) and
+    its own shadow, both seeded from a SeedSequence spawned from the master seed.
+    The shards are appended in order, so the result for a given seed does not
+    depend on the number of workers.
+
+    protocol_factory has to be picklable, e.g. a module-level function or a
+    functools.partial of a protocol class. With max_workers=1 the shards are
+    acquired in this process."""
+    if num_rotations < 0:
+        raise ValueError(f"Invalid number of rotations: {num_rotations}.")
+    if num_shards < 1:
+        raise ValueError(
+            f"Invalid number of shards: {num_shards}. Expected at least 1."
+        )
+
+    base_size, remainder = divmod(num_rotations, num_shards)
+    shard_sizes = [base_size + (shard < remainder) for shard in range(num_shards)]
+    tasks = [
+        (
+            type(shadow),
+            protocol_factory,
+            shadow.get_options(),
+            size,
+            protocol_seed,
+            rotation_seed,
+        )
+        for size, (protocol_seed, rotation_seed) in zip(
+            shard_sizes, shard_seeds(seed, num_shards)
+        )
+        if size > 0
+    ]
+
+    if max_workers == 1:
+        shards = (_acquire_shard(*task) for task in tasks)
+        for rows in shards:
+            shadow.append_snapshot_rows(rows)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_acquire_shard, *task) for task in tasks]
+        for future in futures:
+            shadow.append_snapshot_rows(future.result())
@@ -1,6 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
 
+import numpy as np
 from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford
+
+from single_qubit_cliffords import SINGLE_QUBIT_CLIFFORDS
 
 
 class ShadowProtocol(ABC):
@@ -16,3 +21,82 @@ class ShadowProtocol(ABC):
     @abstractmethod
     def run_circuit_and_get_measurement(self, circuit):
         raise NotImplementedError("This function is not yet implemented.")
+
+    def run_circuits_and_get_measurements(
+        self, circuits: list[QuantumCircuit]
+    ) -> list[list[int]]:
+        """Runs a batch of circuits and returns one measurement result per circuit.
+
+        Protocols that can submit several circuits in a single job should override
+        this, the default runs the circuits one by one."""
+        return [self.run_circuit_and_get_measurement(circuit) for circuit in circuits]
+
+    def run_circuit_and_get_memory(
+        self, circuit: QuantumCircuit, shots: int
+    ) -> list[list[int]]:
+        """Runs the circuit with the given number of shots and returns the
+        measurement result of every single shot (per-shot memory)."""
+        raise NotImplementedError(
+            "This protocol does not support multi-shot snapshots."
+        )
+
+    def run_circuits_and_get_memory(
+        self, circuits: list[QuantumCircuit], shots: int
+    ) -> list[list[list[int]]]:
+        """Batched version of run_circuit_and_get_memory, one memory per circuit."""
+        return [self.run_circuit_and_get_memory(circuit, shots) for circuit in circuits]
+
+    async def run_circuit_and_get_measurement_async(
+        self, circuit: QuantumCircuit
+    ) -> list[int]:
+        """Awaitable version of run_circuit_and_get_measurement.
+
+        Protocols for remote backends should override this to submit the job and
+        await its result, the default runs the blocking call in a worker thread."""
+        return await asyncio.to_thread(self.run_circuit_and_get_measurement, circuit)
+
+    async def run_circuit_and_get_memory_async(
+        self, circuit: QuantumCircuit, shots: int
+    ) -> list[list[int]]:
+        """Awaitable version of run_circuit_and_get_memory."""
+        return await asyncio.to_thread(self.run_circuit_and_get_memory, circuit, shots)
+
+    def supports_rotation_sampling(self) -> bool:
+        """Whether the protocol can sample the rotated state directly from the
+        rotation Cliffords, without building and running a circuit."""
+        return False
+
+    def sample_rotated_state(
+        self, cliffords: list[Clifford], shots: int
+    ) -> list[list[int]]:
+        """Applies the rotation to the state and returns the measurement result
+        of every shot.
+
+        The Cliffords act on consecutive blocks of qubits starting at qubit 0,
+        e.g. one single-qubit Clifford per qubit or one Clifford on all qubits."""
+        raise NotImplementedError("This protocol does not support rotation sampling.")
+
+    def sample_rotated_states(
+        self, rotations: list[list[Clifford]], shots: int
+    ) -> list[list[list[int]]]:
+        """Batched version of sample_rotated_state, one memory per rotation."""
+        return [self.sample_rotated_state(cliffords, shots) for cliffords in rotations]
+
+    def sample_rotated_states_indices(
+        self, indices: np.ndarray, shots: int
+    ) -> list[list[list[int]]]:
+        """Version of sample_rotated_states for local rotations, given as an array
+        of shape (rotations, qubits) of indices into SINGLE_QUBIT_CLIFFORDS.
+
+        Protocols that can work on the indices directly should override this, the
+        default builds the Cliffords and calls sample_rotated_states."""
+        return self.sample_rotated_states(
+            [[SINGLE_QUBIT_CLIFFORDS[index] for index in row] for row in indices], shots
+        )
+
+    async def sample_rotated_states_async(
+        self, rotations: list[list[Clifford]], shots: int
+    ) -> list[list[list[int]]]:
+        """Awaitable version of sample_rotated_states, the default samples in a
+        worker thread."""
+        return await asyncio.to_thread(self.sample_rotated_states, rotations, shots)
@@ -0,0 +1,107 @@
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford
+
+# The six single-qubit stabilizer states are indexed by 2 * basis + bit, with the
+# bases X, Y, Z (0, 1, 2) and bit 0 for the +1 and bit 1 for the -1 eigenstate.
+NUM_STABILIZER_STATES = 6
+
+
+def _enumerate_single_qubit_cliffords() -> list[Clifford]:
+    # every single-qubit Clifford is a product of H and S gates
+    qc_h = QuantumCircuit(1)
+    qc_h.h(0)
+    qc_s = QuantumCircuit(1)
+    qc_s.s(0)
+    generators = [Clifford(qc_h), Clifford(qc_s)]
+
+    cliffords = [Clifford(QuantumCircuit(1))]
+    seen = {cliffords[0].tableau.tobytes()}
+    for clifford in cliffords:
+        for generator in generators:
+            candidate = clifford.compose(generator)
+            key = candidate.tableau.tobytes()
+            if key not in seen:
+                seen.add(key)
+                cliffords.append(candidate)
+
+    assert len(cliffords) == 24
+    return cliffords
+
+
+def stabilizer_state_index(clifford: Clifford) -> int:
+    """Returns the index of the single-qubit stabilizer state clifford|0>."""
+    x, z, sign = clifford.stab_x[0, 0], clifford.stab_z[0, 0], clifford.stab_phase[0]
+    basis = 2 if not x else (1 if z else 0)
+    return 2 * basis + int(sign)
+
+
+SINGLE_QUBIT_CLIFFORDS: list[Clifford] = _enumerate_single_qubit_cliffords()
+NUM_SINGLE_QUBIT_CLIFFORDS = len(SINGLE_QUBIT_CLIFFORDS)
+
+SINGLE_QUBIT_CLIFFORD_CIRCUITS: list[QuantumCircuit] = [
+    clifford.to_circuit() for clifford in SINGLE_QUBIT_CLIFFORDS
+]
+SINGLE_QUBIT_CLIFFORD_ADJOINTS: list[Clifford] = [
+    clifford.adjoint() for clifford in SINGLE_QUBIT_CLIFFORDS
+]
+
+# POST_MEASUREMENT_CLIFFORDS[c][b] prepares U_c^dagger |b>, the state of the qubit
+# before rotation c when b was measured, POST_MEASUREMENT_STATES holds its index.
+_BASIS_CLIFFORDS = [Clifford.from_label("I"), Clifford.from_label("X")]
+
+POST_MEASUREMENT_CLIFFORDS: list[list[Clifford]] = [
+    [base.compose(adjoint) for base in _BASIS_CLIFFORDS]
+    for adjoint in SINGLE_QUBIT_CLIFFORD_ADJOINTS
+]
+POST_MEASUREMENT_STATES: np.ndarray = np.array(
+    [
+        [stabilizer_state_index(clifford) for clifford in row]
+        for row in POST_MEASUREMENT_CLIFFORDS
+    ],
+    dtype=np.uint8,
+)
+
+# one Clifford preparing each of the six stabilizer states
+STABILIZER_STATE_CLIFFORDS: list[Clifford] = [
+    POST_MEASUREMENT_CLIFFORDS[c][b]
+    for c, b in (
+        np.argwhere(POST_MEASUREMENT_STATES == state)[0]
+        for state in range(NUM_STABILIZER_STATES)
+    )
+]
+
+_INDEX_BY_ID = {id(clifford): i for i, clifford in enumerate(SINGLE_QUBIT_CLIFFORDS)}
+_INDEX_BY_TABLEAU = {
+    clifford.tableau.tobytes(): i for i, clifford in enumerate(SINGLE_QUBIT_CLIFFORDS)
+}
+
+
+def single_qubit_clifford_index(clifford: Clifford) -> int:
+    """Returns the index of a single-qubit Clifford in SINGLE_QUBIT_CLIFFORDS."""
+    index = _INDEX_BY_ID.get(id(clifford))
+    if index is None:
+        index = _INDEX_BY_TABLEAU.get(clifford.tableau.tobytes())
+    if index is None:
+        raise ValueError("Not a single-qubit Clifford.")
+    return index
+
+
+# 3 |s><s| - I for each stabilizer state s, the inverted single-qubit snapshots
+STABILIZER_STATE_VECTORS: np.ndarray = np.array(
+    [clifford.to_matrix()[:, 0] for clifford in STABILIZER_STATE_CLIFFORDS]
+)
+INVERTED_STATE_MATRICES: np.ndarray = 3 * np.einsum(
+    "si,sj->sij", STABILIZER_STATE_VECTORS, STABILIZER_STATE_VECTORS.conj()
+) - np.eye(2)
+
+# I, X, Y, Z and the coefficients of the inverted snapshots in this basis,
+# 3 |s><s| - I = (I + 3 * sign * P) / 2 for s the eigenstate of P with sign
+PAULI_MATRICES: np.ndarray = np.array(
+    [[[1, 0], [0, 1]], [[0, 1], [1, 0]], [[0, -1j], [1j, 0]], [[1, 0], [0, -1]]]
+)
+INVERTED_STATE_PAULI_COEFFICIENTS: np.ndarray = np.zeros((NUM_STABILIZER_STATES, 4))
+INVERTED_STATE_PAULI_COEFFICIENTS[:, 0] = 0.5
+INVERTED_STATE_PAULI_COEFFICIENTS[np.arange(6), 1 + np.arange(6) // 2] = 1.5 * (
+    1 - 2 * (np.arange(6) % 2)
+)
@@ -0,0 +1,156 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# Layout of a snapshot file: the magic bytes, the length of the header as uint32,
+# the JSON header padded with spaces to a multiple of 64 bytes and then the raw
+# snapshot rows, appended one after another until the end of the file.
+MAGIC = b"CSHADOW\x00"
+VERSION = 1
+_ALIGNMENT = 64
+
+
+def make_header(
+    num_qubits: int, shadow_type: str, row_width: int, dtype, seeds: list
+) -> dict:
+    return {
+        "version": VERSION,
+        "num_qubits": num_qubits,
+        "shadow_type": shadow_type,
+        "row_width": row_width,
+        "dtype": np.dtype(dtype).str,
+        "seeds": list(seeds),
+    }
+
+
+def _encode_header(header: dict) -> bytes:
+    payload = json.dumps(header).encode("utf-8")
+    prefix_length = len(MAGIC) + 4
+    padded_length = -(-(prefix_length + len(payload)) // _ALIGNMENT) * _ALIGNMENT
+    payload = payload.ljust(padded_length - prefix_length, b" ")
+
+    return MAGIC + np.uint32(len(payload)).tobytes() + payload
+
+
+def _read_header(file) -> tuple[dict, int]:
+    magic = file.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError("Not a snapshot file.")
+
+    length = int(np.frombuffer(file.read(4), dtype=np.uint32)[0])
+    header = json.loads(file.read(length).decode("utf-8"))
+    if header["version"] != VERSION:
+        raise ValueError(f"Unsupported snapshot file version: {header['version']}.")
+
+    return header, len(MAGIC) + 4 + length
+
+
+def read_header(path) -> dict:
+    with open(path, "rb") as file:
+        return _read_header(file)[0]
+
+
+def check_compatible(header: dict, other: dict):
+    for key in ("num_qubits", "shadow_type", "row_width", "dtype"):
+        if header[key] != other[key]:
+            raise ValueError(
+                f"Incompatible snapshot files: {key} {header[key]} != {other[key]}."
+            )
+
+
+def write_snapshot_file(path, header: dict, rows: np.ndarray):
+    """Creates (or overwrites) a snapshot file with the given rows."""
+    with open(path, "wb") as file:
+        file.write(_encode_header(header))
+        file.write(np.ascontiguousarray(rows, dtype=header["dtype"]).tobytes())
+
+
+def open_snapshot_file(path) -> tuple[dict, np.ndarray]:
+    """Returns the header and a read-only memory map of the rows of a file.
+
+    The rows are only read from disk when they are accessed."""
+    with open(path, "rb") as file:
+        header, offset = _read_header(file)
+
+    dtype = np.dtype(header["dtype"])
+    row_bytes = header["row_width"] * dtype.itemsize
+    num_rows = (os.path.getsize(path) - offset) // row_bytes
+    shape = (num_rows, header["row_width"])
+
+    if num_rows == 0:
+        return header, np.empty(shape, dtype=dtype)
+
+    return header, np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+class SnapshotFileWriter:
+    """Appends snapshot rows to an existing snapshot file.
+
+    Every append is flushed, so an interrupted acquisition keeps all snapshots
+    written so far. A partially written last row is cut off when reopening."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.header, offset = _read_header(file)
+
+        row_bytes = self.header["row_width"] * np.dtype(self.header["dtype"]).itemsize
+        num_rows = (os.path.getsize(path) - offset) // row_bytes
+
+        self._file = open(path, "r+b")
+        self._file.truncate(offset + num_rows * row_bytes)
+        self._file.seek(0, os.SEEK_END)
+        self.num_rows: int = num_rows
+
+    def append(self, rows: np.ndarray):
+        rows = np.ascontiguousarray(rows, dtype=self.header["dtype"]).reshape(
+            -1, self.header["row_width"]
+        )
+        self._file.write(rows.tobytes())
+        self._file.flush()
+        self.num_rows += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+def merge_snapshot_files(paths, out_path, chunk_size: int = 100_000) -> dict:
+    """Concatenates the rows of several compatible snapshot files into a new file.
+
+    The header of the merged file lists the seeds of all runs. The rows are
+    written to a temporary file next to out_path, which replaces out_path at the
+    end, so out_path may also be one of the inputs."""
+    if not paths:
+        raise ValueError("No snapshot files to merge.")
+
+    headers = [read_header(path) for path in paths]
+    for header in headers[1:]:
+        check_compatible(headers[0], header)
+
+    merged_header = dict(headers[0])
+    merged_header["seeds"] = [seed for header in headers for seed in header["seeds"]]
+    directory = os.path.dirname(os.path.abspath(out_path))
+    file, tmp_path = tempfile.mkstemp(suffix=".shadow", dir=directory)
+    os.close(file)
+
+    try:
+        write_snapshot_file(tmp_path, merged_header, np.empty((0, 0)))
+
+        writer = SnapshotFileWriter(tmp_path)
+        try:
+            for path in paths:
+                _, rows = open_snapshot_file(path)
+                for start in range(0, len(rows), chunk_size):
+                    writer.append(rows[start : start + chunk_size])
+                del rows
+        finally:
+            writer.close()
+
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return merged_header
@@ -0,0 +1,120 @@
+from collections.abc import Callable, Sequence
+
+import numpy as np
+from qiskit.quantum_info import Clifford
+
+
+class SnapshotStore:
+    """Growable array of snapshot rows with a fixed width.
+
+    Appends reallocate with doubled capacity, so appending M rows costs amortized
+    O(M). All read access goes through read-only views into the buffer."""
+
+    def __init__(self, row_width: int, dtype=np.uint8, capacity: int = 1024):
+        self._data: np.ndarray = np.empty((max(capacity, 1), row_width), dtype=dtype)
+        self._size: int = 0
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray) -> "SnapshotStore":
+        """Wraps existing rows, e.g. a memory map, without copying them. The rows
+        are only copied into a new buffer on the next append."""
+        store = cls.__new__(cls)
+        store._data = rows
+        store._size = len(rows)
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def row_width(self) -> int:
+        return self._data.shape[1]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    def append(self, rows: np.ndarray):
+        rows = np.asarray(rows, dtype=self.dtype).reshape(-1, self.row_width)
+        new_size = self._size + len(rows)
+
+        if new_size > len(self._data):
+            capacity = max(new_size, 2 * len(self._data))
+            data = np.empty((capacity, self.row_width), dtype=self.dtype)
+            data[: self._size] = self._data[: self._size]
+            self._data = data
+
+        self._data[self._size : new_size] = rows
+        self._size = new_size
+
+    def view(self) -> np.ndarray:
+        """Returns a read-only view of all stored rows without copying."""
+        rows = self._data[: self._size]
+        rows.flags.writeable = False
+        return rows
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+
+class SnapshotView(Sequence):
+    """Read-only sequence that decodes stored rows into lists of Cliffords."""
+
+    def __init__(
+        self, store: SnapshotStore, decode: Callable[[np.ndarray], list[Clifford]]
+    ):
+        self._store = store
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(row) for row in self._store[index]]
+        return self._decode(self._store[index])
+
+
+def packed_clifford_width(num_qubits: int) -> int:
+    """Number of bytes of a packed n-qubit Clifford tableau including phases."""
+    return (4 * num_qubits**2 + 7) // 8 + (2 * num_qubits + 7) // 8
+
+
+def pack_tableaux(tableaux: np.ndarray) -> np.ndarray:
+    """Packs a batch of Clifford tableaux of shape (batch, 2n, 2n + 1) into rows
+    of symplectic bits followed by phase bits."""
+    tableaux = np.asarray(tableaux, dtype=bool)
+    batch = len(tableaux)
+
+    symplectic = np.packbits(tableaux[:, :, :-1].reshape(batch, -1), axis=1)
+    phases = np.packbits(tableaux[:, :, -1], axis=1)
+
+    return np.hstack([symplectic, phases])
+
+
+def unpack_tableaux(rows: np.ndarray, num_qubits: int) -> np.ndarray:
+    """Inverse of pack_tableaux, returns bool tableaux of shape (batch, 2n, 2n + 1)."""
+    rows = np.asarray(rows, dtype=np.uint8).reshape(
+        -1, packed_clifford_width(num_qubits)
+    )
+    batch = len(rows)
+    num_rows = 2 * num_qubits
+    symplectic_bytes = (num_rows**2 + 7) // 8
+
+    tableaux = np.empty((batch, num_rows, num_rows + 1), dtype=bool)
+    tableaux[:, :, :-1] = np.unpackbits(
+        rows[:, :symplectic_bytes], axis=1, count=num_rows**2
+    ).reshape(batch, num_rows, num_rows)
+    tableaux[:, :, -1] = np.unpackbits(
+        rows[:, symplectic_bytes:], axis=1, count=num_rows
+    )
+
+    return tableaux
+
+
+def pack_clifford(clifford: Clifford) -> np.ndarray:
+    return pack_tableaux(clifford.tableau[None])[0]
+
+
+def unpack_clifford(row: np.ndarray, num_qubits: int) -> Clifford:
+    return Clifford(unpack_tableaux(row, num_qubits)[0], validate=False)
@@ -0,0 +1,49 @@
+from collections.abc import Callable
+
+import numpy as np
+
+from median_of_means import MedianOfMeansAccumulator, resolve_num_batches
+
+
+class SnapshotTracker:
+    """Estimate of a registered target that is updated with every new snapshot.
+
+    `values` maps snapshot rows to one value per row (and per observable), whose
+    mean over all snapshots is the tracked quantity."""
+
+    def __init__(
+        self,
+        values: Callable[[np.ndarray], np.ndarray],
+        num_batches: int | None = 10,
+        delta: float | None = None,
+    ):
+        self.values = values
+        self.accumulator: MedianOfMeansAccumulator | None = None
+        # validated now, the batch count from delta depends on the number of values
+        resolve_num_batches(num_batches, delta)
+        self.num_batches = num_batches
+        self.delta = delta
+
+    def add(self, rows: np.ndarray):
+        if len(rows) == 0:
+            return
+
+        values = self.values(rows)
+        if self.accumulator is None:
+            self.accumulator = MedianOfMeansAccumulator(
+                self.num_batches, values.shape[1:], self.delta
+            )
+        self.accumulator.add(values)
+
+    def reset(self):
+        if self.accumulator is not None:
+            self.accumulator.reset()
+
+    @property
+    def num_snapshots(self) -> int:
+        return 0 if self.accumulator is None else self.accumulator.num_values
+
+    def estimate(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.num_snapshots == 0:
+            raise ValueError("No snapshot present.")
+        return self.accumulator.estimate()
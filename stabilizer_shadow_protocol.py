@@ -0,0 +1,119 @@
+import numpy as np
+from qiskit.exceptions import QiskitError
+from qiskit.quantum_info import Clifford
+
+from aer_shadow_protocol import AerShadowProtocol
+from single_qubit_cliffords import SINGLE_QUBIT_CLIFFORDS, single_qubit_clifford_index
+from stabilizer_tableau import (
+    apply_clifford,
+    apply_single_qubit_cliffords,
+    sample_stabilizer_states,
+    single_qubit_conjugation_table,
+    stabilizer_rows,
+)
+
+# conjugation tables of all single-qubit Cliffords, indexed like SINGLE_QUBIT_CLIFFORDS
+CONJUGATION_TABLES = np.array(
+    [single_qubit_conjugation_table(clifford) for clifford in SINGLE_QUBIT_CLIFFORDS]
+)
+
+
+class StabilizerShadowProtocol(AerShadowProtocol):
+    """Protocol that samples snapshots of Clifford states without a simulator.
+
+    Subclasses only provide the state circuit. If it is a Clifford circuit the
+    stabilizer tableau of the state is built once and every rotation is applied
+    directly to the tableau before sampling the measurement outcomes. Other state
+    circuits fall back to running the rotated circuits on the simulator of
+    AerShadowProtocol."""
+
+    def __init__(self, seed=None, backend=None):
+        super().__init__(seed, backend)
+
+        self._state_clifford: Clifford | None = None
+        self._is_clifford_state: bool | None = None
+        self._state_rows: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    def get_state_clifford(self) -> Clifford | None:
+        """Returns the Clifford preparing the state, None for non-Clifford states."""
+        if self._is_clifford_state is None:
+            circuit = self.get_state_circuit().copy()
+            circuit.remove_final_measurements()
+            try:
+                self._state_clifford = Clifford(circuit)
+                self._is_clifford_state = True
+            except QiskitError:
+                self._is_clifford_state = False
+
+        return self._state_clifford
+
+    def get_state_rows(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the cached stabilizer generators of a Clifford state, they must
+        not be modified."""
+        if self._state_rows is None:
+            self._state_rows = stabilizer_rows(self.get_state_clifford())
+        return self._state_rows
+
+    def sample_rotated_states(
+        self, rotations: list[list[Clifford]], shots: int
+    ) -> list[list[list[int]]]:
+        state_clifford = self.get_state_clifford()
+        if state_clifford is None:
+            return super().sample_rotated_states(rotations, shots)
+        if not rotations:
+            return []
+
+        num_qubits = state_clifford.num_qubits
+        if all(
+            len(cliffords) == num_qubits
+            and all(clifford.num_qubits == 1 for clifford in cliffords)
+            for cliffords in rotations
+        ):
+            indices = np.array(
+                [
+                    [single_qubit_clifford_index(clifford) for clifford in cliffords]
+                    for cliffords in rotations
+                ]
+            )
+            return self.sample_rotated_states_indices(indices, shots)
+
+        x, z, r = self.get_state_rows()
+        rotated = [self.apply_cliffords(x, z, r, cliffords) for cliffords in rotations]
+        x, z, r = (np.array(part) for part in zip(*rotated))
+
+        outcomes = sample_stabilizer_states(x, z, r, shots, self.rng)
+        return outcomes.astype(int).tolist()
+
+    def sample_rotated_states_indices(
+        self, indices: np.ndarray, shots: int
+    ) -> list[list[list[int]]]:
+        if self.get_state_clifford() is None:
+            return super().sample_rotated_states_indices(indices, shots)
+        if len(indices) == 0:
+            return []
+
+        # one conjugation table per rotation and qubit, shape (batch, n, 4, 3)
+        x, z, r = self.get_state_rows()
+        x, z, r = apply_single_qubit_cliffords(
+            x[None], z[None], r[None], CONJUGATION_TABLES[indices]
+        )
+
+        outcomes = sample_stabilizer_states(x, z, r, shots, self.rng)
+        return outcomes.astype(int).tolist()
+
+    def sample_rotated_state(
+        self, cliffords: list[Clifford], shots: int
+    ) -> list[list[int]]:
+        return self.sample_rotated_states([cliffords], shots)[0]
+
+    @staticmethod
+    def apply_cliffords(x, z, r, cliffords: list[Clifford]):
+        """Conjugates the generators by Cliffords on consecutive blocks of qubits."""
+        qubit = 0
+        for clifford in cliffords:
+            qargs = list(range(qubit, qubit + clifford.num_qubits))
+            x, z, r = apply_clifford(x, z, r, clifford, qargs)
+            qubit += clifford.num_qubits
+        assert qubit == x.shape[-1]
+
+        return x, z, r
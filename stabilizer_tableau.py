@@ -0,0 +1,363 @@
+import numpy as np
+from qiskit.quantum_info import Clifford, Pauli, PauliList
+
+from single_qubit_cliffords import PAULI_MATRICES
+
+# The stabilizer generators of a state are stored as boolean arrays x, z of shape
+# (..., n, n) and sign bits r of shape (..., n). Row i is the Hermitian Pauli
+# (-1)^r_i * P(x_i, z_i) where x = z = 1 on a qubit denotes Y (Aaronson-Gottesman).
+
+
+def stabilizer_rows(clifford: Clifford) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns copies of the stabilizer generators of the state clifford|0>."""
+    return (
+        clifford.stab_x.copy(),
+        clifford.stab_z.copy(),
+        clifford.stab_phase.copy(),
+    )
+
+
+def pauli_product_exponent(x1, z1, x2, z2) -> np.ndarray:
+    """Exponent of i picked up per qubit when multiplying P(x1, z1) * P(x2, z2)."""
+    x1 = x1.astype(np.int8)
+    z1 = z1.astype(np.int8)
+    x2 = x2.astype(np.int8)
+    z2 = z2.astype(np.int8)
+
+    return (
+        x1 * z1 * (z2 - x2)
+        + x1 * (1 - z1) * z2 * (2 * x2 - 1)
+        + (1 - x1) * z1 * x2 * (1 - 2 * z2)
+    )
+
+
+def multiply_rows(x, z, r, batch_index, target, source):
+    """Replaces the rows `target` by the products with the rows `source` in place.
+
+    Both rows have to commute, which is always the case for generators of the same
+    stabilizer group, so the product is again a Hermitian Pauli with a sign."""
+    sx, sz = x[batch_index, source], z[batch_index, source]
+    tx, tz = x[batch_index, target], z[batch_index, target]
+
+    exponent = (
+        2 * r[batch_index, target].astype(np.int64)
+        + 2 * r[batch_index, source].astype(np.int64)
+        + pauli_product_exponent(sx, sz, tx, tz).sum(axis=-1)
+    ) % 4
+    assert np.all(exponent % 2 == 0), "Rows do not commute."
+
+    r[batch_index, target] = exponent == 2
+    x[batch_index, target] = tx ^ sx
+    z[batch_index, target] = tz ^ sz
+
+
+def reduce_x_block(x, z, r) -> np.ndarray:
+    """Gaussian elimination of the X block of a batch of stabilizer generators.
+
+    Works in place on arrays of shape (batch, n, n) and (batch, n). Returns a mask
+    of the rows that keep an X part, they form a reduced basis of the X block. All
+    other rows end up as Z-type generators (-1)^r * Z^z."""
+    batch, num_rows, num_qubits = x.shape
+    batch_range = np.arange(batch)
+    pivot_rows = np.zeros((batch, num_rows), dtype=bool)
+
+    for col in range(num_qubits):
+        candidates = x[:, :, col] & ~pivot_rows
+        has_pivot = candidates.any(axis=1)
+        if not has_pivot.any():
+            continue
+
+        pivot = np.argmax(candidates, axis=1)
+
+        targets = x[:, :, col] & has_pivot[:, None]
+        targets[batch_range, pivot] = False
+
+        batch_index, target = np.nonzero(targets)
+        if len(batch_index):
+            multiply_rows(x, z, r, batch_index, target, pivot[batch_index])
+
+        pivot_rows[batch_range[has_pivot], pivot[has_pivot]] = True
+
+    return pivot_rows
+
+
+def solve_gf2(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Returns one solution v of a @ v = b over GF(2) for a batch of systems of
+    shape (batch, m, n) and (batch, m), free variables are set to 0.
+
+    The systems have to be consistent, which holds for the Z-type generators of a
+    stabilizer state."""
+    a = a.copy()
+    b = b.copy()
+    batch, num_rows, num_cols = a.shape
+    batch_range = np.arange(batch)
+    pivot_rows = np.zeros((batch, num_rows), dtype=bool)
+    solution = np.zeros((batch, num_cols), dtype=bool)
+    pivot_of_col = np.full((batch, num_cols), -1)
+
+    for col in range(num_cols):
+        candidates = a[:, :, col] & ~pivot_rows
+        has_pivot = candidates.any(axis=1)
+        if not has_pivot.any():
+            continue
+
+        pivot = np.argmax(candidates, axis=1)
+
+        targets = a[:, :, col] & has_pivot[:, None]
+        targets[batch_range, pivot] = False
+
+        batch_index, target = np.nonzero(targets)
+        a[batch_index, target] ^= a[batch_index, pivot[batch_index]]
+        b[batch_index, target] ^= b[batch_index, pivot[batch_index]]
+
+        pivot_rows[batch_range[has_pivot], pivot[has_pivot]] = True
+        pivot_of_col[has_pivot, col] = pivot[has_pivot]
+
+    assert not np.any(b & ~pivot_rows), "Inconsistent linear system."
+
+    # the pivot columns are reduced in all rows, so they take the right-hand side
+    batch_index, col = np.nonzero(pivot_of_col >= 0)
+    solution[batch_index, col] = b[batch_index, pivot_of_col[batch_index, col]]
+
+    return solution
+
+
+def sample_stabilizer_states(x, z, r, shots: int, rng: np.random.Generator):
+    """Samples computational basis measurements of a batch of stabilizer states.
+
+    The outcomes are uniformly distributed over an affine subspace: the Z-type
+    generators fix an offset, the X block spans the directions. Works on copies of
+    arrays of shape (batch, n, n) and (batch, n) and returns a bool array of shape
+    (batch, shots, n) with the outcome of qubit i in column i."""
+    x = x.copy()
+    z = z.copy()
+    r = r.copy()
+
+    pivot_rows = reduce_x_block(x, z, r)
+
+    # the rows with an X part drop out of the system for the offset
+    offset = solve_gf2(z & ~pivot_rows[..., None], r & ~pivot_rows)
+    directions = (x & pivot_rows[..., None]).astype(np.uint8)
+
+    coefficients = rng.integers(0, 2, size=(len(x), shots, x.shape[1]), dtype=np.uint8)
+    # the uint8 sums may wrap around, but 256 is even and keeps the parity
+    outcomes = (coefficients @ directions) % 2
+
+    return outcomes.astype(bool) ^ offset[:, None]
+
+
+def single_qubit_conjugation_table(clifford: Clifford) -> np.ndarray:
+    """Returns the images U P U^dagger of the Paulis I, Z, X, Y (indexed by 2x + z)
+    as rows (x, z, sign) of a (4, 3) bool array."""
+    assert clifford.num_qubits == 1
+
+    table = np.zeros((4, 3), dtype=bool)
+    for index, label in enumerate(["I", "Z", "X", "Y"]):
+        image = Pauli(label).evolve(clifford, frame="s")
+        table[index] = [image.x[0], image.z[0], image.phase == 2]
+
+    return table
+
+
+def apply_single_qubit_cliffords(x, z, r, tables: np.ndarray):
+    """Conjugates the stabilizer generators by a tensor product of single-qubit
+    Cliffords, given as one conjugation table per qubit of shape (n, 4, 3) or as
+    one such set of tables per state of shape (batch, n, 4, 3)."""
+    num_qubits = x.shape[-1]
+    index = 2 * x.astype(np.intp) + z
+    if tables.ndim == 3:
+        images = tables[np.arange(num_qubits), index]
+    else:
+        # one set of tables per state of a batch, shape (batch, n, 4, 3)
+        batch_index = np.arange(len(tables))[:, None, None]
+        images = tables[batch_index, np.arange(num_qubits), index]
+
+    new_r = r ^ (np.count_nonzero(images[..., 2], axis=-1) % 2).astype(bool)
+    return images[..., 0], images[..., 1], new_r
+
+
+def apply_clifford(x, z, r, clifford: Clifford, qargs: list[int]):
+    """Conjugates the stabilizer generators by a Clifford acting on qargs."""
+    paulis = PauliList.from_symplectic(z, x, 2 * r.astype(np.int64))
+    evolved = paulis.evolve(clifford, qargs=qargs, frame="s")
+
+    return evolved.x.copy(), evolved.z.copy(), evolved.phase == 2
+
+
+def zero_state_overlaps(x, z, r) -> np.ndarray:
+    """Returns |<0|psi>|^2 for a batch of stabilizer states psi.
+
+    The overlap is 2^-k for k the rank of the X block if all Z-type generators have
+    a + sign, and 0 otherwise. Works in place on arrays of shape (batch, n, n)."""
+    pivot_rows = reduce_x_block(x, z, r)
+
+    rank = np.count_nonzero(pivot_rows, axis=1)
+    consistent = ~np.any(r & ~pivot_rows, axis=1)
+
+    return np.where(consistent, 2.0**-rank, 0.0)
+
+
+# Batched Clifford tableaux have the qiskit layout (batch, 2n, 2n + 1): the rows
+# are the images of X_0, ..., X_n-1, Z_0, ..., Z_n-1, the columns the x bits, the
+# z bits and the phase bit of every image.
+
+
+def stabilizer_pauli_expectations(tableaux: np.ndarray, x, z) -> np.ndarray:
+    """Returns <psi|P(x, z)|psi> for a batch of states and a list of Paulis.
+
+    tableaux has shape (batch, 2n, 2n + 1), x and z have shape (paulis, n). The
+    expectation is 0 unless P commutes with all stabilizers. Then P is, up to its
+    sign, the product of the stabilizers S_j whose destabilizers anticommute with
+    P, and the sign of that product is the expectation. Returns an array of shape
+    (batch, paulis) with entries 0 and +-1."""
+    num_qubits = x.shape[1]
+    x = x.astype(np.int64)
+    z = z.astype(np.int64)
+
+    destab_x = tableaux[:, :num_qubits, :num_qubits].astype(np.int64)
+    destab_z = tableaux[:, :num_qubits, num_qubits:-1].astype(np.int64)
+    stab_x = tableaux[:, num_qubits:, :num_qubits]
+    stab_z = tableaux[:, num_qubits:, num_qubits:-1]
+    stab_r = tableaux[:, num_qubits:, -1]
+
+    # symplectic products with all generators, shape (batch, paulis, n)
+    anticommuting = (
+        np.einsum("pq,bjq->bpj", x, stab_z.astype(np.int64))
+        + np.einsum("pq,bjq->bpj", z, stab_x.astype(np.int64))
+    ) % 2
+    coefficients = (
+        np.einsum("pq,bjq->bpj", x, destab_z) + np.einsum("pq,bjq->bpj", z, destab_x)
+    ) % 2 == 1
+
+    # multiply up the selected stabilizers, tracking the exponent of i
+    shape = coefficients.shape[:2] + (num_qubits,)
+    product_x = np.zeros(shape, dtype=bool)
+    product_z = np.zeros(shape, dtype=bool)
+    exponent = np.zeros(coefficients.shape[:2], dtype=np.int64)
+
+    for j in range(num_qubits):
+        selected = coefficients[..., j]
+        sx = np.broadcast_to(stab_x[:, None, j], shape)
+        sz = np.broadcast_to(stab_z[:, None, j], shape)
+
+        step = 2 * stab_r[:, None, j] + pauli_product_exponent(
+            product_x, product_z, sx, sz
+        ).sum(axis=-1)
+        exponent += np.where(selected, step, 0)
+        product_x ^= selected[..., None] & sx
+        product_z ^= selected[..., None] & sz
+
+    signs = 1 - (exponent % 4)
+    return np.where(anticommuting.any(axis=-1), 0, signs)
+
+
+def stabilizer_density_matrices(x, z, r) -> np.ndarray:
+    """Returns |psi><psi| = prod_i (I + S_i) / 2 for a batch of stabilizer states,
+    of shape (batch, 2^n, 2^n) in qiskit qubit order (qubit 0 least significant).
+
+    Costs O(n * 8^n) per state, meant for the few qubits of a block."""
+    batch, num_qubits = r.shape
+    dimension = 2**num_qubits
+
+    # Pauli index I, X, Y, Z = 0, ..., 3 of every generator and qubit
+    codes = np.where(x, np.where(z, 2, 1), np.where(z, 3, 0))
+    signs = 1 - 2 * r.astype(int)
+
+    # generator matrices, the last qubit is the leftmost tensor factor
+    generators = PAULI_MATRICES[codes[..., -1]]
+    for qubit in range(num_qubits - 2, -1, -1):
+        size = 2 * generators.shape[-1]
+        generators = np.einsum(
+            "...ab,...cd->...acbd", generators, PAULI_MATRICES[codes[..., qubit]]
+        ).reshape(batch, num_qubits, size, size)
+
+    density = np.broadcast_to(
+        np.eye(dimension, dtype=complex), (batch,) + (dimension,) * 2
+    )
+    for i in range(num_qubits):
+        projector = (np.eye(dimension) + signs[:, i, None, None] * generators[:, i]) / 2
+        density = density @ projector
+
+    return density
+
+
+def reverse_tableau_qubits(tableaux: np.ndarray) -> np.ndarray:
+    """Composes every Clifford with the reversal of the qubit order.
+
+    The reversal only relabels the qubits of the images, a permutation of the
+    x and z columns that keeps all phases."""
+    num_qubits = (tableaux.shape[-1] - 1) // 2
+    reverse = np.arange(num_qubits)[::-1]
+    columns = np.concatenate([reverse, num_qubits + reverse, [2 * num_qubits]])
+    return tableaux[..., columns]
+
+
+def adjoint_tableaux(tableaux: np.ndarray) -> np.ndarray:
+    """Returns the tableaux of the adjoints of a batch of Cliffords.
+
+    The symplectic part of the inverse is the block transpose of the symplectic
+    matrix. The phase of row i is the sign of U Q_i U^dagger = +-P_i, with Q_i the
+    unsigned Pauli of that row, which is evaluated by multiplying the images of
+    the X and Z factors of Q_i with the phase tracking of multiply_rows."""
+    tableaux = np.asarray(tableaux, dtype=bool)
+    batch = len(tableaux)
+    num_qubits = (tableaux.shape[-1] - 1) // 2
+    n = num_qubits
+
+    destab_x = tableaux[:, :n, :n]
+    destab_z = tableaux[:, :n, n:-1]
+    stab_x = tableaux[:, n:, :n]
+    stab_z = tableaux[:, n:, n:-1]
+
+    inverse = np.empty_like(tableaux)
+    inverse[:, :n, :n] = stab_z.transpose(0, 2, 1)
+    inverse[:, :n, n:-1] = destab_z.transpose(0, 2, 1)
+    inverse[:, n:, :n] = stab_x.transpose(0, 2, 1)
+    inverse[:, n:, n:-1] = destab_x.transpose(0, 2, 1)
+
+    # Q = i^(x.z) X^x Z^z, its image is the ordered product of the row images
+    x = inverse[:, :, :n]
+    z = inverse[:, :, n:-1]
+    factors = np.concatenate([x, z], axis=2)
+
+    exponent = np.count_nonzero(x & z, axis=2).astype(np.int64)
+    image_x = np.zeros((batch, 2 * n, n), dtype=bool)
+    image_z = np.zeros((batch, 2 * n, n), dtype=bool)
+
+    for k in range(2 * n):
+        row_x = tableaux[:, None, k, :n]
+        row_z = tableaux[:, None, k, n:-1]
+        row_sign = tableaux[:, None, k, -1]
+        selected = factors[:, :, k]
+
+        exponent += selected * (
+            2 * row_sign.astype(np.int64)
+            + pauli_product_exponent(image_x, image_z, row_x, row_z).sum(axis=-1)
+        )
+        image_x ^= selected[..., None] & row_x
+        image_z ^= selected[..., None] & row_z
+
+    exponent %= 4
+    assert np.all(exponent % 2 == 0), "Not a valid Clifford tableau."
+    inverse[:, :, -1] = exponent == 2
+
+    return inverse
+
+
+def post_measurement_tableaux(
+    tableaux: np.ndarray, outcomes: np.ndarray, reverse_qubits: bool = False
+) -> np.ndarray:
+    """Tableaux of the states U^dagger |b> for a batch of rotations U and outcomes b.
+
+    X^b only flips the signs of the images of Z_i with b_i = 1, so the outcomes
+    are applied directly to the stabilizer phases of the adjoint. Optionally the
+    qubit order is reversed afterwards."""
+    outcomes = np.asarray(outcomes, dtype=bool)
+    num_qubits = outcomes.shape[-1]
+
+    post = adjoint_tableaux(tableaux)
+    if reverse_qubits:
+        post = reverse_tableau_qubits(post)
+
+    post[:, num_qubits:, -1] ^= outcomes
+    return post
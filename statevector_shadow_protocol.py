@@ -0,0 +1,179 @@
+import numpy as np
+from qiskit.quantum_info import Clifford, Statevector
+
+from shadow_protocol import ShadowProtocol
+from single_qubit_cliffords import SINGLE_QUBIT_CLIFFORDS, single_qubit_clifford_index
+
+# unitaries of all single-qubit Cliffords, indexed like SINGLE_QUBIT_CLIFFORDS
+SINGLE_QUBIT_MATRICES = np.array(
+    [clifford.to_matrix() for clifford in SINGLE_QUBIT_CLIFFORDS]
+)
+
+
+class StatevectorShadowProtocol(ShadowProtocol):
+    """Protocol that simulates the state circuit only once.
+
+    Subclasses only provide the state circuit. Its statevector is cached and every
+    rotation is applied to the cached vector, the measurement outcomes are sampled
+    from the resulting probabilities. Single-qubit rotations of a batch are applied
+    and sampled together with numpy, in chunks of at most max_chunk_entries
+    amplitudes."""
+
+    def __init__(self, seed=None, max_chunk_entries: int = 2**24):
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.max_chunk_entries = max_chunk_entries
+
+        self._state_vector: np.ndarray | None = None
+
+    def get_num_qubits(self) -> int:
+        return self.get_state_circuit().num_qubits
+
+    def get_state_vector(self) -> np.ndarray:
+        """Returns the cached statevector of the state (qiskit qubit order)."""
+        if self._state_vector is None:
+            circuit = self.get_state_circuit().copy()
+            circuit.remove_final_measurements()
+            self._state_vector = Statevector(circuit).data
+
+        return self._state_vector
+
+    def supports_rotation_sampling(self) -> bool:
+        return True
+
+    def sample_rotated_state(
+        self, cliffords: list[Clifford], shots: int
+    ) -> list[list[int]]:
+        return self.sample_rotated_states([cliffords], shots)[0]
+
+    def sample_rotated_states(
+        self, rotations: list[list[Clifford]], shots: int
+    ) -> list[list[list[int]]]:
+        if not rotations:
+            return []
+
+        state = self.get_state_vector()
+        chunk_size = max(1, self.max_chunk_entries // len(state))
+
+        memories = []
+        for start in range(0, len(rotations), chunk_size):
+            memories.extend(
+                self.sample_rotated_chunk(
+                    state, rotations[start : start + chunk_size], shots
+                )
+            )
+        return memories
+
+    def sample_rotated_states_indices(
+        self, indices: np.ndarray, shots: int
+    ) -> list[list[list[int]]]:
+        state = self.get_state_vector()
+        chunk_size = max(1, self.max_chunk_entries // len(state))
+
+        memories = []
+        for start in range(0, len(indices), chunk_size):
+            # one unitary per snapshot and qubit, shape (snapshots, qubits, 2, 2)
+            unitaries = SINGLE_QUBIT_MATRICES[indices[start : start + chunk_size]]
+            rotated = self.apply_single_qubit_unitaries(state, unitaries)
+            memories.extend(self.sample_rotated_vectors(rotated, shots))
+        return memories
+
+    def sample_rotated_chunk(
+        self, state: np.ndarray, rotations: list[list[Clifford]], shots: int
+    ) -> list[list[list[int]]]:
+        """Samples a chunk of rotations, all rotated states are held in memory."""
+        num_qubits = len(state).bit_length() - 1
+
+        if all(
+            len(cliffords) == num_qubits
+            and all(clifford.num_qubits == 1 for clifford in cliffords)
+            for cliffords in rotations
+        ):
+            indices = np.array(
+                [
+                    [single_qubit_clifford_index(clifford) for clifford in cliffords]
+                    for cliffords in rotations
+                ]
+            )
+            rotated = self.apply_single_qubit_unitaries(
+                state, SINGLE_QUBIT_MATRICES[indices]
+            )
+        else:
+            rotated = np.array(
+                [self.apply_cliffords(state, cliffords) for cliffords in rotations]
+            )
+
+        return self.sample_rotated_vectors(rotated, shots)
+
+    def sample_rotated_vectors(
+        self, rotated: np.ndarray, shots: int
+    ) -> list[list[list[int]]]:
+        """Samples the measurement results of every shot for a batch of states."""
+        num_qubits = rotated.shape[1].bit_length() - 1
+        outcomes = self.sample_outcomes(np.abs(rotated) ** 2, shots)
+
+        bits = (outcomes[..., None] >> np.arange(num_qubits)) & 1
+        return bits.tolist()
+
+    @staticmethod
+    def apply_single_qubit_unitaries(
+        state: np.ndarray, unitaries: np.ndarray
+    ) -> np.ndarray:
+        """Applies a batch of tensor products of single-qubit unitaries to the state.
+
+        unitaries has shape (batch, n, 2, 2), returns states of shape (batch, 2^n)."""
+        batch, num_qubits = unitaries.shape[:2]
+
+        # axis 1 + k of the tensor belongs to qubit n - 1 - k (qiskit order)
+        tensor = np.broadcast_to(
+            state.reshape((1,) + (2,) * num_qubits), (batch,) + (2,) * num_qubits
+        )
+        for qubit in range(num_qubits):
+            axis = num_qubits - qubit
+            tensor = np.moveaxis(tensor, axis, -1)
+            tensor = np.einsum("b...j,bij->b...i", tensor, unitaries[:, qubit])
+            tensor = np.moveaxis(tensor, -1, axis)
+
+        return tensor.reshape(batch, 2**num_qubits)
+
+    @staticmethod
+    def apply_cliffords(state: np.ndarray, cliffords: list[Clifford]) -> np.ndarray:
+        """Applies Cliffords acting on consecutive blocks of qubits to the state."""
+        rotated = Statevector(state)
+
+        qubit = 0
+        for clifford in cliffords:
+            qargs = list(range(qubit, qubit + clifford.num_qubits))
+            rotated = rotated.evolve(clifford.to_circuit(), qargs=qargs)
+            qubit += clifford.num_qubits
+        assert qubit == rotated.num_qubits
+
+        return rotated.data
+
+    def sample_outcomes(self, probabilities: np.ndarray, shots: int) -> np.ndarray:
+        """Samples `shots` basis state indices from every row of probabilities."""
+        batch, dim = probabilities.shape
+
+        cumulative = np.cumsum(probabilities, axis=1)
+        cumulative /= cumulative[:, -1:]
+
+        # shift every row by its index to search all rows in one sorted array
+        offsets = np.arange(batch)[:, None]
+        uniform = self.rng.random((batch, shots))
+        flat_index = np.searchsorted(
+            (cumulative + offsets).ravel(), uniform + offsets, side="right"
+        )
+
+        return np.minimum(flat_index - offsets * dim, dim - 1)
+
+    def run_circuit_and_get_measurement(self, circuit) -> list[int]:
+        return self.run_circuit_and_get_memory(circuit, 1)[0]
+
+    def run_circuit_and_get_memory(self, circuit, shots) -> list[list[int]]:
+        clean_circuit = circuit.copy()
+        clean_circuit.remove_final_measurements()
+
+        probabilities = Statevector(clean_circuit).probabilities()
+        outcomes = self.sample_outcomes(probabilities[None], shots)[0]
+
+        bits = (outcomes[:, None] >> np.arange(clean_circuit.num_qubits)) & 1
+        return bits.tolist()
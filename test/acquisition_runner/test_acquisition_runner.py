@@ -0,0 +1,106 @@
+import sys
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+
+sys.path.insert(0, "../..")
+
+from acquisition_runner import AcquisitionRunner
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(2)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        return circuit
+
+
+class RecordingVisualizer:
+
+    def __init__(self):
+        self.frames = []
+        self.flushed = False
+
+    def update(self, *watchers):
+        self.frames.append(watchers)
+
+    def flush(self):
+        self.flushed = True
+
+
+def make_shadow(seed, shots_per_rotation=1):
+    shadow = ClassicalShadow_1_CLIFFORD(
+        Protocol(seed=seed), shots_per_rotation=shots_per_rotation, seed=seed + 1
+    )
+    shadow.track("zz", ["ZZ"], num_batches=1)
+    return shadow
+
+
+def test_stale_frames_are_dropped():
+    runner = AcquisitionRunner(make_shadow(1), batch_size=100, max_queued_frames=1)
+    runner.start(max_snapshots=1000)
+    runner._thread.join()
+    runner.stop()
+
+    # nobody consumed, only the newest frame is left
+    frame = runner.get_latest_frame(timeout=0)
+    assert frame["shadow_size"] == 1000
+    assert runner.num_dropped_frames == 9
+    assert runner.get_latest_frame(timeout=0) is None
+
+    # the histories keep every batch
+    history = runner.histories["zz"]
+    np.testing.assert_array_equal(history.x, np.arange(100, 1001, 100))
+    assert abs(history.y[-1] - 1) < 0.3
+
+
+def test_max_snapshots_counts_snapshots():
+    runner = AcquisitionRunner(make_shadow(2, shots_per_rotation=10), batch_size=30)
+    runner.start(max_snapshots=1000)
+    runner._thread.join()
+    runner.stop()
+
+    assert runner.shadow.get_shadow_size() == 1000
+    np.testing.assert_array_equal(runner.histories["zz"].x, [300, 600, 900, 1000])
+
+
+def test_frames_carry_their_histories():
+    runner = AcquisitionRunner(make_shadow(4), batch_size=100, max_queued_frames=20)
+    runner.start(max_snapshots=300)
+    runner._thread.join()
+    runner.stop()
+
+    first = runner.frames.get_nowait()
+    assert first["histories"] is not runner.histories
+    assert first["histories"]["zz"] is runner.histories["zz"]
+
+
+def test_run_visualizer():
+    runner = AcquisitionRunner(make_shadow(3), batch_size=50, density_matrix=True)
+    visualizer = RecordingVisualizer()
+
+    def make_watchers(frame, histories):
+        return (frame["shadow_size"], frame["density_matrix"], len(histories["zz"]))
+
+    runner.run_visualizer(visualizer, make_watchers, max_snapshots=500)
+
+    assert visualizer.flushed
+    assert not runner.is_running()
+    assert visualizer.frames[-1][0] == 500
+    assert visualizer.frames[-1][2] == 10
+    assert np.isclose(np.trace(visualizer.frames[-1][1]), 1)
+
+
+def test_worker_errors_are_raised():
+    runner = AcquisitionRunner(make_shadow(5))
+    runner.shadow.add_snapshots = None
+
+    runner.start()
+    runner._thread.join()
+    with pytest.raises(TypeError):
+        runner.stop()
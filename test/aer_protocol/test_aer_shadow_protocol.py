@@ -0,0 +1,126 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.providers.fake_provider import GenericBackendV2
+from qiskit.transpiler import CouplingMap
+
+sys.path.insert(0, "../..")
+
+from aer_shadow_protocol import AerShadowProtocol
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_k_clifford import ClassicalShadow_K_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+
+
+class Protocol(AerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(2)
+        circuit.ry(0.7, 0)
+        circuit.cx(0, 1)
+        circuit.t(1)
+        circuit.measure_all()
+        return circuit
+
+
+class RoutedProtocol(AerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(4)
+        circuit.ry(0.7, 0)
+        circuit.h(3)
+        for control, target in [(0, 3), (1, 2), (0, 2), (3, 1), (2, 0), (1, 3)]:
+            circuit.cx(control, target)
+            circuit.t(target)
+        circuit.x(2)
+        return circuit
+
+
+def test_transpiles_once_per_layer():
+    protocol = Protocol(seed=1)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol, seed=2)
+
+    shadow.add_snapshots(500)
+    state_circuit = protocol.get_transpiled_state_circuit()
+    layers = dict(protocol._single_qubit_layers)
+    shadow.add_snapshots(500)
+
+    assert protocol.get_transpiled_state_circuit() is state_circuit
+    assert len(layers) == 24
+    for index, layer in protocol._single_qubit_layers.items():
+        assert layers[index] is layer
+
+
+def test_local_reconstruction():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=3), seed=4)
+    shadow.add_snapshots(3000)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.08,
+    )
+
+
+def test_global_reconstruction_with_shots():
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(seed=5), shots_per_rotation=10, seed=6)
+    shadow.add_snapshots(300)
+
+    assert shadow.get_shadow_size() == 3000
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.15,
+    )
+
+
+def test_device_backend_maps_results_through_layout():
+    # the state needs routing on a line of qubits, which permutes the qubits
+    backend = GenericBackendV2(4, coupling_map=CouplingMap.from_line(4), seed=7)
+    protocol = RoutedProtocol(seed=8, backend=backend)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol, seed=9)
+    shadow.add_snapshots(4000)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.1,
+    )
+
+
+def test_device_backend_with_routed_global_rotations():
+    backend = GenericBackendV2(5, coupling_map=CouplingMap.from_line(5), seed=10)
+    shadow = ClassicalShadow_N_CLIFFORD(
+        Protocol(seed=11, backend=backend), shots_per_rotation=10, seed=12
+    )
+    shadow.add_snapshots(300)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.15,
+    )
+
+
+def test_device_backend_with_routed_block_rotations():
+    # routing one block may swap through the qubits of the other block
+    backend = GenericBackendV2(6, coupling_map=CouplingMap.from_line(6), seed=13)
+    shadow = ClassicalShadow_K_CLIFFORD(
+        RoutedProtocol(seed=14, backend=backend),
+        block_size=2,
+        shots_per_rotation=10,
+        seed=15,
+    )
+    shadow.add_snapshots(600)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.15,
+    )
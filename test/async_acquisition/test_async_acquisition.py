@@ -0,0 +1,108 @@
+import asyncio
+import sys
+import time
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from statevector_shadow_protocol import StatevectorShadowProtocol
+
+LATENCY = 0.05
+
+
+class BellProtocol(StatevectorShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(2)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        return circuit
+
+
+class RemoteStandIn(BellProtocol):
+    """Answers every job after an artificial latency without blocking."""
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def wait_for_job(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(LATENCY)
+        self.in_flight -= 1
+
+    async def sample_rotated_states_async(self, rotations, shots):
+        await self.wait_for_job()
+        return self.sample_rotated_states(rotations, shots)
+
+
+class CircuitStandIn(RemoteStandIn):
+    """Remote backend that only runs circuits."""
+
+    def supports_rotation_sampling(self):
+        return False
+
+    async def run_circuit_and_get_measurement_async(self, circuit):
+        await self.wait_for_job()
+        return self.run_circuit_and_get_measurement(circuit)
+
+
+class BlockingStandIn(BellProtocol):
+
+    def sample_rotated_states(self, rotations, shots):
+        time.sleep(LATENCY)
+        return super().sample_rotated_states(rotations, shots)
+
+
+def test_jobs_overlap():
+    protocol = RemoteStandIn(seed=1)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol, seed=2)
+
+    start = time.perf_counter()
+    asyncio.run(shadow.add_snapshots_async(40, max_in_flight=5, rotations_per_job=4))
+    elapsed = time.perf_counter() - start
+
+    assert shadow.get_shadow_size() == 40
+    assert protocol.max_in_flight == 5
+    assert elapsed < 10 * LATENCY / 2
+
+
+def test_circuit_jobs_overlap():
+    protocol = CircuitStandIn(seed=1)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol, seed=2)
+
+    start = time.perf_counter()
+    asyncio.run(shadow.add_snapshots_async(40, max_in_flight=10))
+    elapsed = time.perf_counter() - start
+
+    assert shadow.get_shadow_size() == 40
+    assert protocol.max_in_flight == 10
+    assert elapsed < 40 * LATENCY / 2
+
+
+def test_blocking_protocol_runs_in_threads():
+    shadow = ClassicalShadow_N_CLIFFORD(
+        BlockingStandIn(seed=3), shots_per_rotation=3, seed=4
+    )
+
+    start = time.perf_counter()
+    asyncio.run(shadow.add_snapshots_async(12, max_in_flight=4, rotations_per_job=1))
+    elapsed = time.perf_counter() - start
+
+    assert shadow.get_shadow_size() == 36
+    assert elapsed < 12 * LATENCY / 2
+    assert np.isclose(np.trace(shadow.get_density_matrix_from_cliffords()), 1)
+
+
+def test_estimates_match_state():
+    shadow = ClassicalShadow_1_CLIFFORD(RemoteStandIn(seed=5), seed=6)
+    asyncio.run(shadow.add_snapshots_async(2000, max_in_flight=200))
+
+    estimates, _ = shadow.predict_observable(["ZZ", "XX"])
+    np.testing.assert_allclose(estimates, [1, 1], atol=0.2)
@@ -0,0 +1,91 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit_aer import AerSimulator
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from shadow_protocol import ShadowProtocol
+
+
+class BatchedProtocol(ShadowProtocol):
+
+    def __init__(self):
+        self.sim = AerSimulator()
+        self.num_jobs = 0
+
+    def get_num_qubits(self) -> int:
+        return 2
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(2)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        return circuit
+
+    def run_circuit_and_get_measurement(self, circuit) -> list[int]:
+        return self.run_circuits_and_get_measurements([circuit])[0]
+
+    def run_circuits_and_get_measurements(self, circuits) -> list[list[int]]:
+        self.num_jobs += 1
+
+        job = self.sim.run(circuits, shots=1)
+        result = job.result()
+
+        bit_lists = []
+        for i in range(len(circuits)):
+            counts = result.get_counts(i)
+            max_hits = max(counts, key=counts.get)
+            bit_list = [int(bit) for bit in list(max_hits)]
+            bit_lists.append(bit_list[::-1])
+
+        return bit_lists
+
+
+expected_matrix = np.array(
+    [
+        [0.5, 0.0, 0.0, 0.5],
+        [0.0, 0.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 0.0],
+        [0.5, 0.0, 0.0, 0.5],
+    ]
+)
+
+
+def test_add_snapshots_submits_one_job_per_batch():
+    protocol = BatchedProtocol()
+    shadow = ClassicalShadow_1_CLIFFORD(protocol)
+
+    shadow.add_snapshots(250, batch_size=100)
+
+    assert shadow.get_shadow_size() == 250
+    assert protocol.num_jobs == 3
+
+
+def test_add_snapshots_reconstruction_1_clifford():
+    protocol = BatchedProtocol()
+    shadow = ClassicalShadow_1_CLIFFORD(protocol)
+
+    shadow.add_snapshots(5000)
+
+    reconstructed_dm = shadow.get_density_matrix_from_cliffords()
+
+    np.testing.assert_allclose(
+        np.real(reconstructed_dm), expected_matrix, rtol=0.0, atol=0.08
+    )
+
+
+def test_add_snapshots_reconstruction_n_clifford():
+    protocol = BatchedProtocol()
+    shadow = ClassicalShadow_N_CLIFFORD(protocol)
+
+    shadow.add_snapshots(5000)
+
+    reconstructed_dm = shadow.get_density_matrix_from_cliffords()
+
+    np.testing.assert_allclose(
+        np.real(reconstructed_dm), expected_matrix, rtol=0.0, atol=0.08
+    )
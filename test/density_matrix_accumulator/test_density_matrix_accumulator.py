@@ -0,0 +1,77 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(2)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        return circuit
+
+
+class CountingShadow(ClassicalShadow_N_CLIFFORD):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.summed_ranges = []
+
+    def sum_snapshot_density_matrices(self, start, stop):
+        self.summed_ranges.append((start, stop))
+        return super().sum_snapshot_density_matrices(start, stop)
+
+
+def test_only_new_snapshots_are_summed():
+    shadow = CountingShadow(Protocol(seed=1), seed=1)
+
+    for _ in range(3):
+        shadow.add_snapshots(200)
+        shadow.get_density_matrix_from_cliffords()
+    shadow.get_density_matrix_from_cliffords()
+
+    assert shadow.summed_ranges == [(0, 200), (200, 400), (400, 600)]
+
+
+def test_accumulated_matches_full_reconstruction():
+    for shadow_class in (ClassicalShadow_1_CLIFFORD, ClassicalShadow_N_CLIFFORD):
+        accumulated = shadow_class(Protocol(seed=2), seed=3)
+        full = shadow_class(Protocol(seed=2), seed=3, accumulate_density_matrix=False)
+
+        for _ in range(4):
+            accumulated.add_snapshots(150)
+            full.add_snapshots(150)
+
+            np.testing.assert_allclose(
+                accumulated.get_density_matrix_from_cliffords(),
+                full.get_density_matrix_from_cliffords(),
+                atol=1e-12,
+            )
+
+        assert full._density_matrix_sum is None
+
+
+def test_loading_snapshots_resets_accumulator(tmp_path):
+    path = tmp_path / "run.shadow"
+    other = ClassicalShadow_N_CLIFFORD(Protocol(seed=4), seed=5)
+    other.add_snapshots(100)
+    other.save_snapshots(path)
+
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(seed=6), seed=7)
+    shadow.add_snapshots(100)
+    shadow.get_density_matrix_from_cliffords()
+    shadow.load_snapshots(path)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        other.get_density_matrix_from_cliffords(),
+        atol=1e-12,
+    )
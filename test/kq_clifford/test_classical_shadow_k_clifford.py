@@ -0,0 +1,130 @@
+import sys
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford, Pauli, SparsePauliOp
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_k_clifford import ClassicalShadow_K_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from parallel_acquisition import add_snapshots_parallel
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(i - 1, i)
+        circuit.s(self.num_qubits - 1)
+        return circuit
+
+
+def make_protocol(seed):
+    return Protocol(5, seed=seed)
+
+
+def test_blocks_cover_all_qubits():
+    shadow = ClassicalShadow_K_CLIFFORD(Protocol(5, seed=1), block_size=2, seed=2)
+    assert shadow.blocks == [[0, 1], [2, 3], [4]]
+
+    shadow.add_snapshots(20)
+    assert [c.num_qubits for c in shadow.clifford_list_list[0]] == [2, 2, 1]
+
+    with pytest.raises(ValueError):
+        ClassicalShadow_K_CLIFFORD(Protocol(5), block_size=0)
+
+
+def test_full_block_matches_global_cliffords():
+    k_shadow = ClassicalShadow_K_CLIFFORD(Protocol(3, seed=1), block_size=3, seed=2)
+    n_shadow = ClassicalShadow_N_CLIFFORD(Protocol(3, seed=1), seed=2)
+    k_shadow.add_snapshots(50)
+    n_shadow.add_snapshots(50)
+
+    np.testing.assert_array_equal(
+        k_shadow.snapshot_store.view(), n_shadow.snapshot_store.view()
+    )
+    np.testing.assert_allclose(
+        k_shadow.get_density_matrix_from_cliffords(),
+        n_shadow.get_density_matrix_from_cliffords(),
+        atol=1e-10,
+    )
+
+
+def test_single_snapshot_path_matches_batch():
+    shadow = ClassicalShadow_K_CLIFFORD(Protocol(5, seed=3), block_size=2, seed=4)
+    rotations = shadow.get_random_rotations_batch(10)
+    results = shadow.rng.integers(0, 2, size=(10, 5)).tolist()
+
+    rows = shadow.encode_snapshots_batch(rotations, results)
+    for row, cliffords, bits in zip(rows, rotations, results):
+        stabilizers = shadow.compute_clifford_applied_to_measurements(cliffords, bits)
+        np.testing.assert_array_equal(shadow.encode_snapshot(stabilizers), row)
+
+
+def test_density_matrix_converges():
+    shadow = ClassicalShadow_K_CLIFFORD(Protocol(4, seed=5), block_size=2, seed=6)
+    shadow.add_snapshots(4000)
+
+    rho = shadow.get_density_matrix_from_cliffords()
+    np.testing.assert_allclose(np.trace(rho), 1)
+    assert np.linalg.norm(rho - shadow.get_original_density_matrix()) < 0.35
+
+
+def test_observables_and_fidelity_match_density_matrix():
+    shadow = ClassicalShadow_K_CLIFFORD(Protocol(5, seed=7), block_size=2, seed=8)
+    shadow.add_snapshots(300)
+    rho = shadow.get_density_matrix_from_cliffords()
+
+    # with one batch the estimates are plain means, i.e. tr(P rho)
+    labels = ["XXXXY", "IIZZI", "ZIIIZ", "IIIII", "-YXXXX"]
+    estimates, _ = shadow.predict_observable(labels, num_batches=1)
+    for label, estimate in zip(labels, estimates):
+        # reversing the labels puts qubit 0 on the left like rho
+        sign = -1 if label.startswith("-") else 1
+        matrix = sign * Pauli(label.lstrip("-")[::-1]).to_matrix()
+        assert np.isclose(estimate, np.trace(matrix @ rho).real)
+
+    target = Clifford(shadow.shadow_protocol.get_state_circuit())
+    state = shadow.get_target_state(target)
+    values = shadow.compute_fidelity_values(state, max_chunk_entries=100)
+    assert np.isclose(values.mean(), (state.conj() @ rho @ state).real)
+
+
+def test_fidelity_and_tracking():
+    shadow = ClassicalShadow_K_CLIFFORD(Protocol(5, seed=9), block_size=2, seed=10)
+    target = Clifford(shadow.shadow_protocol.get_state_circuit())
+    observable = SparsePauliOp(["XXXXY", "ZZIII"], coeffs=[0.5, 0.5])
+
+    shadow.track("fidelity", target, num_batches=1)
+    shadow.track("observable", observable, num_batches=1)
+    shadow.add_snapshots(2000)
+
+    assert abs(shadow.calculate_fidelity(target) - 1) < 0.3
+    fidelity, _ = shadow.get_tracked_estimate("fidelity")
+    assert np.isclose(
+        fidelity, shadow.compute_fidelity_values(shadow.get_target_state(target)).mean()
+    )
+
+    estimate, _ = shadow.predict_observable(observable, num_batches=1)
+    assert np.isclose(shadow.get_tracked_estimate("observable")[0], estimate)
+    assert abs(estimate - 1) < 0.3
+
+
+def test_parallel_acquisition_keeps_block_size():
+    shadow = ClassicalShadow_K_CLIFFORD(make_protocol(0), block_size=3, seed=0)
+    add_snapshots_parallel(
+        shadow, 20, make_protocol, seed=11, num_shards=4, max_workers=1
+    )
+
+    assert shadow.get_shadow_size() == 20
+    assert shadow.get_options() == {"shots_per_rotation": 1, "block_size": 3}
+    assert [c.num_qubits for c in shadow.clifford_list_list[-1]] == [3, 2]
@@ -0,0 +1,89 @@
+import sys
+from functools import reduce
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import StabilizerState
+
+sys.path.insert(0, "../..")
+
+from abstract_cassical_shadow import AbstractClassicalShadow
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from single_qubit_cliffords import INVERTED_STATE_MATRICES
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(i - 1, i)
+        circuit.s(0)
+        return circuit
+
+
+def kron_reconstruction(shadow):
+    sum_rho = 0
+    for row in shadow.clifford_list_list:
+        inverted_qubits = [
+            3
+            * AbstractClassicalShadow.stabilizer_to_density_matrix(
+                StabilizerState(cliff)
+            )
+            - np.eye(2)
+            for cliff in row
+        ]
+        sum_rho = sum_rho + reduce(np.kron, inverted_qubits)
+    return sum_rho / shadow.get_shadow_size()
+
+
+def test_inverted_state_table():
+    for state, matrix in enumerate(INVERTED_STATE_MATRICES):
+        assert np.isclose(np.trace(matrix), 1)
+        np.testing.assert_allclose(matrix, matrix.conj().T)
+
+
+def test_matches_kron_reconstruction():
+    for num_qubits in (1, 3, 4):
+        shadow = ClassicalShadow_1_CLIFFORD(Protocol(num_qubits, seed=1), seed=2)
+        shadow.add_snapshots(300)
+
+        np.testing.assert_allclose(
+            shadow.get_density_matrix_from_cliffords(),
+            kron_reconstruction(shadow),
+            atol=1e-12,
+        )
+
+
+def test_prefix_grouping_does_not_change_result():
+    rng = np.random.default_rng(3)
+    rows = rng.integers(0, 6, size=(500, 5), dtype=np.uint8)
+    counts = rng.integers(1, 4, size=500)
+
+    reference = ClassicalShadow_1_CLIFFORD.sum_pauli_coefficients(rows, counts)
+    for max_suffix_qubits in (0, 2, 4):
+        np.testing.assert_allclose(
+            ClassicalShadow_1_CLIFFORD.sum_pauli_coefficients(
+                rows, counts, max_suffix_qubits
+            ),
+            reference,
+            atol=1e-9,
+        )
+
+
+def test_ten_qubit_reconstruction():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(10, seed=4), seed=5)
+    shadow.add_snapshots(20000, batch_size=5000)
+
+    rho = shadow.get_density_matrix_from_cliffords()
+
+    assert rho.shape == (1024, 1024)
+    assert np.isclose(np.trace(rho), 1)
+    # |GHZ> with a phase i between the two branches
+    assert abs(rho[0, -1] - (-0.5j)) < 0.3
@@ -0,0 +1,64 @@
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, "../..")
+
+from median_of_means import (
+    MedianOfMeansAccumulator,
+    batch_means,
+    median_of_batch_means,
+    median_of_means,
+    num_batches_for_failure_probability,
+)
+
+
+def test_num_batches_from_delta():
+    assert num_batches_for_failure_probability(0.5) == 2
+    assert num_batches_for_failure_probability(0.01) == 10
+    assert MedianOfMeansAccumulator(delta=0.01).num_batches == 10
+
+    with pytest.raises(ValueError):
+        num_batches_for_failure_probability(1.0)
+
+
+def test_delta_bounds_all_estimates_together():
+    # union bound: each of the 100 estimates may only fail with delta / 100
+    assert num_batches_for_failure_probability(0.01, 100) == 19
+    assert MedianOfMeansAccumulator(delta=0.01, shape=(10, 10)).num_batches == 19
+
+    _, errors = median_of_means(np.ones((100, 5)), delta=0.01)
+    assert errors.shape == (5,)
+
+
+def test_seeded_shuffle_is_reproducible():
+    values = np.arange(100, dtype=float) ** 2
+
+    first = batch_means(values, 5, np.random.default_rng(3))
+    second = batch_means(values, 5, np.random.default_rng(3))
+    np.testing.assert_array_equal(first, second)
+    assert not np.allclose(first, batch_means(values, 5))
+
+    # shuffling never changes the overall mean
+    assert np.isclose(first.mean(), values.mean())
+
+
+def test_many_estimates_at_once():
+    rng = np.random.default_rng(4)
+    values = rng.normal(size=(400, 6))
+
+    means = batch_means(values, 8)
+    estimates, errors = median_of_batch_means(means)
+    transposed, transposed_errors = median_of_batch_means(means.T, axis=-1)
+
+    assert estimates.shape == errors.shape == (6,)
+    np.testing.assert_allclose(estimates, transposed)
+    np.testing.assert_allclose(errors, transposed_errors)
+    np.testing.assert_allclose(median_of_means(values, 8)[0], estimates)
+
+
+def test_fewer_values_than_batches():
+    estimate, error = median_of_means(np.array([1.0, 3.0]), 3)
+    assert estimate == 2.0
+    assert error > 0
@@ -0,0 +1,94 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit_aer import AerSimulator
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from shadow_protocol import ShadowProtocol
+
+
+class MemoryProtocol(ShadowProtocol):
+
+    def __init__(self, seed=None):
+        self.sim = AerSimulator()
+        self.rng = np.random.default_rng(seed)
+        self.num_jobs = 0
+
+    def get_num_qubits(self) -> int:
+        return 2
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(2)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        return circuit
+
+    def run_circuit_and_get_measurement(self, circuit) -> list[int]:
+        return self.run_circuit_and_get_memory(circuit, 1)[0]
+
+    def run_circuit_and_get_memory(self, circuit, shots) -> list[list[int]]:
+        self.num_jobs += 1
+
+        job = self.sim.run(
+            circuit,
+            shots=shots,
+            memory=True,
+            seed_simulator=int(self.rng.integers(2**31)),
+        )
+        memory = job.result().get_memory()
+
+        return [[int(bit) for bit in shot][::-1] for shot in memory]
+
+
+expected_matrix = np.array(
+    [
+        [0.5, 0.0, 0.0, 0.5],
+        [0.0, 0.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 0.0],
+        [0.5, 0.0, 0.0, 0.5],
+    ]
+)
+
+
+def test_every_shot_is_stored_as_snapshot():
+    protocol = MemoryProtocol()
+    shadow = ClassicalShadow_N_CLIFFORD(protocol, shots_per_rotation=10)
+
+    for _ in range(20):
+        shadow.add_snapshot()
+    shadow.add_snapshots(30, batch_size=10)
+
+    assert shadow.get_shadow_size() == 500
+    assert protocol.num_jobs == 50
+
+
+def test_multi_shot_reconstruction_1_clifford():
+    protocol = MemoryProtocol(seed=1)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol, shots_per_rotation=8, seed=2)
+
+    for _ in range(1000):
+        shadow.add_snapshot()
+
+    reconstructed_dm = shadow.get_density_matrix_from_cliffords()
+
+    np.testing.assert_allclose(
+        np.real(reconstructed_dm), expected_matrix, rtol=0.0, atol=0.08
+    )
+
+
+def test_multi_shot_reconstruction_n_clifford():
+    protocol = MemoryProtocol(seed=3)
+    shadow = ClassicalShadow_N_CLIFFORD(protocol, shots_per_rotation=8, seed=4)
+
+    for _ in range(1000):
+        shadow.add_snapshot()
+
+    reconstructed_dm = shadow.get_density_matrix_from_cliffords()
+
+    np.testing.assert_allclose(
+        np.real(reconstructed_dm), expected_matrix, rtol=0.0, atol=0.08
+    )
@@ -0,0 +1,70 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford, StabilizerState, random_clifford
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+from stabilizer_tableau import stabilizer_rows, zero_state_overlaps
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(i - 1, i)
+        return circuit
+
+
+def test_zero_state_overlaps_match_probabilities():
+    rng = np.random.default_rng(1)
+    cliffords = [random_clifford(4, seed=rng) for _ in range(50)]
+
+    rows = [stabilizer_rows(clifford) for clifford in cliffords]
+    x, z, r = (np.array(part) for part in zip(*rows))
+
+    expected = [
+        StabilizerState(clifford).probabilities_dict().get("0000", 0.0)
+        for clifford in cliffords
+    ]
+    np.testing.assert_allclose(zero_state_overlaps(x, z, r), expected)
+
+
+def test_overlaps_match_probabilities():
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(3, seed=2), seed=3)
+    shadow.add_snapshots(40)
+
+    target = random_clifford(3, seed=4)
+    target_inv = target.adjoint()
+    expected = [
+        StabilizerState(row[0].compose(target_inv)).probabilities_dict().get("000", 0.0)
+        for row in shadow.clifford_list_list
+    ]
+
+    np.testing.assert_allclose(shadow.compute_overlaps(target, chunk_size=7), expected)
+
+
+def test_fidelity_of_large_ghz_state():
+    num_qubits = 40
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(num_qubits, seed=5), seed=6)
+    shadow.add_snapshots(30)
+
+    # overlaps with the prepared state are 2^-k, never 0
+    target = Clifford(shadow.shadow_protocol.get_state_circuit())
+    assert shadow.calculate_fidelity(target) > 0
+
+    # overlaps of stabilizer states are always 0 or a power of 1/2
+    other = QuantumCircuit(num_qubits)
+    other.x(0)
+    other.compose(shadow.shadow_protocol.get_state_circuit(), inplace=True)
+    overlaps = shadow.compute_overlaps(Clifford(other))
+    assert np.all(np.isin(overlaps, [0.0] + [2.0**-k for k in range(num_qubits + 1)]))
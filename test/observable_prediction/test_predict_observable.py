@@ -0,0 +1,109 @@
+import sys
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import PauliList, SparsePauliOp
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, circuit, seed=None):
+        super().__init__(seed)
+        self.circuit = circuit
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        return self.circuit
+
+
+def bell_circuit():
+    circuit = QuantumCircuit(2)
+    circuit.h(0)
+    circuit.cx(0, 1)
+    return circuit
+
+
+def test_bell_pauli_strings():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(bell_circuit(), seed=1), seed=2)
+    shadow.add_snapshots(6000)
+
+    estimates, errors = shadow.predict_observable(["ZZ", "XX", "YY", "IZ", "-XX"])
+
+    np.testing.assert_allclose(estimates, [1, 1, -1, 0, -1], atol=0.15)
+    assert errors.shape == (5,)
+    assert np.all(errors < 0.15)
+
+
+def test_sparse_pauli_op_matches_sum_of_terms():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(bell_circuit(), seed=3), seed=4)
+    shadow.add_snapshots(2000)
+
+    observable = SparsePauliOp(["ZZ", "XX", "YI"], coeffs=[0.5, -2.0, 1.0])
+    estimate, error = shadow.predict_observable(observable, num_batches=1)
+    terms, _ = shadow.predict_observable(["ZZ", "XX", "YI"], num_batches=1)
+
+    assert np.isclose(estimate, 0.5 * terms[0] - 2.0 * terms[1] + terms[2])
+    assert np.isnan(error)
+
+
+def test_matches_density_matrix():
+    circuit = QuantumCircuit(4)
+    circuit.h(0)
+    for i in range(1, 4):
+        circuit.cx(i - 1, i)
+    circuit.s(2)
+
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(circuit, seed=5), seed=6)
+    shadow.add_snapshots(500)
+
+    rng = np.random.default_rng(7)
+    labels = ["".join(rng.choice(list("IXYZ"), 4)) for _ in range(2000)]
+    estimates, _ = shadow.predict_observable(labels, num_batches=1)
+
+    # with a single batch the estimates are the means over all snapshots, which
+    # equal the expectation values in the reconstructed density matrix
+    rho = shadow.get_density_matrix_from_cliffords()
+    for label, estimate in zip(labels[:50], estimates[:50]):
+        # the density matrix has qubit 0 as the leftmost factor
+        expected = np.trace(rho @ PauliList([label[::-1]])[0].to_matrix()).real
+        assert np.isclose(estimate, expected)
+
+
+def test_global_cliffords_match_density_matrix():
+    circuit = QuantumCircuit(3)
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.s(1)
+    circuit.h(2)
+
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(circuit, seed=8), seed=9)
+    shadow.track("xy", SparsePauliOp(["IYX", "XII"], [0.5, 0.5]), num_batches=1)
+    shadow.add_snapshots(300)
+
+    labels = ["III", "IYX", "-IYX", "XII", "ZZZ", "IXY", "YYZ"]
+    estimates, _ = shadow.predict_observable(labels, num_batches=1)
+
+    rho = shadow.get_density_matrix_from_cliffords()
+    for label, estimate in zip(labels, estimates):
+        sign = -1 if label.startswith("-") else 1
+        matrix = PauliList([label.lstrip("-")[::-1]])[0].to_matrix()
+        assert np.isclose(estimate, sign * np.trace(rho @ matrix).real)
+
+    observable = SparsePauliOp(["IYX", "XII"], [0.5, 0.5])
+    estimate, _ = shadow.predict_observable(observable, num_batches=1)
+    assert abs(estimate - 1) < 0.3
+    assert np.isclose(shadow.get_tracked_estimate("xy")[0], estimate)
+
+
+def test_rejects_wrong_size():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(bell_circuit(), seed=1), seed=2)
+    shadow.add_snapshot()
+
+    with pytest.raises(ValueError):
+        shadow.predict_observable(["ZZZ"])
@@ -0,0 +1,62 @@
+import sys
+from functools import partial
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from parallel_acquisition import add_snapshots_parallel, shard_seeds
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(i - 1, i)
+        return circuit
+
+
+def make_protocol(seed):
+    return Protocol(3, seed=seed)
+
+
+def test_shard_seeds_are_independent_and_stable():
+    seeds = shard_seeds(7, 4)
+    assert seeds == shard_seeds(7, 4)
+    assert seeds[:2] == shard_seeds(7, 2)
+    assert len({seed for pair in seeds for seed in pair}) == 8
+
+
+def test_identical_for_any_number_of_workers():
+    results = []
+    for max_workers in (1, 2, 3):
+        shadow = ClassicalShadow_1_CLIFFORD(make_protocol(0))
+        add_snapshots_parallel(
+            shadow, 500, make_protocol, seed=11, num_shards=7, max_workers=max_workers
+        )
+        results.append(np.array(shadow.snapshot_store.view()))
+
+    assert results[0].shape == (500, 3)
+    for rows in results[1:]:
+        np.testing.assert_array_equal(rows, results[0])
+
+
+def test_parallel_global_shadow():
+    shadow = ClassicalShadow_N_CLIFFORD(make_protocol(0), shots_per_rotation=2)
+    add_snapshots_parallel(
+        shadow, 40, partial(Protocol, 3), seed=5, num_shards=4, max_workers=2
+    )
+
+    assert shadow.get_shadow_size() == 80
+    rho = shadow.get_density_matrix_from_cliffords()
+    assert np.isclose(np.trace(rho), 1)
@@ -0,0 +1,84 @@
+import sys
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import DensityMatrix, partial_trace
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(i - 1, i)
+        circuit.s(1)
+        circuit.h(self.num_qubits - 1)
+        return circuit
+
+
+def reduce_full_matrix(rho, num_qubits, qubits):
+    # the reconstructed matrix has qubit 0 as the leftmost factor, qiskit as the
+    # rightmost, so reverse the order before and after the partial trace
+    reversed_rho = DensityMatrix(rho).reverse_qargs()
+    traced = [q for q in range(num_qubits) if q not in qubits]
+    reduced = partial_trace(reversed_rho, traced).reverse_qargs().data
+
+    # reorder the remaining qubits to the requested order
+    kept = sorted(qubits)
+    order = [kept.index(q) for q in qubits]
+    k = len(qubits)
+    tensor = reduced.reshape((2,) * 2 * k)
+    tensor = tensor.transpose(order + [k + i for i in order])
+    return tensor.reshape(2**k, 2**k)
+
+
+def test_matches_partial_trace_of_full_reconstruction():
+    num_qubits = 4
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(num_qubits, seed=1), seed=2)
+    shadow.add_snapshots(400)
+    rho = shadow.get_density_matrix_from_cliffords()
+
+    for qubits in ([0], [2], [1, 3], [3, 1], [0, 2, 3]):
+        np.testing.assert_allclose(
+            shadow.get_reduced_density_matrix(qubits),
+            reduce_full_matrix(rho, num_qubits, qubits),
+            atol=1e-12,
+        )
+
+
+def test_pair_matrices_match_single_pairs():
+    num_qubits = 5
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(num_qubits, seed=3), seed=4)
+    shadow.add_snapshots(300)
+
+    pairs = shadow.get_pair_reduced_density_matrices(chunk_size=70)
+    assert pairs.shape == (num_qubits, num_qubits, 4, 4)
+
+    for i in range(num_qubits):
+        assert not pairs[i, i].any()
+        for j in range(num_qubits):
+            if i != j:
+                np.testing.assert_allclose(
+                    pairs[i, j], shadow.get_reduced_density_matrix([i, j]), atol=1e-12
+                )
+
+
+def test_invalid_qubits():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(3, seed=5), seed=6)
+    shadow.add_snapshots(10)
+
+    with pytest.raises(ValueError):
+        shadow.get_reduced_density_matrix([0, 0])
+    with pytest.raises(ValueError):
+        shadow.get_reduced_density_matrix([3])
@@ -0,0 +1,109 @@
+import sys
+from itertools import combinations
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_k_clifford import ClassicalShadow_K_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+    """Bell pair on the qubits 0, 1 and |+> on qubit 2."""
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(3)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        circuit.h(2)
+        return circuit
+
+
+def reduced_snapshot(shadow, index, qubits):
+    # reduced inverted snapshot of one snapshot, computed from its full matrix
+    n = shadow.num_qubits
+    rho = shadow.sum_snapshot_density_matrices(index, index + 1)
+    tensor = rho.reshape((2,) * 2 * n)
+    rest = [q for q in range(n) if q not in qubits]
+    tensor = tensor.transpose(
+        list(qubits) + rest + [n + q for q in qubits] + [n + q for q in rest]
+    ).reshape(2 ** len(qubits), 2 ** len(rest), 2 ** len(qubits), 2 ** len(rest))
+    return np.einsum("abcb->ac", tensor)
+
+
+def brute_force_purity(shadow, qubits):
+    snapshots = [
+        reduced_snapshot(shadow, i, qubits) for i in range(shadow.get_shadow_size())
+    ]
+    values = [
+        np.trace(a @ b).real
+        for i, a in enumerate(snapshots)
+        for j, b in enumerate(snapshots)
+        if i != j
+    ]
+    return np.mean(values)
+
+
+def test_local_matches_brute_force():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=1), seed=2)
+    shadow.add_snapshots(37)
+
+    subsystems = [(0,), (1, 2), (2, 0, 1)]
+    purities = shadow.estimate_subsystem_purities(subsystems, block_size=8)
+    for qubits, purity in zip(subsystems, purities):
+        assert np.isclose(purity, brute_force_purity(shadow, qubits))
+
+
+def test_global_matches_brute_force():
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(seed=3), seed=4)
+    shadow.add_snapshots(23)
+
+    subsystems = [(1,), (0, 2), (0, 1, 2)]
+    purities = shadow.estimate_subsystem_purities(subsystems, chunk_size=5)
+    for qubits, purity in zip(subsystems, purities):
+        assert np.isclose(purity, brute_force_purity(shadow, qubits))
+
+
+def test_block_matches_brute_force():
+    shadow = ClassicalShadow_K_CLIFFORD(Protocol(seed=10), block_size=2, seed=11)
+    shadow.add_snapshots(29)
+
+    subsystems = [(2,), (1,), (1, 2), (2, 0, 1)]
+    purities = shadow.estimate_subsystem_purities(subsystems, max_chunk_entries=64)
+    for qubits, purity in zip(subsystems, purities):
+        assert np.isclose(purity, brute_force_purity(shadow, qubits))
+
+    expected = shadow.purity_to_renyi_entropy(brute_force_purity(shadow, (0, 1)))
+    assert np.isclose(shadow.estimate_renyi_entropy([0, 1]), expected)
+
+
+def test_entropies_of_all_small_subsystems():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=5), seed=6)
+    shadow.add_snapshots(4000)
+
+    entropies = shadow.estimate_renyi_entropies(2)
+    assert set(entropies) == set(combinations(range(3), 1)) | set(
+        combinations(range(3), 2)
+    )
+
+    # half of a Bell pair has one bit of entropy, the pair and |+> none
+    assert abs(entropies[(0,)] - 1) < 0.2
+    assert abs(entropies[(0, 1)]) < 0.2
+    assert abs(entropies[(2,)]) < 0.2
+    assert abs(entropies[(1, 2)] - 1) < 0.3
+
+
+def test_subsampled_pairs():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=7), seed=8)
+    shadow.add_snapshots(2000)
+
+    exact = shadow.estimate_purity([0, 1])
+    sampled = shadow.estimate_purity([0, 1], num_pairs=400_000, seed=9)
+    assert abs(sampled - exact) < 0.1
+    assert np.isclose(
+        sampled, shadow.estimate_purity([0, 1], num_pairs=400_000, seed=9)
+    )
@@ -0,0 +1,82 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford, Pauli, StabilizerState, random_clifford
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from single_qubit_cliffords import (
+    POST_MEASUREMENT_CLIFFORDS,
+    POST_MEASUREMENT_STATES,
+    SINGLE_QUBIT_CLIFFORDS,
+    STABILIZER_STATE_CLIFFORDS,
+    single_qubit_clifford_index,
+)
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        return QuantumCircuit(3)
+
+
+class XShadow(ClassicalShadow_1_CLIFFORD):
+
+    def get_random_rotations_batch(self, num_rotations: int) -> np.ndarray:
+        index = single_qubit_clifford_index(Clifford.from_label("H"))
+        return np.full((num_rotations, self.num_qubits), index, dtype=np.uint8)
+
+
+def test_all_single_qubit_cliffords_are_enumerated():
+    keys = {clifford.tableau.tobytes() for clifford in SINGLE_QUBIT_CLIFFORDS}
+    assert len(keys) == 24
+
+    for _ in range(20):
+        clifford = random_clifford(1)
+        index = single_qubit_clifford_index(clifford)
+        assert SINGLE_QUBIT_CLIFFORDS[index] == clifford
+
+
+def test_post_measurement_states():
+    paulis = [Pauli("X"), Pauli("Y"), Pauli("Z")]
+
+    for index, clifford in enumerate(SINGLE_QUBIT_CLIFFORDS):
+        for bit in (0, 1):
+            stab = StabilizerState(POST_MEASUREMENT_CLIFFORDS[index][bit])
+
+            # U^dagger |b>
+            base = Clifford.from_label("X" if bit else "I")
+            expected = StabilizerState(base.compose(clifford.adjoint()))
+            assert stab.equiv(expected)
+
+            state = int(POST_MEASUREMENT_STATES[index, bit])
+            sign = 1 - 2 * (state % 2)
+            assert stab.expectation_value(paulis[state // 2]) == sign
+            assert stab.equiv(StabilizerState(STABILIZER_STATE_CLIFFORDS[state]))
+
+
+def test_rotation_indices_are_reproducible():
+    shadow_a = ClassicalShadow_1_CLIFFORD(Protocol(), seed=7)
+    shadow_b = ClassicalShadow_1_CLIFFORD(Protocol(), seed=7)
+
+    indices = shadow_a.get_random_rotation_indices(1000)
+
+    assert indices.shape == (1000, 3)
+    assert indices.dtype == np.uint8
+    assert set(np.unique(indices)) == set(range(24))
+    np.testing.assert_array_equal(indices, shadow_b.get_random_rotation_indices(1000))
+
+
+def test_batches_respect_overridden_rotations():
+    shadow = XShadow(Protocol(seed=1))
+
+    rotations = shadow.get_random_rotations_batch(5)
+    cliffords = shadow.get_rotation_cliffords(rotations)
+
+    assert len(cliffords) == 5
+    assert all(
+        clifford == Clifford.from_label("H") for row in cliffords for clifford in row
+    )
@@ -0,0 +1,137 @@
+import sys
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from snapshot_file import merge_snapshot_files, open_snapshot_file, read_header
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(2)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        return circuit
+
+
+def test_save_and_load_memory_mapped(tmp_path):
+    path = tmp_path / "run.shadow"
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(seed=1), seed=42)
+    shadow.add_snapshots(300)
+    shadow.save_snapshots(path)
+
+    header = read_header(path)
+    assert header["num_qubits"] == 2
+    assert header["shadow_type"] == "n-clifford"
+    assert header["seeds"] == [42]
+
+    loaded = ClassicalShadow_N_CLIFFORD(Protocol())
+    loaded.load_snapshots(path)
+
+    assert isinstance(loaded.snapshot_store.view(), np.memmap)
+    assert loaded.get_shadow_size() == 300
+    np.testing.assert_allclose(
+        loaded.get_density_matrix_from_cliffords(),
+        shadow.get_density_matrix_from_cliffords(),
+    )
+
+    # appending copies the memory mapped rows into memory
+    loaded.add_snapshots(10)
+    assert loaded.get_shadow_size() == 310
+    assert open_snapshot_file(path)[1].shape == (300, loaded.snapshot_store.row_width)
+
+
+def test_recording_survives_interruption(tmp_path):
+    path = tmp_path / "run.shadow"
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=1), seed=3)
+    shadow.add_snapshots(50)
+    shadow.record_snapshots_to(path)
+    shadow.add_snapshots(70, batch_size=20)
+
+    # simulate a crash in the middle of writing a row
+    with open(path, "ab") as file:
+        file.write(b"\x01")
+
+    resumed = ClassicalShadow_1_CLIFFORD(Protocol(seed=2), seed=4)
+    resumed.load_snapshots(path)
+    np.testing.assert_array_equal(
+        resumed.snapshot_store.view(), shadow.snapshot_store.view()
+    )
+
+    resumed.record_snapshots_to(path)
+    resumed.add_snapshots(30)
+    resumed.stop_recording_snapshots()
+
+    _, rows = open_snapshot_file(path)
+    assert len(rows) == 150
+    np.testing.assert_array_equal(rows, resumed.snapshot_store.view())
+
+
+def test_recording_rejects_foreign_file(tmp_path):
+    path = tmp_path / "run.shadow"
+    ClassicalShadow_1_CLIFFORD(Protocol()).save_snapshots(path)
+
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=1))
+    shadow.add_snapshots(5)
+    with pytest.raises(ValueError):
+        shadow.record_snapshots_to(path)
+
+    with pytest.raises(ValueError):
+        ClassicalShadow_N_CLIFFORD(Protocol()).load_snapshots(path)
+
+
+def test_merge_runs(tmp_path):
+    paths = []
+    shadows = []
+    for seed in (10, 11, 12):
+        shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=seed), seed=seed)
+        shadow.add_snapshots(100 * (seed - 9))
+        paths.append(tmp_path / f"run_{seed}.shadow")
+        shadow.save_snapshots(paths[-1])
+        shadows.append(shadow)
+
+    merged_path = tmp_path / "merged.shadow"
+    header = merge_snapshot_files(paths, merged_path, chunk_size=64)
+    assert header["seeds"] == [10, 11, 12]
+
+    merged = ClassicalShadow_1_CLIFFORD(Protocol())
+    merged.load_snapshots(merged_path)
+
+    assert merged.get_shadow_size() == 600
+    np.testing.assert_array_equal(
+        merged.snapshot_store.view(),
+        np.vstack([shadow.snapshot_store.view() for shadow in shadows]),
+    )
+
+    other_path = tmp_path / "other.shadow"
+    ClassicalShadow_N_CLIFFORD(Protocol()).save_snapshots(other_path)
+    with pytest.raises(ValueError):
+        merge_snapshot_files([paths[0], other_path], tmp_path / "bad.shadow")
+    assert not (tmp_path / "bad.shadow").exists()
+
+
+def test_merge_into_an_input(tmp_path):
+    paths = []
+    rows = []
+    for seed in (20, 21):
+        shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=seed), seed=seed)
+        shadow.add_snapshots(50)
+        paths.append(tmp_path / f"run_{seed}.shadow")
+        shadow.save_snapshots(paths[-1])
+        rows.append(shadow.snapshot_store.view())
+
+    merge_snapshot_files(paths, paths[0])
+
+    _, merged_rows = open_snapshot_file(paths[0])
+    np.testing.assert_array_equal(merged_rows, np.vstack(rows))
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "run_20.shadow",
+        "run_21.shadow",
+    ]
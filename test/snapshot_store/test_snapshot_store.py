@@ -0,0 +1,92 @@
+import sys
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford, StabilizerState, random_clifford
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from snapshot_store import (
+    SnapshotStore,
+    pack_clifford,
+    pack_tableaux,
+    packed_clifford_width,
+    unpack_clifford,
+    unpack_tableaux,
+)
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(3)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        circuit.s(2)
+        return circuit
+
+
+def test_store_grows_and_returns_read_only_views():
+    store = SnapshotStore(3, capacity=2)
+
+    for i in range(10):
+        store.append(np.full((i, 3), i))
+
+    view = store.view()
+    assert len(store) == 45
+    assert view.shape == (45, 3)
+    assert not view.flags.writeable
+    assert np.shares_memory(store[5:10], view)
+    np.testing.assert_array_equal(store[44], [9, 9, 9])
+
+    with pytest.raises(ValueError):
+        view[0, 0] = 1
+
+
+def test_clifford_packing_round_trip():
+    for num_qubits in (1, 2, 5):
+        cliffords = [random_clifford(num_qubits, seed=seed) for seed in range(5)]
+
+        row = pack_clifford(cliffords[0])
+        assert row.shape == (packed_clifford_width(num_qubits),)
+        assert unpack_clifford(row, num_qubits) == cliffords[0]
+
+        rows = pack_tableaux(np.array([clifford.tableau for clifford in cliffords]))
+        tableaux = unpack_tableaux(rows, num_qubits)
+        for clifford, tableau in zip(cliffords, tableaux):
+            np.testing.assert_array_equal(tableau, clifford.tableau)
+
+
+def test_1_clifford_shadow_stores_state_indices():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(seed=1), seed=2)
+
+    shadow.add_snapshots(100)
+
+    rows = shadow.snapshot_store.view()
+    assert rows.shape == (100, 3)
+    assert rows.dtype == np.uint8
+    assert rows.max() < 6
+
+    assert len(shadow.clifford_list_list) == shadow.get_shadow_size() == 100
+    for row, cliffords in zip(rows, shadow.clifford_list_list):
+        np.testing.assert_array_equal(shadow.encode_snapshot(cliffords), row)
+
+
+def test_n_clifford_shadow_stores_packed_tableaux():
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(seed=1), seed=2)
+    rotation = [random_clifford(3, seed=3)]
+
+    stabilizers = shadow.compute_clifford_applied_to_measurements(rotation, [1, 0, 1])
+    shadow.append_snapshot_rows(shadow.encode_snapshot(stabilizers))
+    shadow.add_snapshots(20)
+
+    assert shadow.snapshot_store.view().shape == (21, packed_clifford_width(3))
+    assert shadow.clifford_list_list[0][0] == stabilizers[0]
+    assert all(
+        isinstance(cliffords[0], Clifford) for cliffords in shadow.clifford_list_list
+    )
+    assert StabilizerState(shadow.clifford_list_list[-1][0]).num_qubits == 3
@@ -0,0 +1,90 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford, SparsePauliOp
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from median_of_means import MedianOfMeansAccumulator, median_of_means
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(i - 1, i)
+        return circuit
+
+
+def test_accumulator_distributes_round_robin():
+    values = np.arange(23, dtype=float)
+    accumulator = MedianOfMeansAccumulator(4)
+    accumulator.add(values[:5])
+    accumulator.add(values[5:])
+
+    np.testing.assert_allclose(accumulator.sums, [values[i::4].sum() for i in range(4)])
+    assert accumulator.counts.tolist() == [6, 6, 6, 5]
+
+    estimate, _ = accumulator.estimate()
+    assert np.isclose(estimate, np.median([values[i::4].mean() for i in range(4)]))
+
+
+def test_single_batch_accumulator_is_the_mean():
+    values = np.random.default_rng(1).random((50, 3))
+    accumulator = MedianOfMeansAccumulator(1, (3,))
+    accumulator.add(values)
+
+    np.testing.assert_allclose(accumulator.estimate()[0], values.mean(axis=0))
+    np.testing.assert_allclose(accumulator.estimate()[0], median_of_means(values, 1)[0])
+
+
+def test_observable_tracker_follows_snapshots():
+    shadow = ClassicalShadow_1_CLIFFORD(Protocol(3, seed=2), seed=3)
+    shadow.add_snapshots(100)
+
+    labels = ["ZZI", "IXX", "YYX"]
+    observable = SparsePauliOp(labels, coeffs=[1.0, 0.5, -1.0])
+    shadow.track("strings", labels, num_batches=1)
+    shadow.track("sum", observable, num_batches=1)
+
+    for _ in range(3):
+        shadow.add_snapshots(70)
+
+        estimates, _ = shadow.get_tracked_estimate("strings")
+        expected, _ = shadow.predict_observable(labels, num_batches=1)
+        np.testing.assert_allclose(estimates, expected)
+
+        estimate, _ = shadow.get_tracked_estimate("sum")
+        assert np.isclose(estimate, shadow.predict_observable(observable, 1)[0])
+
+    shadow.untrack("sum")
+    assert list(shadow.trackers) == ["strings"]
+
+
+def test_fidelity_tracker(tmp_path):
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(3, seed=4), seed=5)
+    target = Clifford(shadow.shadow_protocol.get_state_circuit())
+    shadow.track("ghz", target, num_batches=1)
+
+    shadow.add_snapshots(60)
+    overlaps = shadow.compute_overlaps(shadow.reverse_qubits(target))
+    estimate, _ = shadow.get_tracked_estimate("ghz")
+    assert np.isclose(estimate, 9 * overlaps.mean() - 1)
+
+    # loading snapshots recomputes the trackers
+    path = tmp_path / "snapshots.bin"
+    shadow.save_snapshots(path)
+    shadow.add_snapshots(20)
+    shadow.load_snapshots(path)
+    assert shadow.trackers["ghz"].num_snapshots == 60
+    assert np.isclose(shadow.get_tracked_estimate("ghz")[0], estimate)
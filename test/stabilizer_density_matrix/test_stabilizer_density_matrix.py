@@ -0,0 +1,41 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import StabilizerState, random_clifford
+
+sys.path.insert(0, "../..")
+
+from abstract_cassical_shadow import AbstractClassicalShadow
+
+
+def operator_density_matrix(stab):
+    op = stab.to_operator().data
+    return np.outer(op[:, 0], op[:, 0].conj())
+
+
+def test_matches_operator_construction():
+    rng = np.random.default_rng(1)
+    for num_qubits in (1, 2, 4):
+        for _ in range(10):
+            stab = StabilizerState(random_clifford(num_qubits, seed=rng))
+            np.testing.assert_allclose(
+                AbstractClassicalShadow.stabilizer_to_density_matrix(stab),
+                operator_density_matrix(stab),
+                atol=1e-12,
+            )
+
+
+def test_sparse_output():
+    circuit = QuantumCircuit(6)
+    circuit.h(0)
+    circuit.cx(0, 3)
+    circuit.h(5)
+    circuit.s(5)
+    stab = StabilizerState(circuit)
+
+    sparse = AbstractClassicalShadow.stabilizer_to_density_matrix(stab, sparse=True)
+
+    # two independent superpositions, 2^2 amplitudes and 4^2 matrix entries
+    assert sparse.nnz == 16
+    np.testing.assert_allclose(sparse.toarray(), operator_density_matrix(stab))
@@ -0,0 +1,106 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+
+
+class GHZProtocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(0, i)
+        circuit.measure_all()
+        return circuit
+
+
+class RotatedProtocol(StabilizerShadowProtocol):
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(1)
+        circuit.ry(np.pi / 3, 0)
+        return circuit
+
+
+def ghz_density_matrix(num_qubits):
+    dim = 2**num_qubits
+    rho = np.zeros((dim, dim))
+    rho[0, 0] = rho[0, -1] = rho[-1, 0] = rho[-1, -1] = 0.5
+    return rho
+
+
+def test_clifford_state_is_sampled_from_tableau():
+    protocol = GHZProtocol(3)
+
+    assert protocol.get_num_qubits() == 3
+    assert protocol.supports_rotation_sampling()
+
+    memory = protocol.sample_rotated_state(
+        [protocol.get_state_clifford().adjoint()], shots=20
+    )
+    assert memory == [[0, 0, 0]] * 20
+
+
+def test_reconstruction_1_clifford():
+    protocol = GHZProtocol(2, seed=11)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol)
+
+    shadow.add_snapshots(5000)
+
+    np.testing.assert_allclose(
+        np.real(shadow.get_density_matrix_from_cliffords()),
+        ghz_density_matrix(2),
+        rtol=0.0,
+        atol=0.08,
+    )
+
+
+def test_reconstruction_n_clifford():
+    protocol = GHZProtocol(3, seed=12)
+    shadow = ClassicalShadow_N_CLIFFORD(protocol)
+
+    shadow.add_snapshots(5000)
+
+    np.testing.assert_allclose(
+        np.real(shadow.get_density_matrix_from_cliffords()),
+        ghz_density_matrix(3),
+        rtol=0.0,
+        atol=0.08,
+    )
+
+
+def test_large_stabilizer_state():
+    protocol = GHZProtocol(50, seed=13)
+    shadow = ClassicalShadow_N_CLIFFORD(protocol, shots_per_rotation=4)
+
+    shadow.add_snapshots(5)
+
+    assert shadow.get_shadow_size() == 20
+
+
+def test_non_clifford_state_falls_back_to_simulator():
+    protocol = RotatedProtocol(seed=14)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol)
+
+    # non-Clifford states are sampled from the stitched circuits on the simulator
+    assert protocol.get_state_clifford() is None
+
+    shadow.add_snapshots(3000)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.08,
+    )
@@ -0,0 +1,91 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import random_clifford
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_1_clifford import ClassicalShadow_1_CLIFFORD
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from statevector_shadow_protocol import StatevectorShadowProtocol
+
+
+class Protocol(StatevectorShadowProtocol):
+
+    def __init__(self, seed=None, max_chunk_entries=2**24):
+        super().__init__(seed, max_chunk_entries)
+        self.num_state_circuits = 0
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        self.num_state_circuits += 1
+
+        circuit = QuantumCircuit(2)
+        circuit.ry(np.pi / 3, 0)
+        circuit.cx(0, 1)
+        circuit.t(1)
+        circuit.rx(0.4, 1)
+        return circuit
+
+
+def test_state_is_simulated_once():
+    protocol = Protocol(seed=1)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol)
+
+    shadow.add_snapshots(100, batch_size=10)
+
+    assert protocol.num_state_circuits == 2
+    assert shadow.get_shadow_size() == 100
+
+
+def test_local_and_global_rotations_agree():
+    protocol = Protocol(seed=2)
+    state = protocol.get_state_vector()
+
+    cliffords = [random_clifford(1, seed=3), random_clifford(1, seed=4)]
+    unitaries = np.array([[clifford.to_matrix() for clifford in cliffords]])
+
+    local = protocol.apply_single_qubit_unitaries(state, unitaries)[0]
+    general = protocol.apply_cliffords(state, cliffords)
+
+    np.testing.assert_allclose(local, general, atol=1e-12)
+
+
+def test_chunks_do_not_change_the_samples():
+    rotations = [
+        [random_clifford(1, seed=2 * i), random_clifford(1, seed=2 * i + 1)]
+        for i in range(25)
+    ]
+
+    whole = Protocol(seed=6).sample_rotated_states(rotations, 3)
+    chunked = Protocol(seed=6, max_chunk_entries=12).sample_rotated_states(rotations, 3)
+
+    assert chunked == whole
+
+
+def test_reconstruction_1_clifford():
+    protocol = Protocol(seed=5)
+    shadow = ClassicalShadow_1_CLIFFORD(protocol)
+
+    shadow.add_snapshots(5000)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.08,
+    )
+
+
+def test_reconstruction_n_clifford():
+    protocol = Protocol(seed=6)
+    shadow = ClassicalShadow_N_CLIFFORD(protocol, shots_per_rotation=5)
+
+    shadow.add_snapshots(1000)
+
+    np.testing.assert_allclose(
+        shadow.get_density_matrix_from_cliffords(),
+        shadow.get_original_density_matrix(),
+        rtol=0.0,
+        atol=0.08,
+    )
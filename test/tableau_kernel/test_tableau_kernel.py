@@ -0,0 +1,149 @@
+import sys
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import (
+    Clifford,
+    DensityMatrix,
+    StabilizerState,
+    random_clifford,
+    random_pauli_list,
+)
+
+sys.path.insert(0, "../..")
+
+from classical_shadow_n_clifford import ClassicalShadow_N_CLIFFORD
+from stabilizer_shadow_protocol import StabilizerShadowProtocol
+from stabilizer_tableau import (
+    adjoint_tableaux,
+    post_measurement_tableaux,
+    reverse_tableau_qubits,
+    sample_stabilizer_states,
+    stabilizer_density_matrices,
+    stabilizer_pauli_expectations,
+    stabilizer_rows,
+)
+
+
+class Protocol(StabilizerShadowProtocol):
+
+    def __init__(self, num_qubits, seed=None):
+        super().__init__(seed)
+        self.num_qubits = num_qubits
+
+    def get_state_circuit(self) -> QuantumCircuit:
+        circuit = QuantumCircuit(self.num_qubits)
+        circuit.h(0)
+        for i in range(1, self.num_qubits):
+            circuit.cx(i - 1, i)
+        return circuit
+
+
+def reverse_clifford(num_qubits):
+    circuit = QuantumCircuit(num_qubits)
+    for i in range(num_qubits // 2):
+        circuit.swap(i, num_qubits - 1 - i)
+    return Clifford(circuit)
+
+
+def reference_post_measurement(clifford, bits):
+    # X^b, then the inverse rotation, then the qubit reversal
+    circuit = QuantumCircuit(clifford.num_qubits)
+    for i, bit in enumerate(bits):
+        if bit:
+            circuit.x(i)
+    return (
+        Clifford(circuit)
+        .compose(clifford.adjoint())
+        .compose(reverse_clifford(clifford.num_qubits))
+    )
+
+
+def test_adjoint_matches_qiskit():
+    rng = np.random.default_rng(1)
+    for num_qubits in (1, 2, 5):
+        cliffords = [random_clifford(num_qubits, seed=rng) for _ in range(20)]
+        adjoints = adjoint_tableaux(np.array([c.tableau for c in cliffords]))
+
+        for clifford, adjoint in zip(cliffords, adjoints):
+            np.testing.assert_array_equal(adjoint, clifford.adjoint().tableau)
+
+
+def test_reversal_matches_swaps():
+    clifford = random_clifford(5, seed=2)
+    np.testing.assert_array_equal(
+        reverse_tableau_qubits(clifford.tableau),
+        clifford.compose(reverse_clifford(5)).tableau,
+    )
+
+
+def test_post_measurement_matches_composition():
+    rng = np.random.default_rng(3)
+    cliffords = [random_clifford(4, seed=rng) for _ in range(20)]
+    outcomes = rng.integers(0, 2, size=(20, 4))
+
+    tableaux = post_measurement_tableaux(
+        np.array([c.tableau for c in cliffords]), outcomes, reverse_qubits=True
+    )
+    for clifford, bits, tableau in zip(cliffords, outcomes, tableaux):
+        np.testing.assert_array_equal(
+            tableau, reference_post_measurement(clifford, bits).tableau
+        )
+
+
+def test_density_matrices_match_qiskit():
+    rng = np.random.default_rng(7)
+    cliffords = [random_clifford(3, seed=rng) for _ in range(20)]
+    x, z, r = (np.array(part) for part in zip(*map(stabilizer_rows, cliffords)))
+
+    expected = [DensityMatrix(clifford.to_circuit()).data for clifford in cliffords]
+    np.testing.assert_allclose(
+        stabilizer_density_matrices(x, z, r), expected, atol=1e-12
+    )
+
+
+def test_batched_samples_lie_in_the_support():
+    rng = np.random.default_rng(3)
+    cliffords = [random_clifford(4, seed=seed) for seed in range(12)]
+    x, z, r = (np.array(part) for part in zip(*map(stabilizer_rows, cliffords)))
+
+    outcomes = sample_stabilizer_states(x, z, r, 200, rng)
+
+    assert outcomes.shape == (12, 200, 4)
+    weights = 2 ** np.arange(4)
+    for clifford, samples in zip(cliffords, outcomes):
+        probabilities = StabilizerState(clifford).probabilities()
+        support = set(np.nonzero(probabilities > 1e-9)[0])
+        assert set(samples.astype(int) @ weights) == support
+
+
+def test_pauli_expectations_match_qiskit():
+    rng = np.random.default_rng(8)
+    cliffords = [random_clifford(4, seed=rng) for _ in range(20)]
+    paulis = random_pauli_list(4, 30, seed=9, phase=False)
+    # stabilizers and their products have expectations +-1
+    paulis += cliffords[0].to_labels(mode="S")[0].lstrip("+-")
+
+    tableaux = np.array([clifford.tableau for clifford in cliffords])
+    expected = [
+        [StabilizerState(clifford).expectation_value(pauli) for pauli in paulis]
+        for clifford in cliffords
+    ]
+    np.testing.assert_allclose(
+        stabilizer_pauli_expectations(tableaux, paulis.x, paulis.z), expected
+    )
+
+
+def test_shadow_paths_agree():
+    shadow = ClassicalShadow_N_CLIFFORD(Protocol(4, seed=4), seed=5)
+    rotations = shadow.get_random_rotations_batch(10)
+    outcomes = np.random.default_rng(6).integers(0, 2, size=(10, 4)).tolist()
+
+    rows = shadow.encode_snapshots_batch(rotations, outcomes)
+    for cliffords, bits, row in zip(rotations, outcomes, rows):
+        expected = reference_post_measurement(cliffords[0], bits)
+        decoded = shadow.decode_snapshot(row)[0]
+        single = shadow.compute_clifford_applied_to_measurements(cliffords, bits)[0]
+
+        np.testing.assert_array_equal(decoded.tableau, expected.tableau)
+        np.testing.assert_array_equal(single.tableau, expected.tableau)
@@ -0,0 +1,67 @@
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, "../..")
+
+from convergence_history import ConvergenceHistory
+from visualisation import GraphWatcher, LiveVisualizer
+
+
+def make_history(num_points, max_bins=64):
+    rng = np.random.default_rng(0)
+    history = ConvergenceHistory(capacity=4, max_bins=max_bins)
+    xs = 100 * np.arange(1, num_points + 1)
+    ys = 1 / np.sqrt(xs) * rng.normal(size=num_points)
+    history.extend(xs, ys, 1 / np.sqrt(xs))
+    return history
+
+
+def test_arrays_grow_and_keep_all_points():
+    history = make_history(1000)
+
+    assert len(history) == 1000
+    np.testing.assert_array_equal(history.x, 100 * np.arange(1, 1001))
+    np.testing.assert_allclose(history.errors, 1 / np.sqrt(history.x))
+
+    with pytest.raises(ValueError):
+        history.append(0, 0)
+
+
+@pytest.mark.parametrize("log_x", [False, True])
+def test_decimation_keeps_the_envelope(log_x):
+    history = make_history(20000)
+    xs, ys, lower, upper = history.decimate(100, log_x=log_x)
+
+    assert len(xs) <= 2 * 2 * history.max_bins
+    assert np.all(np.diff(xs) >= 0)
+    assert ys.min() == history.y.min()
+    assert ys.max() == history.y.max()
+    assert lower.min() == np.min(history.y - history.errors)
+    assert upper.max() == np.max(history.y + history.errors)
+
+
+def test_short_histories_are_not_decimated():
+    history = make_history(10)
+    xs, ys, _, _ = history.decimate(100)
+
+    np.testing.assert_array_equal(xs, history.x)
+    np.testing.assert_array_equal(ys, history.y)
+
+
+def test_graph_watcher_draws_decimated_history_with_band():
+    history = make_history(100)
+    vis = LiveVisualizer(max_fps=None)
+    vis.update(GraphWatcher(history, log_x=True))
+
+    line = vis.watchers[0]._line
+    history.extend(100 * np.arange(101, 20001), np.zeros(19900))
+    vis.update(GraphWatcher(history, log_x=True))
+
+    ax = vis.axes[0]
+    assert vis.watchers[0]._line is line
+    assert ax.get_xscale() == "log"
+    assert len(line.get_xdata()) <= 2 * int(ax.bbox.width)
+    assert line.get_xdata()[-1] == 100 * 20000
+    assert len(ax.collections) == 1
@@ -0,0 +1,57 @@
+import sys
+
+import numpy as np
+
+sys.path.insert(0, "../..")
+
+from visualisation import GraphWatcher, LiveVisualizer, MatrixWatcher
+
+
+def make_watchers(step):
+    matrix = np.full((4, 4), 0.1 * step, dtype=complex)
+    history = [(100 * i, 0.1 * i) for i in range(1, step + 2)]
+    return (
+        MatrixWatcher(matrix, title_template=f"Step {step}"),
+        GraphWatcher(history, target_value=1, y_min=-0.3, y_max=1.3),
+    )
+
+
+def test_figure_and_artists_are_reused():
+    vis = LiveVisualizer(max_fps=None)
+    vis.update(*make_watchers(0))
+
+    fig = vis.fig
+    image = vis.watchers[0]._image
+    line = vis.watchers[1]._line
+
+    for step in range(1, 4):
+        assert vis.update(*make_watchers(step))
+
+    assert vis.fig is fig
+    assert vis.watchers[0]._image is image
+    assert vis.watchers[1]._line is line
+    assert vis.axes[0].get_title() == "Step 3"
+    np.testing.assert_allclose(line.get_xdata(), [100, 200, 300, 400])
+    assert len(vis.axes[0].images) == 1
+    assert len(vis.axes[1].lines) == 2
+
+
+def test_updates_are_throttled():
+    vis = LiveVisualizer(max_fps=0.001)
+
+    assert vis.update(*make_watchers(0))
+    assert not vis.update(*make_watchers(1))
+    assert vis.axes[0].get_title() == "Step 0"
+
+    vis.flush()
+    assert vis.axes[0].get_title() == "Step 1"
+
+
+def test_new_layout_creates_new_figure():
+    vis = LiveVisualizer(max_fps=None)
+    vis.update(*make_watchers(0))
+    fig = vis.fig
+
+    vis.update(make_watchers(1)[0])
+    assert vis.fig is not fig
+    assert len(vis.axes) == 1
@@ -0,0 +1,74 @@
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, "../..")
+
+from visualisation import LiveVisualizer, MatrixWatcher
+
+
+def random_matrix(size, seed):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(size, size)) + 1j * rng.normal(size=(size, size))
+
+
+def test_tiles_are_aggregated():
+    matrix = random_matrix(10, 1)
+    tiles = np.zeros((12, 12), dtype=complex)
+    tiles[:10, :10] = matrix
+    tiles = tiles.reshape(3, 4, 3, 4)
+
+    magnitude, phase = MatrixWatcher(matrix, max_pixels=3).aggregate_tiles(matrix)
+    np.testing.assert_allclose(magnitude, np.abs(tiles).max(axis=(1, 3)))
+    np.testing.assert_allclose(phase, np.angle(tiles.sum(axis=(1, 3))))
+
+    watcher = MatrixWatcher(matrix, max_pixels=3, aggregate="mean")
+    magnitude, _ = watcher.aggregate_tiles(matrix)
+    np.testing.assert_allclose(magnitude, np.abs(tiles).mean(axis=(1, 3)))
+
+    # small matrices are shown pixel by pixel
+    magnitude, _ = MatrixWatcher(matrix).aggregate_tiles(matrix)
+    np.testing.assert_allclose(magnitude, np.abs(matrix))
+
+
+def test_zoom_shows_sub_block_in_matrix_coordinates():
+    matrix = random_matrix(16, 2)
+    watcher = MatrixWatcher(matrix, zoom=(4, 8, 8, 16))
+
+    assert watcher.to_rgb().shape == (4, 8, 3)
+    assert watcher.get_extent() == (7.5, 15.5, 7.5, 3.5)
+
+
+def test_only_changed_pixels_are_converted():
+    matrix = random_matrix(8, 3)
+    first = MatrixWatcher(matrix, vmax=1.0)
+    buffer = first.to_rgb().copy()
+
+    changed = matrix.copy()
+    changed[2, 5] = 0.3j
+    second = MatrixWatcher(changed, vmax=1.0)
+
+    # mark the reused buffer, unchanged pixels must keep the marker
+    first._rgb[:] = -1
+    rgb = second.to_rgb(first)
+
+    assert rgb is first._rgb
+    np.testing.assert_allclose(
+        rgb[2, 5], MatrixWatcher(changed, vmax=1.0).to_rgb()[2, 5]
+    )
+    assert np.count_nonzero(rgb[..., 0] != -1) == 1
+    assert not np.allclose(rgb[2, 5], buffer[2, 5])
+
+
+def test_large_matrix_is_downsampled():
+    vis = LiveVisualizer(max_fps=None)
+    matrix = random_matrix(1024, 4)
+
+    start = time.perf_counter()
+    for step in range(3):
+        vis.update(MatrixWatcher(matrix * (step + 1), max_pixels=128))
+    elapsed = time.perf_counter() - start
+
+    assert vis.watchers[0]._image.get_array().shape == (128, 128, 3)
+    assert elapsed < 10
@@ -1,7 +1,9 @@
-import matplotlib.pyplot as plt
+import time
+
 import numpy as np
-from IPython.display import clear_output, display
+from IPython.display import display
 from matplotlib.colors import hsv_to_rgb
+from matplotlib.figure import Figure
 
 
 class MatrixWatcher:
@@ -9,76 +11,198 @@ class MatrixWatcher:
     Zeigt eine komplexe Dichtematrix an:
     - Farbe (Hue) = Phase (Winkel der komplexen Zahl)
     - Sättigung (Saturation) = Betrag (Absolutwert)
+
+    Große Matrizen werden in Kacheln zusammengefasst, sodass höchstens
+    max_pixels Pixel pro Seite gezeichnet werden. Pro Kachel wird der maximale
+    (aggregate="max") oder mittlere (aggregate="mean") Betrag angezeigt, die
+    Phase stammt vom Mittelwert der Kachel. Mit zoom=(zeile_start, zeile_ende,
+    spalte_start, spalte_ende) wird nur ein Teilblock angezeigt.
     """
 
-    def __init__(self, matrix, title_template="Matrix", vmax=0.5):
+    def __init__(
+        self,
+        matrix,
+        title_template="Matrix",
+        vmax=0.5,
+        max_pixels=512,
+        aggregate="max",
+        zoom=None,
+    ):
+        if aggregate not in ("max", "mean"):
+            raise ValueError(f"Unbekannte Aggregation: {aggregate}")
+
         self.matrix = matrix
         self.title = title_template
         # vmax bestimmt, ab welchem Betrag die Farbe "voll gesättigt" ist.
         # Bei Dichtematrizen ist 0.5 oder 1.0 oft sinnvoll.
         self.vmax = vmax
+        self.max_pixels = max_pixels
+        self.aggregate = aggregate
+        self.zoom = zoom
 
-    def plot(self, ax):
-        # 1. Betrag (Magnitude) und Phase (Winkel) berechnen
+        # RGB-Puffer und Kachelwerte des letzten Bildes, siehe to_rgb()
+        self._rgb = None
+        self._magnitude = None
+        self._phase = None
+
+    def get_view(self):
+        """Gibt den angezeigten Ausschnitt und seine linke obere Ecke zurück."""
+        matrix = np.asarray(self.matrix)
+        if self.zoom is None:
+            return matrix, 0, 0
+
+        row_start, row_stop, col_start, col_stop = self.zoom
+        return matrix[row_start:row_stop, col_start:col_stop], row_start, col_start
+
+    def get_tile_size(self, shape):
+        return max(1, -(-max(shape) // self.max_pixels))
+
+    def aggregate_tiles(self, view):
+        """Fasst tile x tile Blöcke zu je einem Pixel zusammen (Betrag, Phase)."""
+        tile = self.get_tile_size(view.shape)
+        if tile == 1:
+            return np.abs(view), np.angle(view)
+
+        # Auf ein Vielfaches der Kachelgröße mit Nullen auffüllen
+        rows = -(-view.shape[0] // tile)
+        cols = -(-view.shape[1] // tile)
+        padded = np.zeros((rows * tile, cols * tile), dtype=complex)
+        padded[: view.shape[0], : view.shape[1]] = view
+        tiles = padded.reshape(rows, tile, cols, tile)
+
+        if self.aggregate == "max":
+            magnitude = np.abs(tiles).max(axis=(1, 3))
+        else:
+            magnitude = np.abs(tiles).mean(axis=(1, 3))
+        phase = np.angle(tiles.sum(axis=(1, 3)))
+
+        return magnitude, phase
+
+    def to_rgb(self, previous=None):
+        """
+        Berechnet das RGB-Bild in einen vorab angelegten Puffer. Mit dem Watcher
+        des vorherigen Bildes werden dessen Puffer und Kachelwerte übernommen und
+        nur die Pixel neu umgerechnet, deren Betrag oder Phase sich geändert hat.
+        """
+        # 1. Betrag (Magnitude) und Phase (Winkel) der Kacheln berechnen
         # Wir nehmen direkt die komplexe Matrix, kein np.real() mehr!
-        magnitude = np.abs(self.matrix)
-        phase = np.angle(self.matrix)
+        magnitude, phase = self.aggregate_tiles(self.get_view()[0])
+
+        if (
+            previous is not None
+            and previous._rgb is not None
+            and previous._rgb.shape[:2] == magnitude.shape
+            and previous.vmax == self.vmax
+        ):
+            self._rgb = previous._rgb
+            changed = (magnitude != previous._magnitude) | (phase != previous._phase)
+        else:
+            self._rgb = np.empty(magnitude.shape + (3,))
+            changed = np.ones(magnitude.shape, dtype=bool)
 
-        # 2. Sättigung berechnen (Magnitude normalisieren)
-        # 0 -> Weiß (Sättigung 0), vmax -> Volle Farbe (Sättigung 1)
-        # np.clip sorgt dafür, dass Werte > vmax nicht crashen, sondern einfach max bunt bleiben
-        saturation = np.clip(magnitude / self.vmax, 0, 1)
+        self._magnitude = magnitude
+        self._phase = phase
 
-        # 3. Farbe (Hue) berechnen (Phase normalisieren)
-        # np.angle gibt Werte von -pi bis pi. Wir mappen das auf 0 bis 1 für die Farbskala.
-        # Rot ist meistens bei 0 (Realteil positiv).
-        hue = (phase + np.pi) / (2 * np.pi)
+        if changed.any():
+            # 2. Sättigung berechnen (Magnitude normalisieren)
+            # 0 -> Weiß (Sättigung 0), vmax -> Volle Farbe (Sättigung 1)
+            # np.clip sorgt dafür, dass Werte > vmax nicht crashen, sondern einfach max bunt bleiben
+            saturation = np.clip(magnitude[changed] / self.vmax, 0, 1)
 
-        # 4. Helligkeit (Value)
-        # Wir setzen das konstant auf 1 (volle Helligkeit), damit Sättigung 0 = Weiß ist.
-        value = np.ones_like(hue)
+            # 3. Farbe (Hue) berechnen (Phase normalisieren)
+            # np.angle gibt Werte von -pi bis pi. Wir mappen das auf 0 bis 1 für die Farbskala.
+            # Rot ist meistens bei 0 (Realteil positiv).
+            hue = (phase[changed] + np.pi) / (2 * np.pi)
 
-        # 5. HSV Bild zusammenbauen (Dimensionen: Zeilen, Spalten, 3 Kanäle)
-        hsv_image = np.dstack((hue, saturation, value))
+            # 4. Helligkeit (Value)
+            # Wir setzen das konstant auf 1 (volle Helligkeit), damit Sättigung 0 = Weiß ist.
+            value = np.ones_like(hue)
 
-        # 6. In RGB konvertieren für matplotlib
-        rgb_image = hsv_to_rgb(hsv_image)
+            # 5. HSV Werte (Pixel, 3 Kanäle) nur für geänderte Pixel umrechnen
+            # 6. In RGB konvertieren für matplotlib, direkt in den Puffer
+            self._rgb[changed] = hsv_to_rgb(np.stack((hue, saturation, value), axis=-1))
 
-        # 7. Anzeigen
-        ax.imshow(
-            rgb_image,
+        return self._rgb
+
+    def get_extent(self):
+        # Achsen in Matrix-Indizes, auch wenn ein Pixel eine ganze Kachel ist
+        view, row_start, col_start = self.get_view()
+        rows, cols = view.shape
+        return (
+            col_start - 0.5,
+            col_start + cols - 0.5,
+            row_start + rows - 0.5,
+            row_start - 0.5,
+        )
+
+    def plot(self, ax):
+        # 7. Anzeigen, das Bild-Artist wird für spätere Updates gemerkt
+        self._image = ax.imshow(
+            self.to_rgb(),
             origin="upper",
             interpolation="nearest",  # 'nearest' ist wichtig, damit Pixel scharf bleiben
+            extent=self.get_extent(),
         )
         ax.set_title(self.title)
 
+    def update_plot(self, ax, previous):
+        """
+        Übernimmt das Bild des vorherigen Watchers im selben Slot und tauscht nur
+        die Pixeldaten aus, statt die Achse neu aufzubauen.
+        """
+        image = getattr(previous, "_image", None)
+        if image is None or image.axes is not ax:
+            ax.clear()
+            self.plot(ax)
+            return
+
+        image.set_data(self.to_rgb(previous))
+
+        # Ausdehnung und Achsenlimits an Größe bzw. Zoom anpassen
+        extent = self.get_extent()
+        image.set_extent(extent)
+        ax.set_xlim(extent[0], extent[1])
+        ax.set_ylim(extent[2], extent[3])
+
+        ax.set_title(self.title)
+        self._image = image
+
 
 class GraphWatcher:
     """
-    Zeigt einen Graphen basierend auf einer History von (x, y) Tupeln an.
+    Zeigt einen Graphen basierend auf einer History an: entweder eine
+    ConvergenceHistory oder eine Liste von (x, y) Tupeln.
+
+    Eine ConvergenceHistory wird per Min/Max-Dezimierung auf die Pixelbreite
+    der Achse reduziert, die Zeichenkosten hängen also nicht von der Laufzeit
+    ab. Sind Fehlerbalken vorhanden, wird ein Konfidenzband gezeichnet. Mit
+    log_x=True wird die Shadow-Größe logarithmisch aufgetragen.
     """
 
     def __init__(
-        self, history, title="Convergence", target_value=None, y_min=None, y_max=None
+        self,
+        history,
+        title="Convergence",
+        target_value=None,
+        y_min=None,
+        y_max=None,
+        log_x=False,
     ):
-        self.history = (
-            history  # Erwartet eine Liste von Tupeln: [(x1, y1), (x2, y2), ...]
-        )
+        # ConvergenceHistory oder Liste von Tupeln: [(x1, y1), (x2, y2), ...]
+        self.history = history
         self.title = title
         self.target_value = target_value
         self.y_min = y_min
         self.y_max = y_max
+        self.log_x = log_x
 
     def plot(self, ax):
         ax.set_title(self.title)
+        self._line = None
+        self._band = None
 
-        # Wenn die History leer ist, nichts zeichnen
-        if not self.history:
-            return
-
-        # Daten entpacken: [(100, 0.8), (200, 0.9)] -> x=[100, 200], y=[0.8, 0.9]
-        # zip(*list) transponiert die Liste von Tupeln
-        xs, ys = zip(*self.history)
+        if self.log_x:
+            ax.set_xscale("log")
 
         # Target Line (Rot, gestrichelt)
         if self.target_value is not None:
@@ -90,8 +214,14 @@ class GraphWatcher:
                 label="Target",
             )
 
-        # Actual Data (Grün)
-        ax.plot(xs, ys, color="green", linewidth=1.5, label="Actual")
+        # Wenn die History leer ist, keine Datenlinie zeichnen
+        if not self.history:
+            return
+
+        # Actual Data (Grün), Linie und Band werden für spätere Updates gemerkt
+        xs, ys, lower, upper = self.get_data(self.get_num_points(ax))
+        (self._line,) = ax.plot(xs, ys, color="green", linewidth=1.5, label="Actual")
+        self._band = self.plot_band(ax, xs, lower, upper)
 
         ax.legend(loc="lower left")
 
@@ -102,40 +232,149 @@ class GraphWatcher:
         # Optional: Grid hinzufügen für bessere Lesbarkeit
         ax.grid(True, linestyle=":", alpha=0.6)
 
+    @staticmethod
+    def get_num_points(ax):
+        # Zwei Punkte (Min und Max) pro Pixel reichen für eine exakte Hüllkurve
+        return max(2, 2 * int(ax.bbox.width))
+
+    def get_data(self, num_points=None):
+        """
+        Gibt x, y und die untere/obere Bandgrenze zurück (NaN ohne Fehler).
+        """
+        if hasattr(self.history, "decimate"):
+            if num_points is None:
+                num_points = 2 * self.history.max_bins
+            return self.history.decimate(num_points, log_x=self.log_x)
+
+        # Daten entpacken: [(100, 0.8), (200, 0.9)] -> x=[100, 200], y=[0.8, 0.9]
+        # zip(*list) transponiert die Liste von Tupeln
+        xs, ys = zip(*self.history)
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        return xs, ys, np.full_like(ys, np.nan), np.full_like(ys, np.nan)
+
+    @staticmethod
+    def plot_band(ax, xs, lower, upper):
+        # Ohne Fehlerbalken (alles NaN) kein Band
+        if np.all(np.isnan(lower)) or np.all(np.isnan(upper)):
+            return None
+        return ax.fill_between(
+            xs, lower, upper, color="green", alpha=0.2, linewidth=0, label="Error"
+        )
+
+    def update_plot(self, ax, previous):
+        """
+        Übernimmt die Linie des vorherigen Watchers im selben Slot und setzt nur
+        neue x/y-Daten. Das Band wird ersetzt, es hat höchstens so viele Punkte
+        wie die Linie.
+        """
+        line = getattr(previous, "_line", None)
+        if (
+            line is None
+            or line.axes is not ax
+            or not self.history
+            or self.target_value != previous.target_value
+            or self.log_x != previous.log_x
+        ):
+            ax.clear()
+            self.plot(ax)
+            return
+
+        xs, ys, lower, upper = self.get_data(self.get_num_points(ax))
+        line.set_xdata(xs)
+        line.set_ydata(ys)
+        ax.set_title(self.title)
+
+        if previous._band is not None:
+            previous._band.remove()
+        self._band = self.plot_band(ax, xs, lower, upper)
+
+        # Nur die x-Achse (bzw. y ohne feste Limits) an die neuen Daten anpassen
+        ax.relim()
+        ax.autoscale_view(scalex=True, scaley=self.y_min is None or self.y_max is None)
+        self._line = line
+
 
 class LiveVisualizer:
     """
     Der Haupt-Container, der die Subplots erstellt und verwaltet.
+
+    Die Figure wird nur einmal erstellt. Bei weiteren Updates übernehmen die
+    Watcher die Artists ihres Vorgängers im selben Slot und ändern nur deren
+    Daten. Die Anzeige wird höchstens max_fps mal pro Sekunde aktualisiert.
     """
 
-    def __init__(self):
-        # Leer, da das Layout bei jedem update() neu berechnet wird
-        pass
+    def __init__(self, max_fps=5.0):
+        self.max_fps = max_fps
+
+        self.fig = None
+        self.axes = []
+        self.watchers = []
 
-    def update(self, *watchers):
+        self._display_handle = None
+        self._last_draw = None
+        # Zuletzt übergebene, wegen Drosselung noch nicht gezeichnete Watcher
+        self._pending = None
+
+    def update(self, *watchers, force=False):
         """
         Nimmt beliebig viele Watcher entgegen und zeichnet sie nebeneinander.
+
+        Gibt True zurück, wenn gezeichnet wurde. Zu schnelle Updates werden
+        verworfen, flush() zeichnet den zuletzt übergebenen Stand nach.
         """
         n = len(watchers)
         if n == 0:
-            return
+            return False
+
+        now = time.perf_counter()
+        if (
+            not force
+            and self._last_draw is not None
+            and self.max_fps is not None
+            and now - self._last_draw < 1 / self.max_fps
+        ):
+            self._pending = watchers
+            return False
 
-        # Alte Plots schließen, um Speicherlecks zu verhindern
-        plt.close("all")
+        self._pending = None
+        self._last_draw = now
 
-        # Figure erstellen
-        fig, axes = plt.subplots(1, n, figsize=(6 * n, 5))
+        if self.fig is None or len(self.axes) != n:
+            self._create_figure(watchers)
+        else:
+            # Nur die Daten der bestehenden Artists austauschen
+            for ax, watcher, previous in zip(self.axes, watchers, self.watchers):
+                watcher.update_plot(ax, previous)
+            self.watchers = list(watchers)
+
+        self._show()
+        return True
+
+    def flush(self):
+        """Zeichnet die zuletzt verworfenen Watcher, falls vorhanden."""
+        if self._pending is not None:
+            self.update(*self._pending, force=True)
+
+    def _create_figure(self, watchers):
+        n = len(watchers)
 
-        # Sicherstellen, dass axes immer iterierbar ist (auch bei n=1)
-        if n == 1:
-            axes = [axes]
+        # Figure ohne pyplot erstellen: nichts muss geschlossen werden und
+        # das Notebook zeigt sie nicht zusätzlich automatisch an
+        self.fig = Figure(figsize=(6 * n, 5))
+        self.axes = list(np.atleast_1d(self.fig.subplots(1, n)))
 
         # Jeden Watcher zeichnen lassen
-        for ax, watcher in zip(axes, watchers):
+        for ax, watcher in zip(self.axes, watchers):
             watcher.plot(ax)
+        self.watchers = list(watchers)
 
-        plt.tight_layout()
+        self.fig.tight_layout()
+        self._display_handle = None
 
-        # Alte Ausgabe löschen und neue anzeigen
-        clear_output(wait=True)
-        display(fig)
+    def _show(self):
+        # Bestehende Ausgabe an Ort und Stelle ersetzen statt sie zu löschen
+        if self._display_handle is None:
+            self._display_handle = display(self.fig, display_id=True)
+        else:
+            self._display_handle.update(self.fig)